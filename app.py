@@ -4,7 +4,7 @@ load_dotenv()
 
 from flask import Flask, session, render_template, send_from_directory
 from flask_migrate import Migrate
-from models import db, Product, User, Order, OrderItem
+from models import db, Product, ProductOption, User, Order, OrderItem
 from config import Config
 from utils.local_storage import local_storage_service
 import logging
@@ -18,7 +18,14 @@ from routes.admin import admin_bp
 from routes.admin_videos import admin_videos_bp
 from routes.auth import auth_bp
 from routes.upload import upload_bp
-from routes.payment import payment_bp
+from routes.payment import payment_bp, using_dummy
+from commands import ALL_COMMANDS
+from utils.checkout import order_reaper
+from utils.dummy_payments import provider as dummy_provider
+from utils.webhooks import webhook_inbox
+from utils.email_outbox import email_outbox
+import utils.booking_claims  # registers the booking slot-claim listeners
+import utils.daily_metrics  # registers the daily_metrics rollup listeners
 
 
 app = Flask(__name__)
@@ -47,6 +54,28 @@ app.register_blueprint(auth_bp)
 app.register_blueprint(upload_bp)
 app.register_blueprint(payment_bp)
 
+# Register maintenance CLI commands (flask <group> <command>)
+for command in ALL_COMMANDS:
+    app.cli.add_command(command)
+
+
+def start_background_workers(app):
+    """Start this process's background threads. Called by the server entry
+    points (``python app.py`` and ``wsgi.py``) only, so importing the app for
+    ``flask db upgrade``, CLI commands, jobs or tests starts none of them.
+    """
+    # Expire abandoned checkouts in the background (ORDER_REAPER_INTERVAL=0 disables)
+    order_reaper.start(app)
+
+    # Purge expired dummy payment intents (DUMMY_INTENT_SWEEP_INTERVAL=0 disables)
+    if using_dummy():
+        dummy_provider.start_sweeper(app)
+
+    # Apply queued payment webhooks in the background (WEBHOOK_WORKERS=0 disables)
+    webhook_inbox.start(app)
+
+    # Send queued transactional emails in the background (EMAIL_WORKERS=0 disables)
+    email_outbox.start(app)
 
 
 # Media serving route
@@ -144,9 +173,17 @@ def init_db():
             
             db.session.commit()
 
+        # Default size/frame surcharges for the option catalog
+        ProductOption.seed_defaults()
+
+        # Make sure the product search index exists before serving traffic
+        from utils.search import product_search
+        product_search.ensure()
+
 if __name__ == "__main__":
     # Initialize database with sample data if needed
     init_db()
+    start_background_workers(app)
     
     # Run with debug controlled by environment variable
     debug_mode = os.getenv('FLASK_DEBUG', 'False').lower() in ('true', '1', 'yes')
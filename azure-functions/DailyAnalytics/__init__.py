@@ -0,0 +1,47 @@
+"""DailyAnalytics
+
+Nightly compaction and backfill of the ``daily_metrics`` rollup behind the
+admin dashboard: recomputes the last DAILY_METRICS_REBUILD_DAYS days from
+the order, quote_request and booking tables and drops rows that have
+cancelled out to zero.
+
+Runs as a timer-triggered function (02:30 UTC, see function.json) with the
+web app's code and database settings, or locally:
+
+    python azure-functions/DailyAnalytics/__init__.py [--days N | --all]
+
+which is the same job as ``flask analytics rebuild-daily``.
+"""
+import argparse
+import logging
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+def run(days=None):
+    """Rebuild the rollup; ``days=0`` backfills everything. Returns (written, corrected)"""
+    from app import app
+    from utils.daily_metrics import daily_metrics
+
+    with app.app_context():
+        return daily_metrics.nightly(days)
+
+
+def main(timer) -> None:
+    if getattr(timer, "past_due", False):
+        logging.warning("DailyAnalytics timer is running late")
+    written, corrected = run()
+    logging.info(f"DailyAnalytics rebuilt {written} daily metric rows ({corrected} corrected)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the daily_metrics rollup.")
+    parser.add_argument("--days", type=int, default=None, help="days back to recompute")
+    parser.add_argument("--all", action="store_true", help="backfill the whole history")
+    args = parser.parse_args()
+    written, corrected = run(0 if args.all else args.days)
+    print(f"Wrote {written} daily metric rows ({corrected} corrected).")
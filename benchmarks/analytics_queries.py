@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Dashboard analytics aggregation benchmark
+
+Seeds a throwaway SQLite database with ``--rows`` rows spread over orders,
+quote requests and bookings, then times Analytics.get_dashboard_stats and
+get_quote_conversion_funnel against the previous one-query-per-figure
+implementation kept below, and against a single-scan SUM(CASE ...) variant
+of the dashboard. Reports statements issued and median latency for each
+and fails (exit status 1) if their results differ.
+
+Usage:
+    python benchmarks/analytics_queries.py [--rows 1000000] [--repeat 5] [--url URL]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, date, timedelta, time as dtime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SERVICE_TYPES = ["Wedding Videography", "Commercial Production", "Event Photography",
+                 "Live Streaming", "Documentary Production", "Promotional Videos", "Drone Footage"]
+CHUNK = 50000
+
+
+def seed(db, rows):
+    """Bulk insert ``rows`` rows: 40% orders, 30% quotes, 30% bookings"""
+    from models import Order, QuoteRequest, Booking
+
+    now = datetime.utcnow()
+    today = date.today()
+    conn = db.session.connection()
+    tables = (
+        (Order, rows * 4 // 10, lambda i: {
+            "email": f"o{i}@example.com", "amount_cents": 5000 + i % 9000, "currency": "sgd",
+            "status": ("paid", "pending", "created", "failed", "cancelled")[i % 5],
+            "created_at": now - timedelta(minutes=i % 525600)}),
+        (QuoteRequest, rows * 3 // 10, lambda i: {
+            "name": f"Q{i}", "email": f"q{i}@example.com", "service_type": SERVICE_TYPES[i % len(SERVICE_TYPES)],
+            "status": ("pending", "responded", "quoted", "closed")[i % 4],
+            "quote_amount": 100000 + i % 50000 if i % 3 else None,
+            "created_at": now - timedelta(minutes=i % 525600)}),
+        (Booking, rows - rows * 7 // 10, lambda i: {
+            "name": f"B{i}", "email": f"b{i}@example.com", "service_type": SERVICE_TYPES[i % len(SERVICE_TYPES)],
+            "booking_date": today + timedelta(days=(i % 730) - 365), "start_time": dtime(9 + i % 8),
+            "end_time": dtime(10 + i % 8), "duration_hours": 1,
+            "status": ("pending", "confirmed", "cancelled", "completed")[i % 4],
+            "created_at": now - timedelta(minutes=i % 525600)}),
+    )
+    for model, count, row in tables:
+        for start in range(0, count, CHUNK):
+            conn.execute(model.__table__.insert(), [row(i) for i in range(start, min(count, start + CHUNK))])
+    db.session.commit()
+
+
+def legacy_dashboard_stats(date_range=30):
+    """get_dashboard_stats as it was: one query per figure"""
+    from sqlalchemy import and_, func
+    from models import db, Order, QuoteRequest, Booking, Analytics
+
+    start_date = date.today() - timedelta(days=date_range)
+    total_revenue = db.session.query(func.sum(Order.amount_cents)).filter(Order.status == 'paid').scalar() or 0
+    period_revenue = db.session.query(func.sum(Order.amount_cents)).filter(
+        and_(Order.status == 'paid', Order.created_at >= start_date)).scalar() or 0
+    total_quotes = QuoteRequest.query.count()
+    pending_quotes = QuoteRequest.query.filter(QuoteRequest.status == 'pending').count()
+    period_quotes = QuoteRequest.query.filter(QuoteRequest.created_at >= start_date).count()
+    total_bookings = Booking.query.count()
+    confirmed_bookings = Booking.query.filter(Booking.status == 'confirmed').count()
+    period_bookings = Booking.query.filter(Booking.created_at >= start_date).count()
+    quoted_count = QuoteRequest.query.filter(QuoteRequest.status == 'quoted').count()
+    conversion_rate = (quoted_count / total_quotes * 100) if total_quotes > 0 else 0
+    return {
+        'total_revenue': total_revenue / 100,
+        'period_revenue': period_revenue / 100,
+        'total_quotes': total_quotes,
+        'pending_quotes': pending_quotes,
+        'period_quotes': period_quotes,
+        'total_bookings': total_bookings,
+        'confirmed_bookings': confirmed_bookings,
+        'period_bookings': period_bookings,
+        'conversion_rate': round(conversion_rate, 1),
+        'avg_quote_value': Analytics.get_average_quote_value()
+    }
+
+
+def legacy_conversion_funnel():
+    from models import QuoteRequest
+
+    return {
+        'total': QuoteRequest.query.count(),
+        'responded': QuoteRequest.query.filter(QuoteRequest.status == 'responded').count(),
+        'quoted': QuoteRequest.query.filter(QuoteRequest.status == 'quoted').count(),
+        'closed': QuoteRequest.query.filter(QuoteRequest.status == 'closed').count(),
+    }
+
+
+def case_dashboard_stats(date_range=30):
+    """The dashboard as one SUM(CASE ...) scan per table, for comparison"""
+    from sqlalchemy import case, func
+    from models import db, Order, QuoteRequest, Booking
+
+    start_date = date.today() - timedelta(days=date_range)
+
+    def count_if(condition):
+        return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+    revenue = db.session.query(
+        func.coalesce(func.sum(Order.amount_cents), 0),
+        func.coalesce(func.sum(case((Order.created_at >= start_date, Order.amount_cents), else_=0)), 0),
+    ).filter(Order.status == 'paid').one()
+    quotes = db.session.query(
+        func.count(), count_if(QuoteRequest.status == 'pending'), count_if(QuoteRequest.created_at >= start_date),
+        count_if(QuoteRequest.status == 'quoted'), func.avg(QuoteRequest.quote_amount),
+    ).one()
+    bookings = db.session.query(
+        func.count(), count_if(Booking.status == 'confirmed'), count_if(Booking.created_at >= start_date),
+    ).one()
+    return {
+        'total_revenue': revenue[0] / 100,
+        'period_revenue': revenue[1] / 100,
+        'total_quotes': quotes[0],
+        'pending_quotes': quotes[1],
+        'period_quotes': quotes[2],
+        'total_bookings': bookings[0],
+        'confirmed_bookings': bookings[1],
+        'period_bookings': bookings[2],
+        'conversion_rate': round((quotes[3] / quotes[0] * 100) if quotes[0] else 0, 1),
+        'avg_quote_value': round((quotes[4] or 0) / 100, 2)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, default=1000000, help="rows to seed across the three tables")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per implementation")
+    parser.add_argument("--url", help="database URL of an already seeded database (skips seeding)")
+    args = parser.parse_args()
+
+    if args.url:
+        os.environ["SQLALCHEMY_DATABASE_URI"] = args.url
+    else:
+        workdir = tempfile.mkdtemp(prefix="flash_bench_")
+        os.environ["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+
+    from sqlalchemy import event
+    from app import app
+    from models import db, Analytics
+
+    with app.app_context():
+        if not args.url:
+            db.create_all()
+            started = time.perf_counter()
+            seed(db, args.rows)
+            print(f"Seeded {args.rows} rows in {time.perf_counter() - started:.1f}s ({workdir})")
+
+        statements = []
+        event.listen(db.engine, "before_cursor_execute", lambda *a: statements.append(a[2]))
+
+        candidates = {
+            "dashboard stats": (("before", legacy_dashboard_stats), ("sum-case", case_dashboard_stats),
+                                ("after", Analytics.get_dashboard_stats)),
+            "conversion funnel": (("before", legacy_conversion_funnel),
+                                  ("after", Analytics.get_quote_conversion_funnel)),
+        }
+        failures = []
+        print(f"{'metric':<20}{'impl':<10}{'queries':>8}{'median ms':>12}")
+        for label, implementations in candidates.items():
+            results = []
+            for name, function in implementations:
+                function()  # warm the page cache
+                timings = []
+                for _ in range(args.repeat):
+                    statements.clear()
+                    started = time.perf_counter()
+                    result = function()
+                    timings.append(time.perf_counter() - started)
+                db.session.commit()
+                results.append(result)
+                print(f"{label:<20}{name:<10}{len(statements):>8}{statistics.median(timings) * 1000:>12.1f}")
+            failures.extend(f"{label}: {result} != {results[0]}" for result in results[1:] if result != results[0])
+
+    for failure in failures:
+        print(f"MISMATCH {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Cart pricing benchmark
+
+Prices carts of 1, 20 and 200 lines three ways against a throwaway SQLite
+database and reports the number of SQL statements and median latency:
+
+    per-line   the previous approach, one Product lookup per cart line
+    engine     utils.pricing.cart_pricing (one IN query for the whole cart)
+    /checkout  the full checkout page rendered through the test client, reading
+               the cart from the server-side cart store
+
+Usage:
+    python benchmarks/cart_pricing.py [--products 5000] [--repeat 20]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+CART_SIZES = (1, 20, 200)
+
+
+def make_cart(lines, products):
+    from utils.pricing import option_catalog
+    prices = option_catalog.get()
+    sizes, frames = list(prices.sizes), list(prices.frames)
+    return [
+        {"product_id": 1 + (i * 7919) % products, "qty": 1 + i % 3,
+         "size": sizes[i % len(sizes)], "frame": frames[i % len(frames)]}
+        for i in range(lines)
+    ]
+
+
+def per_line(cart):
+    """Reference implementation: one primary-key lookup per line"""
+    from models import db, Product
+    from utils.pricing import unit_price_cents
+    total = 0
+    for line in cart:
+        product = db.session.get(Product, line["product_id"])
+        if product:
+            total += unit_price_cents(product, line["size"], line["frame"]) * line["qty"]
+    return total
+
+
+def measure(fn, repeat, counter):
+    fn()  # warm up
+    timings, queries = [], []
+    for _ in range(repeat):
+        counter.clear()
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+        queries.append(len(counter))
+    return statistics.median(timings), max(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--products", type=int, default=5000, help="products to seed")
+    parser.add_argument("--repeat", type=int, default=20, help="timed runs per cart size")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="flash_bench_")
+    os.environ["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ["RESPONSE_CACHE_BACKEND"] = "none"
+
+    from sqlalchemy import event
+    from app import app
+    from models import db, Product, ProductOption
+    from utils.pricing import cart_pricing, unit_price_cents
+    from utils.cart_store import cart_store, new_cart_id, SESSION_KEY
+
+    with app.app_context():
+        db.create_all()
+        ProductOption.seed_defaults()
+        now = datetime.utcnow()
+        db.session.execute(Product.__table__.insert(), [
+            {"title": f"Print #{i}", "description": "Bench print", "price_cents": 1000 + i % 9000,
+             "media_key": f"p{i}.jpg", "stock": 100, "created_at": now}
+            for i in range(args.products)
+        ])
+        db.session.commit()
+        engine = db.engine
+
+    statements = []
+    event.listen(engine, "before_cursor_execute",
+                 lambda conn, cursor, statement, *rest: statements.append(statement))
+
+    client = app.test_client()
+    print(f"{'lines':>5}  {'per-line':>22}  {'engine':>22}  {'/checkout':>22}")
+    for lines in CART_SIZES:
+        with app.app_context():
+            cart = make_cart(lines, args.products)
+            expected = per_line(cart)
+            priced = cart_pricing.price([dict(line) for line in cart], use_stored_prices=False)
+            assert priced.total_cents == expected, (priced.total_cents, expected)
+
+            def run_per_line():
+                db.session.expire_all()
+                per_line(cart)
+
+            def run_engine():
+                db.session.expire_all()
+                cart_pricing.price([dict(line) for line in cart])
+
+            legacy = measure(run_per_line, args.repeat, statements)
+            batched = measure(run_engine, args.repeat, statements)
+
+            cart_id = new_cart_id()
+            for line in cart:
+                cart_store.backend.add(cart_id, line["product_id"], line["size"], line["frame"],
+                                       line["qty"], unit_price_cents(db.session.get(Product, line["product_id"]),
+                                                                     line["size"], line["frame"]))
+
+        with client.session_transaction() as sess:
+            sess[SESSION_KEY] = cart_id
+        page = measure(lambda: client.get("/checkout"), args.repeat, statements)
+
+        print(f"{lines:5d}  " + "  ".join(
+            f"{ms:9.2f} ms {queries:4d} queries" for ms, queries in (legacy, batched, page)
+        ))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Query plan regression benchmark
+
+Seeds a throwaway SQLite database with a large catalog, order history,
+bookings, reviews and quotes, then requests every hot route through the
+Flask test client. Each SQL statement a route issues is captured, timed and
+run through EXPLAIN QUERY PLAN. Any full table scan of a large table that is
+not explicitly allowed below fails the run (exit status 1), so a change that
+drops or bypasses an index is caught before it ships.
+
+Usage:
+    python benchmarks/query_plans.py [--rows 20000] [--repeat 5] [--json report.json]
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, date, timedelta, time as dtime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Tables large enough that a full scan on a request path is a regression
+WATCHED_TABLES = {"product", "order", "order_item", "booking", "review", "quote_request"}
+
+# (route label, table) pairs where a full scan is expected and accepted
+ALLOWED_SCANS = {
+    # Whole-table aggregates for the admin analytics widgets
+    ("admin dashboard", "order"),
+    ("admin dashboard", "quote_request"),
+    ("admin dashboard", "booking"),
+    ("admin dashboard", "review"),
+    ("analytics: dashboard", "order"),
+    ("analytics: dashboard", "quote_request"),
+    ("analytics: dashboard", "booking"),
+    ("analytics: revenue-trend", "order"),
+    ("analytics: service-popularity", "quote_request"),
+    ("analytics: conversion-funnel", "quote_request"),
+    ("analytics: booking-analytics", "booking"),
+    ("admin reviews", "review"),
+}
+
+SCAN_RE = re.compile(r'^SCAN (?:TABLE )?"?(\w+)"?(?: AS \w+)?$')
+
+SERVICE_TYPES = ["Wedding Videography", "Commercial Production", "Event Photography",
+                 "Live Streaming", "Documentary Production", "Promotional Videos", "Drone Footage"]
+WORDS = ["sunset", "wedding", "urban", "portrait", "skyline", "harbour", "forest",
+         "gala", "launch", "festival", "studio", "aerial", "coastal", "night"]
+
+
+def seed(db, rows):
+    """Bulk insert a realistic dataset sized by ``rows`` products"""
+    from models import Product, Order, OrderItem, User, Booking, Review, QuoteRequest
+    from werkzeug.security import generate_password_hash
+
+    now = datetime.utcnow()
+    conn = db.session.connection()
+
+    conn.execute(User.__table__.insert(), [
+        {"email": f"user{i}@example.com", "password_hash": generate_password_hash("pw", method="pbkdf2:sha256:1"),
+         "joined_at": now}
+        for i in range(max(rows // 100, 2))
+    ])
+    users = max(rows // 100, 2)
+
+    conn.execute(Product.__table__.insert(), [
+        {"title": f"{WORDS[i % len(WORDS)].title()} {WORDS[(i * 7) % len(WORDS)]} #{i}",
+         "description": f"{WORDS[(i * 3) % len(WORDS)]} print number {i}",
+         "price_cents": 1000 + (i * 37) % 200000, "media_key": f"p{i}.jpg",
+         "mime_type": "video/mp4" if i % 5 == 0 else "image/jpeg",
+         "category": SERVICE_TYPES[i % len(SERVICE_TYPES)], "client_name": f"Client {i % 300}",
+         "featured": i % 50 == 0, "stock": 10, "created_at": now - timedelta(minutes=i)}
+        for i in range(rows)
+    ])
+
+    orders = rows * 2
+    conn.execute(Order.__table__.insert(), [
+        {"email": f"user{i % users}@example.com", "amount_cents": 5000 + i % 9000, "currency": "sgd",
+         "stripe_payment_intent": f"dummy_pi_{i:024d}",
+         "status": ("paid", "pending", "created", "failed", "cancelled")[i % 5],
+         "user_id": 1 + i % users, "created_at": now - timedelta(minutes=i)}
+        for i in range(orders)
+    ])
+    conn.execute(OrderItem.__table__.insert(), [
+        {"order_id": 1 + i // 2, "product_id": 1 + (i * 13) % rows, "quantity": 1 + i % 3,
+         "unit_price_cents": 1000}
+        for i in range(orders * 2)
+    ])
+    conn.execute(Review.__table__.insert(), [
+        {"product_id": 1 + i % rows, "user_id": 1 + i % users, "reviewer_name": f"R{i}",
+         "rating": 1 + i % 5, "comment": "Lovely", "approved": i % 7 != 0,
+         "created_at": now - timedelta(minutes=i), "updated_at": now}
+        for i in range(rows)
+    ])
+    conn.execute(QuoteRequest.__table__.insert(), [
+        {"name": f"Q{i}", "email": f"q{i}@example.com", "service_type": SERVICE_TYPES[i % len(SERVICE_TYPES)],
+         "status": ("pending", "responded", "quoted", "closed")[i % 4],
+         "quote_amount": 100000 + i if i % 3 else None, "created_at": now - timedelta(minutes=i)}
+        for i in range(rows)
+    ])
+    today = date.today()
+    conn.execute(Booking.__table__.insert(), [
+        {"name": f"B{i}", "email": f"b{i}@example.com", "service_type": SERVICE_TYPES[i % len(SERVICE_TYPES)],
+         "booking_date": today + timedelta(days=(i % 730) - 365), "start_time": dtime(9 + i % 8),
+         "end_time": dtime(10 + i % 8), "duration_hours": 1,
+         "status": ("pending", "confirmed", "cancelled", "completed")[i % 4],
+         "created_at": now - timedelta(minutes=i)}
+        for i in range(rows)
+    ])
+    db.session.commit()
+    return users
+
+
+def routes(client):
+    """(label, method, url, kwargs, session) for every hot path"""
+    created = client.post("/payment/create-intent", json={
+        "email": "bench@example.com", "items": [{"product_id": 1, "quantity": 1}]
+    }).get_json()
+    intent = created["payment_intent"]["id"]
+    today = date.today().isoformat()
+    user = {"user_id": 1}
+    admin = {"admin": True}
+    return [
+        ("home", "GET", "/", {}, None),
+        ("shop", "GET", "/shop", {}, None),
+        ("shop search", "GET", "/shop?q=sunset+wed", {}, None),
+        ("shop category", "GET", "/shop?category=Wedding+Videography", {}, None),
+        ("shop price", "GET", "/shop?min_price=100&max_price=500", {}, None),
+        ("portfolio", "GET", "/portfolio", {}, None),
+        ("service packages", "GET", "/service-packages", {}, None),
+        ("product", "GET", "/product/42", {}, None),
+        ("booking calendar", "GET", "/booking-calendar", {}, None),
+        ("check availability", "GET", f"/api/check-availability?date={today}&time=10:00&duration=2", {}, None),
+        ("orders", "GET", "/orders", {}, user),
+        ("profile", "GET", "/profile", {}, user),
+        ("confirm intent", "POST", "/payment/confirm",
+         {"json": {"payment_intent_id": intent}}, None),
+        ("admin dashboard", "GET", "/admin/", {}, admin),
+        ("admin orders", "GET", "/admin/orders", {}, admin),
+        ("admin quotes", "GET", "/admin/quotes", {}, admin),
+        ("admin bookings", "GET", "/admin/bookings", {}, admin),
+        ("admin reviews", "GET", "/admin/reviews", {}, admin),
+    ] + [
+        (f"analytics: {metric}", "GET", f"/admin/api/analytics/{metric}", {}, admin)
+        for metric in ("dashboard", "revenue-trend", "service-popularity",
+                       "conversion-funnel", "booking-analytics", "recent-activities")
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, default=20000, help="products to seed (other tables scale from it)")
+    parser.add_argument("--repeat", type=int, default=5, help="timed requests per route")
+    parser.add_argument("--json", help="write the full report to this path")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="flash_bench_")
+    os.environ["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ["PAYMENTS_PROVIDER"] = "dummy"
+    os.environ["RESPONSE_CACHE_BACKEND"] = "none"  # measure the queries, not page cache hits
+
+    from sqlalchemy import event
+    from app import app
+    from models import db
+
+    with app.app_context():
+        db.create_all()
+        started = time.perf_counter()
+        seed(db, args.rows)
+        print(f"Seeded {args.rows} products in {time.perf_counter() - started:.1f}s ({workdir})")
+        engine = db.engine
+
+    captured = []
+
+    def before(conn, cursor, statement, parameters, context, executemany):
+        conn.info["query_started"] = time.perf_counter()
+
+    def after(conn, cursor, statement, parameters, context, executemany):
+        captured.append((statement, parameters, time.perf_counter() - conn.info.pop("query_started")))
+
+    event.listen(engine, "before_cursor_execute", before)
+    event.listen(engine, "after_cursor_execute", after)
+
+    report, failures = [], []
+    client = app.test_client()
+    for label, method, url, kwargs, session_data in routes(client):
+        with client.session_transaction() as sess:
+            sess.clear()
+            sess.update(session_data or {})
+
+        client.open(url, method=method, **kwargs)  # warm caches
+        timings = []
+        for _ in range(args.repeat):
+            captured.clear()
+            started = time.perf_counter()
+            response = client.open(url, method=method, **kwargs)
+            timings.append((time.perf_counter() - started) * 1000)
+        statements = list(captured)
+
+        queries = []
+        with engine.connect() as conn:
+            for statement, parameters, elapsed in statements:
+                if not statement.lstrip().upper().startswith("SELECT"):
+                    continue
+                plan = [row[-1] for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)]
+                scans = [m.group(1) for m in (SCAN_RE.match(line) for line in plan) if m]
+                bad = sorted({t for t in scans if t in WATCHED_TABLES and (label, t) not in ALLOWED_SCANS})
+                queries.append({"sql": " ".join(statement.split()), "ms": round(elapsed * 1000, 3),
+                                "plan": plan, "full_scans": bad})
+                failures.extend((label, t, " ".join(statement.split())[:160]) for t in bad)
+
+        report.append({"route": label, "url": url, "status": response.status_code,
+                       "median_ms": round(statistics.median(timings), 2),
+                       "queries": len(statements), "selects": queries})
+        flag = "FULL SCAN" if any(q["full_scans"] for q in queries) else "ok"
+        print(f"{label:32} {response.status_code}  {statistics.median(timings):8.2f} ms  "
+              f"{len(statements):3d} queries  {flag}")
+
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(report, fh, indent=2)
+
+    if failures:
+        print("\nUnexpected full table scans:")
+        for label, table, sql in failures:
+            print(f"  [{label}] {table}: {sql}")
+        return 1
+    print("\nNo unexpected full table scans.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
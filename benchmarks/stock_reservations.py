@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Concurrent checkout oversell benchmark
+
+Starts many threads that all POST /payment/create-intent for the same
+product at once and checks that the number of accepted orders never
+exceeds the stock, that stock never goes negative and that the reserved
+quantities account for every unit sold. Then expires half of the orders
+and checks that exactly their stock is returned.
+
+Runs on a throwaway SQLite database by default; pass --url to run against
+another database (e.g. PostgreSQL), which will be modified.
+
+Usage:
+    python benchmarks/stock_reservations.py [--stock 50] [--buyers 400] [--threads 64] [--url URL]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--stock", type=int, default=50, help="units available")
+    parser.add_argument("--buyers", type=int, default=400, help="concurrent checkout attempts")
+    parser.add_argument("--threads", type=int, default=64, help="worker threads")
+    parser.add_argument("--url", help="database URL (default: temporary SQLite file)")
+    args = parser.parse_args()
+
+    if args.url:
+        os.environ["SQLALCHEMY_DATABASE_URI"] = args.url
+    else:
+        workdir = tempfile.mkdtemp(prefix="flash_bench_")
+        os.environ["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ["PAYMENTS_PROVIDER"] = "dummy"
+
+    from app import app
+    from models import db, Order, Product, StockReservation
+
+    with app.app_context():
+        db.create_all()
+        product = Product(title="Limited print", description="Bench", price_cents=5000,
+                          media_key="limited.jpg", stock=args.stock)
+        db.session.add(product)
+        db.session.commit()
+        product_id = product.id
+
+    def buy(i):
+        client = app.test_client()
+        response = client.post("/payment/create-intent", json={
+            "email": f"buyer{i}@example.com", "items": [{"product_id": product_id, "quantity": 1}],
+        })
+        return response.status_code
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        statuses = Counter(pool.map(buy, range(args.buyers)))
+    elapsed = time.perf_counter() - started
+
+    failures = []
+    with app.app_context():
+        stock = db.session.get(Product, product_id).stock
+        reserved = db.session.query(db.func.coalesce(db.func.sum(StockReservation.quantity), 0)) \
+            .filter(StockReservation.product_id == product_id).scalar()
+        orders = [o.id for o in Order.query.filter(Order.stripe_payment_intent.isnot(None)).order_by(Order.id)]
+
+        print(f"{args.buyers} checkouts on {args.threads} threads in {elapsed:.2f}s "
+              f"({args.buyers / elapsed:.0f}/s): {dict(statuses)}")
+        print(f"stock left {stock}, reserved {reserved}, orders {len(orders)}")
+        if stock < 0:
+            failures.append("stock went negative")
+        if statuses[201] != len(orders) or len(orders) > args.stock:
+            failures.append(f"oversold: {len(orders)} orders for {args.stock} units")
+        if stock + reserved != args.stock:
+            failures.append(f"stock {stock} + reserved {reserved} != {args.stock}")
+        if set(statuses) - {201, 409}:
+            failures.append(f"unexpected responses {dict(statuses)}")
+
+        # Expire half of the orders and make sure exactly their units come back
+        expired = orders[::2]
+        for order in Order.query.filter(Order.id.in_(expired)):
+            order.status = "expired"
+        db.session.commit()
+        returned = db.session.get(Product, product_id).stock - stock
+        print(f"expired {len(expired)} orders, {returned} units returned")
+        if returned != len(expired):
+            failures.append(f"expected {len(expired)} units back, got {returned}")
+
+    if failures:
+        print("\nFAILED:\n  " + "\n  ".join(failures))
+        return 1
+    print("\nNo oversell.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Payment webhook burst benchmark
+
+Posts a burst of signed fake Stripe events (a failed attempt followed by a
+success for every payment intent, plus one redelivery each) to
+/payment/webhook from many threads, reports the endpoint latency, then
+waits for the webhook worker pool to drain the inbox and checks that:
+
+    every order ends up paid
+    redelivered events were not stored twice
+    events of each intent were applied in arrival order
+
+Runs against a throwaway SQLite database.
+
+Usage:
+    python benchmarks/webhook_burst.py [--intents 200] [--threads 32] [--workers 4]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SECRET = "whsec_bench"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--intents", type=int, default=200, help="payment intents (orders)")
+    parser.add_argument("--threads", type=int, default=32, help="posting threads")
+    parser.add_argument("--workers", type=int, default=4, help="webhook worker threads")
+    parser.add_argument("--timeout", type=float, default=120, help="seconds to wait for the drain")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="flash_bench_")
+    os.environ["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ["STRIPE_WEBHOOK_SECRET"] = SECRET
+    os.environ["WEBHOOK_WORKERS"] = str(args.workers)
+    os.environ["WEBHOOK_POLL_INTERVAL"] = "0.2"
+
+    from app import app
+    from models import db, Order, WebhookEvent
+    from utils.webhooks import fake_event, sign_payload, webhook_inbox
+
+    with app.app_context():
+        db.create_all()
+        orders = [Order(email=f"hook{i}@example.com", amount_cents=1000, currency="sgd",
+                        status="pending", stripe_payment_intent=f"pi_bench_{i}") for i in range(args.intents)]
+        db.session.add_all(orders)
+        db.session.commit()
+        intents = [order.stripe_payment_intent for order in orders]
+    webhook_inbox.start(app)
+
+    events = [fake_event("payment_intent.payment_failed", intent) for intent in intents]
+    events += [fake_event("payment_intent.succeeded", intent) for intent in intents]
+    events += events[len(intents):]  # redeliveries
+
+    def post(event):
+        body = json.dumps(event).encode()
+        client = app.test_client()
+        started = time.perf_counter()
+        response = client.post("/payment/webhook", data=body, content_type="application/json",
+                               headers={"Stripe-Signature": sign_payload(body, SECRET)})
+        return response.status_code, (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        results = list(pool.map(post, events))
+    posted = time.perf_counter() - started
+    latencies = sorted(ms for _, ms in results)
+    print(f"{len(events)} webhooks on {args.threads} threads in {posted:.2f}s; "
+          f"p50 {statistics.median(latencies):.1f} ms, p99 {latencies[int(len(latencies) * 0.99) - 1]:.1f} ms")
+
+    failures = [f"status {code}" for code, _ in results if code != 200][:5]
+    with app.app_context():
+        deadline = time.monotonic() + args.timeout
+        while WebhookEvent.query.filter(WebhookEvent.status.in_(("pending", "processing"))).count():
+            if time.monotonic() > deadline:
+                failures.append("inbox not drained before timeout")
+                break
+            time.sleep(0.2)
+            db.session.remove()
+        drained = time.perf_counter() - started
+        stored = WebhookEvent.query.count()
+        paid = Order.query.filter(Order.status == "paid").count()
+        print(f"inbox drained by {args.workers} workers after {drained:.2f}s: "
+              f"{stored} stored events, {paid}/{args.intents} orders paid")
+
+        if stored != 2 * args.intents:
+            failures.append(f"expected {2 * args.intents} stored events, found {stored}")
+        if paid != args.intents:
+            failures.append(f"{args.intents - paid} orders not paid")
+        out_of_order = 0
+        for intent in intents:
+            applied = WebhookEvent.query.filter_by(intent_key=intent).order_by(WebhookEvent.id).all()
+            times = [event.processed_at for event in applied]
+            if None in times or times != sorted(times):
+                out_of_order += 1
+        if out_of_order:
+            failures.append(f"{out_of_order} intents applied out of order")
+
+    if failures:
+        print("\nFAILED:\n  " + "\n  ".join(failures))
+        return 1
+    print("\nAll events applied once, in order.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,142 @@
+"""Flask CLI commands for maintenance jobs
+
+Registered on the app in app.py, e.g. ``flask search rebuild``.
+"""
+
+import click
+from flask.cli import AppGroup
+
+search_cli = AppGroup("search", help="Product search index maintenance.")
+
+
+@search_cli.command("rebuild")
+def rebuild_search_index():
+    """Drop and rebuild the product full-text index."""
+    from utils.search import product_search
+
+    count = product_search.rebuild()
+    click.echo(f"Indexed {count} products.")
+
+
+reviews_cli = AppGroup("reviews", help="Review and rating summary maintenance.")
+
+
+@reviews_cli.command("reconcile")
+def reconcile_rating_summaries():
+    """Recompute per-product rating summaries from the review table."""
+    from models import ProductRatingSummary
+
+    repaired = ProductRatingSummary.reconcile()
+    click.echo(f"Repaired {repaired} rating summaries.")
+
+
+orders_cli = AppGroup("orders", help="Order maintenance jobs.")
+
+
+@orders_cli.command("backfill-purchases")
+def backfill_purchases():
+    """Add purchase-ledger rows for every historical paid order."""
+    from models import ProductPurchase
+
+    added = ProductPurchase.backfill()
+    click.echo(f"Added {added} purchase ledger rows.")
+
+
+@orders_cli.command("reap")
+def reap_orders():
+    """Expire pending/created orders older than ORDER_PENDING_TTL_MINUTES."""
+    from flask import current_app
+    from utils.checkout import order_reaper
+
+    expired = order_reaper.reap(current_app.config)
+    click.echo(f"Expired {expired} abandoned orders.")
+
+
+carts_cli = AppGroup("carts", help="Server-side cart maintenance.")
+
+
+@carts_cli.command("purge")
+def purge_carts():
+    """Delete carts whose TTL has passed."""
+    from utils.cart_store import cart_store
+
+    purged = cart_store.backend.purge_expired()
+    click.echo(f"Purged {purged} expired carts.")
+
+
+bookings_cli = AppGroup("bookings", help="Booking calendar maintenance.")
+
+
+@bookings_cli.command("rebuild-calendar")
+def rebuild_booking_calendar():
+    """Recompute the per-day booking calendar summaries."""
+    from utils.booking_calendar import booking_calendar
+
+    days = booking_calendar.rebuild()
+    click.echo(f"Summarised {days} booking days.")
+
+
+@bookings_cli.command("rebuild-claims")
+def rebuild_slot_claims():
+    """Re-claim the slots of every active booking, reporting overlaps."""
+    from utils.booking_claims import slot_claims
+
+    clashes = slot_claims.rebuild()
+    for booking_id, day in clashes:
+        click.echo(f"Booking {booking_id} overlaps an earlier booking on {day}.")
+    click.echo(f"Rebuilt slot claims with {len(clashes)} overlapping bookings.")
+
+
+payments_cli = AppGroup("payments", help="Payment webhook maintenance.")
+
+
+@payments_cli.command("process-webhooks")
+@click.option("--limit", type=int, default=None, help="Stop after this many events.")
+def process_webhooks(limit):
+    """Apply queued webhook events in this process."""
+    from flask import current_app
+    from utils.webhooks import webhook_inbox
+
+    handled = webhook_inbox.drain(current_app.config, limit)
+    click.echo(f"Handled {handled} webhook events.")
+
+
+emails_cli = AppGroup("emails", help="Transactional email outbox.")
+
+
+@emails_cli.command("process-outbox")
+@click.option("--limit", type=int, default=None, help="Stop after this many emails.")
+def process_outbox(limit):
+    """Send due emails from the outbox in this process."""
+    from flask import current_app
+    from utils.email_outbox import email_outbox
+
+    handled = email_outbox.drain(current_app.config, limit)
+    click.echo(f"Attempted {handled} emails.")
+
+
+@emails_cli.command("requeue-dead")
+def requeue_dead():
+    """Retry every dead-lettered email from scratch."""
+    from utils.email_outbox import email_outbox
+
+    click.echo(f"Requeued {email_outbox.requeue_dead()} dead emails.")
+
+
+analytics_cli = AppGroup("analytics", help="Dashboard metrics rollup.")
+
+
+@analytics_cli.command("rebuild-daily")
+@click.option("--days", type=int, default=None,
+              help="Days back to recompute (default: DAILY_METRICS_REBUILD_DAYS).")
+@click.option("--all", "everything", is_flag=True, help="Backfill the whole history.")
+def rebuild_daily_metrics(days, everything):
+    """Recompute daily_metrics from the raw tables and compact zero rows."""
+    from utils.daily_metrics import daily_metrics
+
+    written, corrected = daily_metrics.nightly(0 if everything else days)
+    click.echo(f"Wrote {written} daily metric rows ({corrected} corrected).")
+
+
+ALL_COMMANDS = (search_cli, reviews_cli, orders_cli, carts_cli, bookings_cli, payments_cli, emails_cli,
+                analytics_cli)
@@ -10,6 +10,57 @@ class Config:
     )
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # Cache invalidation: how long (seconds) a worker trusts its snapshot of
+    # the shared cache_version counters before re-reading them
+    CACHE_VERSION_TTL = float(os.getenv("CACHE_VERSION_TTL", "1.0"))
+
+    # List pages: default rows per page and the upper bound for ?per_page=
+    PAGE_SIZE = int(os.getenv("PAGE_SIZE", "25"))
+    PAGE_SIZE_MAX = int(os.getenv("PAGE_SIZE_MAX", "100"))
+    REVIEWS_PER_PAGE = int(os.getenv("REVIEWS_PER_PAGE", "10"))
+
+    # Public page cache for anonymous visitors: 'memory' (per-worker LRU),
+    # 'filesystem' (shared directory), 'redis' (needs the redis package) or 'none'
+    RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory")
+    RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "300"))
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "512"))
+    RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+    RESPONSE_CACHE_DIR = os.getenv("RESPONSE_CACHE_DIR", "instance/page_cache")
+    RESPONSE_CACHE_REDIS_URL = os.getenv("RESPONSE_CACHE_REDIS_URL", "redis://localhost:6379/0")
+
+    # Admin analytics API results: fresh for ANALYTICS_CACHE_TTL seconds (0
+    # disables), then served stale for ANALYTICS_CACHE_STALE seconds more
+    # while one background refresh recomputes them
+    ANALYTICS_CACHE_TTL = int(os.getenv("ANALYTICS_CACHE_TTL", "30"))
+    ANALYTICS_CACHE_STALE = int(os.getenv("ANALYTICS_CACHE_STALE", "120"))
+    ANALYTICS_CACHE_MAX_ENTRIES = int(os.getenv("ANALYTICS_CACHE_MAX_ENTRIES", "256"))
+
+    # Server-side carts: 'sql' (cart tables), 'memory' (per-worker) or 'redis'
+    CART_BACKEND = os.getenv("CART_BACKEND", "sql")
+    CART_TTL_DAYS = int(os.getenv("CART_TTL_DAYS", "30"))
+    CART_REDIS_URL = os.getenv("CART_REDIS_URL", "redis://localhost:6379/0")
+
+    # Abandoned checkouts: pending/created orders older than the TTL are
+    # expired in batches every ORDER_REAPER_INTERVAL seconds (0 disables)
+    ORDER_PENDING_TTL_MINUTES = int(os.getenv("ORDER_PENDING_TTL_MINUTES", "120"))
+    ORDER_REAPER_INTERVAL = int(os.getenv("ORDER_REAPER_INTERVAL", "300"))
+    ORDER_REAPER_BATCH = int(os.getenv("ORDER_REAPER_BATCH", "500"))
+    ORDER_REAPER_MAX_BATCHES = int(os.getenv("ORDER_REAPER_MAX_BATCHES", "20"))
+
+    # Booking conflict checks are served from a per-worker index of this
+    # many days ahead; dates beyond it are loaded on demand
+    BOOKING_INDEX_DAYS = int(os.getenv("BOOKING_INDEX_DAYS", "120"))
+    # Bookable start times offered per day, and the longest range one
+    # /api/availability request may cover
+    BOOKING_DAY_START = os.getenv("BOOKING_DAY_START", "09:00")
+    BOOKING_LAST_START = os.getenv("BOOKING_LAST_START", "17:00")
+    BOOKING_SLOT_MINUTES = int(os.getenv("BOOKING_SLOT_MINUTES", "60"))
+    BOOKING_AVAILABILITY_MAX_DAYS = int(os.getenv("BOOKING_AVAILABILITY_MAX_DAYS", "92"))
+
+    # Dashboard figures come from the daily_metrics rollup; the nightly job
+    # recomputes this many recent days from the raw tables
+    DAILY_METRICS_REBUILD_DAYS = int(os.getenv("DAILY_METRICS_REBUILD_DAYS", "3"))
+
     # Admin credentials
     ADMIN_USERNAME = os.getenv("ADMIN_USERNAME", "admin")
     ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD", "admin")
@@ -20,6 +71,13 @@ class Config:
     # Payments configuration
     PAYMENTS_PROVIDER = os.getenv("PAYMENTS_PROVIDER", "stripe")  # 'dummy' or 'stripe'
     
+    # Dummy provider intents: 'sql' (shared table, works across workers) or
+    # 'memory' (per-process LRU); expired intents are swept every interval (0 disables)
+    DUMMY_INTENT_STORE = os.getenv("DUMMY_INTENT_STORE", "sql")
+    DUMMY_INTENT_TTL_SECONDS = int(os.getenv("DUMMY_INTENT_TTL_SECONDS", "1800"))
+    DUMMY_INTENT_MAX_ENTRIES = int(os.getenv("DUMMY_INTENT_MAX_ENTRIES", "10000"))
+    DUMMY_INTENT_SWEEP_INTERVAL = int(os.getenv("DUMMY_INTENT_SWEEP_INTERVAL", "60"))
+    
     # Stripe Configuration (Test Mode)
     STRIPE_PUBLISHABLE_KEY = os.getenv(
         "STRIPE_PUBLISHABLE_KEY", 
@@ -30,8 +88,32 @@ class Config:
         "sk_test_51234567890abcdefghijklmnopqrstuvwxyz1234567890"  # Fake test key
     )
     
+    # Checkout sessions are simulated unless STRIPE_CHECKOUT_MODE is 'live'
+    STRIPE_CHECKOUT_MODE = os.getenv("STRIPE_CHECKOUT_MODE", "fake")
+
+    # Payment client: one pooled keep-alive session for the Stripe API,
+    # retries with jittered backoff within a total deadline, and a circuit
+    # breaker that opens after consecutive failures
+    STRIPE_API_BASE = os.getenv("STRIPE_API_BASE", "https://api.stripe.com")
+    PAYMENT_POOL_SIZE = int(os.getenv("PAYMENT_POOL_SIZE", "10"))
+    PAYMENT_CONNECT_TIMEOUT = float(os.getenv("PAYMENT_CONNECT_TIMEOUT", "3.05"))
+    PAYMENT_READ_TIMEOUT = float(os.getenv("PAYMENT_READ_TIMEOUT", "10"))
+    PAYMENT_DEADLINE_SECONDS = float(os.getenv("PAYMENT_DEADLINE_SECONDS", "20"))
+    PAYMENT_MAX_RETRIES = int(os.getenv("PAYMENT_MAX_RETRIES", "3"))
+    PAYMENT_BACKOFF_BASE = float(os.getenv("PAYMENT_BACKOFF_BASE", "0.25"))
+    PAYMENT_BACKOFF_CAP = float(os.getenv("PAYMENT_BACKOFF_CAP", "4.0"))
+    PAYMENT_BREAKER_THRESHOLD = int(os.getenv("PAYMENT_BREAKER_THRESHOLD", "5"))
+    PAYMENT_BREAKER_RESET_SECONDS = float(os.getenv("PAYMENT_BREAKER_RESET_SECONDS", "30"))
+
     # Stripe Webhook Configuration
     STRIPE_WEBHOOK_SECRET = os.getenv("STRIPE_WEBHOOK_SECRET")
+    # Verified webhooks are queued in webhook_event and applied by this many
+    # threads per process (0: only via 'flask payments process-webhooks')
+    WEBHOOK_SIGNATURE_TOLERANCE = int(os.getenv("WEBHOOK_SIGNATURE_TOLERANCE", "300"))
+    WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "2"))
+    WEBHOOK_POLL_INTERVAL = float(os.getenv("WEBHOOK_POLL_INTERVAL", "2.0"))
+    WEBHOOK_LEASE_SECONDS = int(os.getenv("WEBHOOK_LEASE_SECONDS", "60"))
+    WEBHOOK_MAX_ATTEMPTS = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "8"))
     
     # Payment Settings
     CURRENCY = os.getenv("CURRENCY", "sgd")
@@ -43,3 +125,17 @@ class Config:
         "EMAIL_FUNCTION_URL", 
         "https://flashstudio-functions.azurewebsites.net/api/EmailNotifications"
     )
+    # Emails are queued in email_outbox with the order change and sent by this
+    # many threads per process (0: only via 'flask emails process-outbox');
+    # failed sends back off exponentially and go dead after the last attempt
+    EMAIL_WORKERS = int(os.getenv("EMAIL_WORKERS", "2"))
+    EMAIL_POLL_INTERVAL = float(os.getenv("EMAIL_POLL_INTERVAL", "5.0"))
+    EMAIL_SEND_TIMEOUT = float(os.getenv("EMAIL_SEND_TIMEOUT", "10"))
+    EMAIL_LEASE_SECONDS = int(os.getenv("EMAIL_LEASE_SECONDS", "120"))
+    EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", "8"))
+    EMAIL_RETRY_BASE_SECONDS = float(os.getenv("EMAIL_RETRY_BASE_SECONDS", "30"))
+    EMAIL_RETRY_MAX_SECONDS = float(os.getenv("EMAIL_RETRY_MAX_SECONDS", "3600"))
+    # Keep-alive connections to the email function per process, and how many
+    # queued emails go out as one JSON-array request (1: one email per request)
+    EMAIL_POOL_SIZE = int(os.getenv("EMAIL_POOL_SIZE", "8"))
+    EMAIL_BATCH_SIZE = int(os.getenv("EMAIL_BATCH_SIZE", "1"))
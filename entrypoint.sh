@@ -22,4 +22,4 @@ except Exception as e:
 PY
 
 # start Gunicorn on port 8000
-exec gunicorn -b 0.0.0.0:8000 app:app --workers 2 --threads 4 --timeout 60
+exec gunicorn -b 0.0.0.0:8000 wsgi:app --workers 2 --threads 4 --timeout 60
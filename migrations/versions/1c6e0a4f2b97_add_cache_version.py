@@ -0,0 +1,33 @@
+"""add cache_version
+
+Shared counters that writers bump in the same transaction as their change,
+so every worker notices when its cached catalog data is stale.
+
+Revision ID: 1c6e0a4f2b97
+Revises: 
+Create Date: 2026-10-16 08:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1c6e0a4f2b97'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'cache_version',
+        sa.Column('name', sa.String(length=64), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('name'),
+        if_not_exists=True
+    )
+
+
+def downgrade():
+    op.drop_table('cache_version', if_exists=True)
@@ -0,0 +1,49 @@
+"""add hot path indexes
+
+Composite indexes for the filters and orderings issued by the public and
+admin routes (see benchmarks/query_plans.py).
+
+Revision ID: 3f1c9a2b7d10
+Revises: 1c6e0a4f2b97
+Create Date: 2026-10-16 09:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c9a2b7d10'
+down_revision = '1c6e0a4f2b97'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = (
+    ('ix_product_featured_created_at', 'product', ['featured', 'created_at']),
+    ('ix_product_category', 'product', ['category']),
+    ('ix_product_created_at_id', 'product', ['created_at', 'id']),
+    ('ix_order_status_created_at', 'order', ['status', 'created_at']),
+    ('ix_order_created_at_id', 'order', ['created_at', 'id']),
+    ('ix_order_user_id_created_at', 'order', ['user_id', 'created_at']),
+    ('ix_order_stripe_payment_intent', 'order', ['stripe_payment_intent']),
+    ('ix_order_item_order_id', 'order_item', ['order_id']),
+    ('ix_order_item_product_id', 'order_item', ['product_id']),
+    ('ix_quote_request_status_created_at', 'quote_request', ['status', 'created_at']),
+    ('ix_quote_request_created_at_id', 'quote_request', ['created_at', 'id']),
+    ('ix_quote_request_service_type', 'quote_request', ['service_type']),
+    ('ix_booking_date_status_start', 'booking', ['booking_date', 'status', 'start_time']),
+    ('ix_booking_created_at', 'booking', ['created_at']),
+    ('ix_review_product_id_approved', 'review', ['product_id', 'approved']),
+    ('ix_review_created_at_id', 'review', ['created_at', 'id']),
+    ('ix_review_user_id', 'review', ['user_id']),
+)
+
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, unique=False, if_not_exists=True)
+
+
+def downgrade():
+    for name, table, columns in reversed(INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True)
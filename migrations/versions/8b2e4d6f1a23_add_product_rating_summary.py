@@ -0,0 +1,51 @@
+"""add product rating summary
+
+Denormalized approved-review counters per product, backfilled from the
+review table. Kept current by Review write events; `flask reviews
+reconcile` repairs drift.
+
+Revision ID: 8b2e4d6f1a23
+Revises: 3f1c9a2b7d10
+Create Date: 2026-10-16 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b2e4d6f1a23'
+down_revision = '3f1c9a2b7d10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'product_rating_summary',
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('review_count', sa.Integer(), nullable=False),
+        sa.Column('rating_sum', sa.Integer(), nullable=False),
+        sa.Column('stars_1', sa.Integer(), nullable=False),
+        sa.Column('stars_2', sa.Integer(), nullable=False),
+        sa.Column('stars_3', sa.Integer(), nullable=False),
+        sa.Column('stars_4', sa.Integer(), nullable=False),
+        sa.Column('stars_5', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['product_id'], ['product.id'], ),
+        sa.PrimaryKeyConstraint('product_id')
+    )
+    op.execute(
+        "INSERT INTO product_rating_summary "
+        "(product_id, review_count, rating_sum, stars_1, stars_2, stars_3, stars_4, stars_5) "
+        "SELECT product_id, COUNT(id), SUM(rating), "
+        "SUM(CASE WHEN rating = 1 THEN 1 ELSE 0 END), "
+        "SUM(CASE WHEN rating = 2 THEN 1 ELSE 0 END), "
+        "SUM(CASE WHEN rating = 3 THEN 1 ELSE 0 END), "
+        "SUM(CASE WHEN rating = 4 THEN 1 ELSE 0 END), "
+        "SUM(CASE WHEN rating = 5 THEN 1 ELSE 0 END) "
+        "FROM review WHERE approved GROUP BY product_id"
+    )
+
+
+def downgrade():
+    op.drop_table('product_rating_summary')
@@ -0,0 +1,46 @@
+"""add webhook inbox
+
+Verified payment webhook events are stored in webhook_event and applied
+to orders by a worker pool, deduplicated by event id.
+
+Revision ID: a3f7c9e2d584
+Revises: f6b1d3e8a920
+Create Date: 2026-10-16 17:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3f7c9e2d584'
+down_revision = 'f6b1d3e8a920'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'webhook_event',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('event_id', sa.String(length=255), nullable=False),
+        sa.Column('event_type', sa.String(length=128), nullable=False),
+        sa.Column('intent_key', sa.String(length=255), nullable=False),
+        sa.Column('payload', sa.Text(), nullable=False),
+        sa.Column('status', sa.String(length=16), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('locked_until', sa.DateTime(), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('received_at', sa.DateTime(), nullable=True),
+        sa.Column('processed_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('event_id', name='uq_webhook_event_event_id')
+    )
+    op.create_index('ix_webhook_event_status_id', 'webhook_event', ['status', 'id'], unique=False)
+    op.create_index('ix_webhook_event_intent_key_id', 'webhook_event', ['intent_key', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_webhook_event_intent_key_id', table_name='webhook_event')
+    op.drop_index('ix_webhook_event_status_id', table_name='webhook_event')
+    op.drop_table('webhook_event')
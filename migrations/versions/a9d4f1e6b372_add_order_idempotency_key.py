@@ -0,0 +1,31 @@
+"""add order idempotency key
+
+Checkout retries of the same cart reuse the open order carrying this key.
+The key is cleared once the order is paid, failed or expired.
+
+Revision ID: a9d4f1e6b372
+Revises: f2b8d6a4c019
+Create Date: 2026-10-16 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9d4f1e6b372'
+down_revision = 'f2b8d6a4c019'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('order', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('idempotency_key', sa.String(length=64), nullable=True))
+        batch_op.create_unique_constraint('uq_order_idempotency_key', ['idempotency_key'])
+
+
+def downgrade():
+    with op.batch_alter_table('order', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_order_idempotency_key', type_='unique')
+        batch_op.drop_column('idempotency_key')
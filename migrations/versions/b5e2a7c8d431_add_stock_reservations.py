@@ -0,0 +1,41 @@
+"""add stock reservations
+
+Unpaid orders hold stock through stock_reservation rows until they are
+paid (rows dropped) or fail, are cancelled or expire (stock returned).
+
+Revision ID: b5e2a7c8d431
+Revises: a9d4f1e6b372
+Create Date: 2026-10-16 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5e2a7c8d431'
+down_revision = 'a9d4f1e6b372'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'stock_reservation',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('order_id', sa.Integer(), nullable=False),
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('quantity', sa.Integer(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['order_id'], ['order.id'], ),
+        sa.ForeignKeyConstraint(['product_id'], ['product.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_stock_reservation_order_id', 'stock_reservation', ['order_id'], unique=False)
+    op.create_index('ix_stock_reservation_expires_at', 'stock_reservation', ['expires_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_stock_reservation_expires_at', table_name='stock_reservation')
+    op.drop_index('ix_stock_reservation_order_id', table_name='stock_reservation')
+    op.drop_table('stock_reservation')
@@ -0,0 +1,46 @@
+"""add email outbox
+
+Transactional emails are queued in email_outbox in the same transaction
+as the order change that triggers them and sent by a worker pool.
+
+Revision ID: b7d2e4f9c316
+Revises: a3f7c9e2d584
+Create Date: 2026-10-16 18:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d2e4f9c316'
+down_revision = 'a3f7c9e2d584'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'email_outbox',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.String(length=32), nullable=False),
+        sa.Column('order_id', sa.Integer(), nullable=True),
+        sa.Column('recipient', sa.String(length=255), nullable=False),
+        sa.Column('payload', sa.Text(), nullable=False),
+        sa.Column('status', sa.String(length=16), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('sent_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['order_id'], ['order.id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_email_outbox_status_next_attempt', 'email_outbox', ['status', 'next_attempt_at'], unique=False)
+    op.create_index(op.f('ix_email_outbox_order_id'), 'email_outbox', ['order_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_email_outbox_order_id'), table_name='email_outbox')
+    op.drop_index('ix_email_outbox_status_next_attempt', table_name='email_outbox')
+    op.drop_table('email_outbox')
@@ -0,0 +1,45 @@
+"""add product purchase ledger
+
+One row per (user, product) with at least one paid order, used for
+verified-purchase checks on reviews. Backfilled from historical paid
+orders; `flask orders backfill-purchases` performs the same backfill.
+
+Revision ID: c41d7e9a0b56
+Revises: 8b2e4d6f1a23
+Create Date: 2026-10-16 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41d7e9a0b56'
+down_revision = '8b2e4d6f1a23'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'product_purchase',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('first_order_id', sa.Integer(), nullable=True),
+        sa.Column('purchased_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['first_order_id'], ['order.id'], ),
+        sa.ForeignKeyConstraint(['product_id'], ['product.id'], ),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('user_id', 'product_id')
+    )
+    op.execute(
+        'INSERT INTO product_purchase (user_id, product_id, first_order_id, purchased_at) '
+        'SELECT o.user_id, oi.product_id, MIN(o.id), MIN(o.created_at) '
+        'FROM "order" o JOIN order_item oi ON oi.order_id = o.id '
+        "WHERE o.status = 'paid' AND o.user_id IS NOT NULL "
+        'GROUP BY o.user_id, oi.product_id'
+    )
+
+
+def downgrade():
+    op.drop_table('product_purchase')
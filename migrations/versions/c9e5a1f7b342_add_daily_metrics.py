@@ -0,0 +1,59 @@
+"""add daily metrics rollup
+
+Per-day dashboard figures keyed by (day, metric, dimension), updated on
+every order, quote request and booking write. Backfilled from the existing
+rows, mirroring ``DailyMetrics._raw_figures``.
+
+Revision ID: c9e5a1f7b342
+Revises: b7d2e4f9c316
+Create Date: 2026-10-16 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c9e5a1f7b342'
+down_revision = 'b7d2e4f9c316'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'daily_metrics',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('metric', sa.String(length=32), nullable=False),
+        sa.Column('dimension', sa.String(length=128), nullable=False),
+        sa.Column('value', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('day', 'metric', 'dimension')
+    )
+    op.create_index('ix_daily_metrics_metric_day', 'daily_metrics', ['metric', 'day'], unique=False)
+
+    # Seed the rollup from the existing rows (the same figures as
+    # DailyMetrics._raw_figures); the write listeners keep it current afterwards
+    created_day = "date(created_at)" if op.get_bind().dialect.name == 'sqlite' else "CAST(created_at AS DATE)"
+    status = "COALESCE(status, '')"
+    for metric, table, day, dimension, value, condition in (
+        ('paid_revenue', '"order"', created_day, None, 'SUM(amount_cents)', "status = 'paid'"),
+        ('quotes', 'quote_request', created_day, status, 'COUNT(*)', None),
+        ('quote_services', 'quote_request', created_day, 'service_type', 'COUNT(*)', None),
+        ('quote_amount', 'quote_request', created_day, None, 'SUM(quote_amount)', 'quote_amount IS NOT NULL'),
+        ('quotes_priced', 'quote_request', created_day, None, 'COUNT(*)', 'quote_amount IS NOT NULL'),
+        ('bookings', 'booking', created_day, status, 'COUNT(*)', None),
+        ('booking_days', 'booking', 'booking_date', status, 'COUNT(*)', None),
+    ):
+        where = f"{day} IS NOT NULL" + (f" AND {condition}" if condition else "")
+        group_by = f"{day}, {dimension}" if dimension else day
+        dimension = dimension or "''"
+        op.execute(
+            "INSERT INTO daily_metrics (day, metric, dimension, value) "
+            f"SELECT {day}, '{metric}', {dimension}, {value} FROM {table} "
+            f"WHERE {where} GROUP BY {group_by} HAVING {value} <> 0"
+        )
+
+
+def downgrade():
+    op.drop_index('ix_daily_metrics_metric_day', table_name='daily_metrics')
+    op.drop_table('daily_metrics')
@@ -0,0 +1,70 @@
+"""add product search index
+
+Builds the full-text index that utils/search.py queries: an FTS5 table on
+SQLite (when compiled in), a weighted tsvector table with a GIN index on
+PostgreSQL, nothing on other databases. An index an older version built
+lazily is refilled. `flask search rebuild` recreates it at any time.
+
+Revision ID: d3a8f6c1e927
+Revises: c9e5a1f7b342
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3a8f6c1e927'
+down_revision = 'c9e5a1f7b342'
+branch_labels = None
+depends_on = None
+
+
+def _document(title, category, client_name, description):
+    return (
+        f"setweight(to_tsvector('simple', coalesce({title}, '')), 'A') || "
+        f"setweight(to_tsvector('simple', coalesce({category}, '')), 'B') || "
+        f"setweight(to_tsvector('simple', coalesce({client_name}, '')), 'C') || "
+        f"setweight(to_tsvector('simple', coalesce({description}, '')), 'D')"
+    )
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite':
+        if not bind.execute(sa.text("SELECT sqlite_compileoption_used('ENABLE_FTS5')")).scalar():
+            return
+        op.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS product_fts USING fts5("
+            "title, description, category, client_name, "
+            "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+        )
+        op.execute("DELETE FROM product_fts")
+        op.execute(
+            "INSERT INTO product_fts(rowid, title, description, category, client_name) "
+            "SELECT id, title, description, category, client_name FROM product"
+        )
+    elif bind.dialect.name == 'postgresql':
+        op.execute(
+            "CREATE TABLE IF NOT EXISTS product_search ("
+            "product_id INTEGER PRIMARY KEY REFERENCES product(id) ON DELETE CASCADE, "
+            "document TSVECTOR NOT NULL)"
+        )
+        op.execute(
+            "CREATE INDEX IF NOT EXISTS ix_product_search_document "
+            "ON product_search USING GIN (document)"
+        )
+        op.execute("DELETE FROM product_search")
+        op.execute(
+            "INSERT INTO product_search (product_id, document) "
+            f"SELECT id, {_document('title', 'category', 'client_name', 'description')} FROM product"
+        )
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite':
+        op.execute("DROP TABLE IF EXISTS product_fts")
+    elif bind.dialect.name == 'postgresql':
+        op.execute("DROP TABLE IF EXISTS product_search")
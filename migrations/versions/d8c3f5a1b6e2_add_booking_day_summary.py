@@ -0,0 +1,35 @@
+"""add booking day summary
+
+Per-day booking counts and free slots for the booking calendar page,
+refreshed on every booking and availability write. Populate existing
+data with ``flask bookings rebuild-calendar``.
+
+Revision ID: d8c3f5a1b6e2
+Revises: b5e2a7c8d431
+Create Date: 2026-10-16 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd8c3f5a1b6e2'
+down_revision = 'b5e2a7c8d431'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'booking_day_summary',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('booking_count', sa.Integer(), nullable=False),
+        sa.Column('booked_minutes', sa.Integer(), nullable=False),
+        sa.Column('free_slots', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('day')
+    )
+
+
+def downgrade():
+    op.drop_table('booking_day_summary')
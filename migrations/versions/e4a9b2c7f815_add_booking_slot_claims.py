@@ -0,0 +1,37 @@
+"""add booking slot claims
+
+Active bookings hold one booking_slot_claim row per 15-minute step, so an
+overlapping booking fails on the primary key. Claim the slots of existing
+bookings with ``flask bookings rebuild-claims``.
+
+Revision ID: e4a9b2c7f815
+Revises: d8c3f5a1b6e2
+Create Date: 2026-10-16 16:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4a9b2c7f815'
+down_revision = 'd8c3f5a1b6e2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'booking_slot_claim',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('slot_index', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('booking_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['booking_id'], ['booking.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('day', 'slot_index')
+    )
+    op.create_index('ix_booking_slot_claim_booking_id', 'booking_slot_claim', ['booking_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_booking_slot_claim_booking_id', table_name='booking_slot_claim')
+    op.drop_table('booking_slot_claim')
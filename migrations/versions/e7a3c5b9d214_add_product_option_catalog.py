@@ -0,0 +1,44 @@
+"""add product option catalog
+
+Size and frame surcharges move from module-level dicts into the
+product_option table so every worker prices carts identically. Seeded
+with the previous defaults.
+
+Revision ID: e7a3c5b9d214
+Revises: c41d7e9a0b56
+Create Date: 2026-10-16 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7a3c5b9d214'
+down_revision = 'c41d7e9a0b56'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    product_option = op.create_table(
+        'product_option',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.String(length=16), nullable=False),
+        sa.Column('label', sa.String(length=128), nullable=False),
+        sa.Column('price_cents', sa.Integer(), nullable=False),
+        sa.Column('position', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('kind', 'label', name='uq_product_option_kind_label')
+    )
+    op.bulk_insert(product_option, [
+        {'kind': 'size', 'label': '20cm x 30cm', 'price_cents': 0, 'position': 0},
+        {'kind': 'size', 'label': '40cm x 60cm', 'price_cents': 8000, 'position': 1},
+        {'kind': 'frame', 'label': 'No frame', 'price_cents': 0, 'position': 2},
+        {'kind': 'frame', 'label': 'Black', 'price_cents': 2000, 'position': 3},
+        {'kind': 'frame', 'label': 'White', 'price_cents': 2000, 'position': 4},
+    ])
+
+
+def downgrade():
+    op.drop_table('product_option')
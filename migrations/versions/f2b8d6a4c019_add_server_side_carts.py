@@ -0,0 +1,53 @@
+"""add server-side carts
+
+Cart contents move out of the signed session cookie into cart/cart_line;
+the cookie only keeps an opaque cart id. Carts still held in old session
+cookies are not migrated.
+
+Revision ID: f2b8d6a4c019
+Revises: e7a3c5b9d214
+Create Date: 2026-10-16 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2b8d6a4c019'
+down_revision = 'e7a3c5b9d214'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'cart',
+        sa.Column('id', sa.String(length=32), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id')
+    )
+    op.create_index('ix_cart_expires_at', 'cart', ['expires_at'], unique=False)
+    op.create_table(
+        'cart_line',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('cart_id', sa.String(length=32), nullable=False),
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('size', sa.String(length=128), nullable=False),
+        sa.Column('frame', sa.String(length=128), nullable=False),
+        sa.Column('qty', sa.Integer(), nullable=False),
+        sa.Column('unit_price_cents', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['cart_id'], ['cart.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('cart_id', 'product_id', 'size', 'frame', name='uq_cart_line_item')
+    )
+
+
+def downgrade():
+    op.drop_table('cart_line')
+    op.drop_index('ix_cart_expires_at', table_name='cart')
+    op.drop_table('cart')
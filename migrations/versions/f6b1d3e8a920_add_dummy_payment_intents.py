@@ -0,0 +1,40 @@
+"""add dummy payment intents
+
+Intents of the dummy payment provider, shared by every worker so confirm
+works whichever process receives it. Rows are swept once they expire.
+
+Revision ID: f6b1d3e8a920
+Revises: e4a9b2c7f815
+Create Date: 2026-10-16 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f6b1d3e8a920'
+down_revision = 'e4a9b2c7f815'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'dummy_payment_intent',
+        sa.Column('id', sa.String(length=64), nullable=False),
+        sa.Column('amount', sa.Integer(), nullable=False),
+        sa.Column('currency', sa.String(length=16), nullable=False),
+        sa.Column('client_secret', sa.String(length=64), nullable=False),
+        sa.Column('status', sa.String(length=32), nullable=False),
+        sa.Column('metadata_json', sa.Text(), nullable=True),
+        sa.Column('created', sa.Integer(), nullable=False),
+        sa.Column('expires_at', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_dummy_payment_intent_expires_at', 'dummy_payment_intent', ['expires_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_dummy_payment_intent_expires_at', table_name='dummy_payment_intent')
+    op.drop_table('dummy_payment_intent')
@@ -1,12 +1,20 @@
 from datetime import datetime, timedelta, date
 from flask_sqlalchemy import SQLAlchemy
 from werkzeug.security import generate_password_hash, check_password_hash
-from sqlalchemy import func, and_, or_
+from sqlalchemy import func, and_, or_, case, event, inspect as sa_inspect
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import selectinload
 import json
 
 db = SQLAlchemy()
 
 class Product(db.Model):
+    __table_args__ = (
+        db.Index("ix_product_featured_created_at", "featured", "created_at"),
+        db.Index("ix_product_category", "category"),
+        db.Index("ix_product_created_at_id", "created_at", "id"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(255), nullable=False)
     description = db.Column(db.Text)
@@ -83,16 +91,67 @@ class Product(db.Model):
         self.available_frames = json.dumps(value) if value else None
         return bool(self.video_key)
 
+class ProductOption(db.Model):
+    """Print size / frame surcharge offered on products (global catalog)"""
+    __table_args__ = (
+        db.UniqueConstraint("kind", "label", name="uq_product_option_kind_label"),
+    )
+
+    SIZE = "size"
+    FRAME = "frame"
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(16), nullable=False)  # 'size' or 'frame'
+    label = db.Column(db.String(128), nullable=False)
+    price_cents = db.Column(db.Integer, nullable=False, default=0)  # surcharge
+    position = db.Column(db.Integer, nullable=False, default=0)  # display order
+
+    # Seed rows used for new databases
+    DEFAULTS = (
+        (SIZE, "20cm x 30cm", 0),        # base price
+        (SIZE, "40cm x 60cm", 8000),     # +S$ 80.00
+        (FRAME, "No frame", 0),
+        (FRAME, "Black", 2000),          # +S$ 20.00
+        (FRAME, "White", 2000),          # +S$ 20.00
+    )
+
+    @classmethod
+    def seed_defaults(cls):
+        """Insert the default options when the table is empty"""
+        if cls.query.first() is None:
+            for position, (kind, label, price_cents) in enumerate(cls.DEFAULTS):
+                db.session.add(cls(kind=kind, label=label, price_cents=price_cents, position=position))
+            db.session.commit()
+
+
+def _tracked(column):
+    """A column whose old value is loaded before it is overwritten, even on an
+    expired instance, so write listeners can subtract the row's previous
+    figures (see ``previous_value``)
+    """
+    return db.column_property(column, active_history=True)
+
+
 class Order(db.Model):
+    __table_args__ = (
+        db.Index("ix_order_status_created_at", "status", "created_at"),
+        db.Index("ix_order_created_at_id", "created_at", "id"),
+        db.Index("ix_order_user_id_created_at", "user_id", "created_at"),
+        db.Index("ix_order_stripe_payment_intent", "stripe_payment_intent"),
+        db.UniqueConstraint("idempotency_key", name="uq_order_idempotency_key"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(255), nullable=False)
-    amount_cents = db.Column(db.Integer, nullable=False)
+    amount_cents = _tracked(db.Column(db.Integer, nullable=False))
     currency = db.Column(db.String(16), nullable=False, default="usd")
     stripe_payment_intent = db.Column(db.String(255))
-    status = db.Column(db.String(32), default="created")  # created, paid, failed
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    status = _tracked(db.Column(db.String(32), default="created"))  # created, pending, paid, failed, expired
+    created_at = _tracked(db.Column(db.DateTime, default=datetime.utcnow))
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"))
     user = db.relationship("User", backref="orders")
+    # Checkout idempotency key, held only while the order is pending/created
+    idempotency_key = db.Column(db.String(64))
     
     @property
     def total_display(self):
@@ -106,15 +165,95 @@ class Order(db.Model):
     
     @property
     def item_count(self):
-        """Get total number of items in this order"""
-        return sum(item.quantity for item in self.items)
+        """Get total number of items in this order.
+
+        Uses ``items`` when they are already loaded, otherwise the deferred
+        ``items_quantity`` subquery, so listings never load items per order.
+        """
+        if "items" in self.__dict__:
+            return sum(item.quantity or 0 for item in self.items)
+        return self.items_quantity or 0
     
     @property
     def has_items(self):
         """Check if order has any items"""
-        return len(self.items) > 0
+        if "items" in self.__dict__:
+            return len(self.items) > 0
+        return self.item_count > 0
+
+    @staticmethod
+    def with_items():
+        """Loader options for pages that render items: user, items and products in three queries"""
+        return (
+            selectinload(Order.user),
+            selectinload(Order.items).selectinload(OrderItem.product),
+        )
+
+class DummyIntentRecord(db.Model):
+    """Payment intents of the dummy provider, shared by all workers until they expire"""
+    __tablename__ = "dummy_payment_intent"
+    __table_args__ = (
+        db.Index("ix_dummy_payment_intent_expires_at", "expires_at"),
+    )
+
+    id = db.Column(db.String(64), primary_key=True)
+    amount = db.Column(db.Integer, nullable=False)
+    currency = db.Column(db.String(16), nullable=False)
+    client_secret = db.Column(db.String(64), nullable=False)
+    status = db.Column(db.String(32), nullable=False)
+    metadata_json = db.Column(db.Text)
+    created = db.Column(db.Integer, nullable=False)  # Unix timestamps, as in the intent payload
+    expires_at = db.Column(db.Integer, nullable=False)
+
+class WebhookEvent(db.Model):
+    """Inbox of verified payment webhook events, applied to orders by a worker pool"""
+    __table_args__ = (
+        db.UniqueConstraint("event_id", name="uq_webhook_event_event_id"),
+        db.Index("ix_webhook_event_status_id", "status", "id"),
+        db.Index("ix_webhook_event_intent_key_id", "intent_key", "id"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    event_id = db.Column(db.String(255), nullable=False)
+    event_type = db.Column(db.String(128), nullable=False)
+    # Events sharing a key (the payment intent) are applied one at a time, in arrival order
+    intent_key = db.Column(db.String(255), nullable=False)
+    payload = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(16), nullable=False, default="pending")  # pending, processing, processed, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    # Lease of a processing event, or the retry time of a pending one
+    locked_until = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    received_at = db.Column(db.DateTime, default=datetime.utcnow)
+    processed_at = db.Column(db.DateTime)
+
+class EmailOutbox(db.Model):
+    """Transactional emails, committed with the change that triggers them and sent by a worker pool"""
+    __tablename__ = "email_outbox"
+    __table_args__ = (
+        db.Index("ix_email_outbox_status_next_attempt", "status", "next_attempt_at"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(32), nullable=False)  # order_confirmation, payment_failure
+    order_id = db.Column(db.Integer, db.ForeignKey("order.id", ondelete="SET NULL"), index=True)
+    recipient = db.Column(db.String(255), nullable=False)
+    # The EmailNotifications request body, rendered when the email is queued
+    payload = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(16), nullable=False, default="pending")  # pending, sending, sent, dead
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    # Earliest retry of a pending email, or the lease of one being sent
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
 
 class OrderItem(db.Model):
+    __table_args__ = (
+        db.Index("ix_order_item_order_id", "order_id"),
+        db.Index("ix_order_item_product_id", "product_id"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     order_id = db.Column(db.Integer, db.ForeignKey("order.id"), nullable=False)
     product_id = db.Column(db.Integer, db.ForeignKey("product.id"), nullable=False)
@@ -124,6 +263,115 @@ class OrderItem(db.Model):
     order = db.relationship("Order", backref=db.backref("items", lazy=True))
     product = db.relationship("Product")
 
+# Total quantity per order as a correlated SUM; deferred so plain Order loads
+# skip it, undefer(Order.items_quantity) fetches it with the listing query
+Order.items_quantity = db.column_property(
+    db.select(func.coalesce(func.sum(OrderItem.quantity), 0))
+    .where(OrderItem.order_id == Order.id)
+    .correlate_except(OrderItem)
+    .scalar_subquery(),
+    deferred=True,
+)
+
+class ProductPurchase(db.Model):
+    """Ledger of (user, product) pairs with at least one paid order"""
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey("product.id"), primary_key=True)
+    first_order_id = db.Column(db.Integer, db.ForeignKey("order.id"))
+    purchased_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    @classmethod
+    def has_purchased(cls, user_id, product_id):
+        """Single primary-key lookup used for verified-purchase checks"""
+        return db.session.get(cls, (user_id, product_id)) is not None
+
+    @staticmethod
+    def _record_statement(order_filter, dialect_name):
+        """INSERT ... SELECT of missing ledger rows for paid orders matching ``order_filter``"""
+        ledger = ProductPurchase.__table__
+        orders = Order.__table__
+        items = OrderItem.__table__
+        missing = ~db.exists().where(and_(
+            ledger.c.user_id == orders.c.user_id,
+            ledger.c.product_id == items.c.product_id,
+        ))
+        select = db.select(
+            orders.c.user_id,
+            items.c.product_id,
+            func.min(orders.c.id),
+            func.min(orders.c.created_at),
+        ).select_from(
+            orders.join(items, items.c.order_id == orders.c.id)
+        ).where(
+            orders.c.status == "paid",
+            orders.c.user_id.isnot(None),
+            order_filter,
+            missing,
+        ).group_by(orders.c.user_id, items.c.product_id)
+        columns = ["user_id", "product_id", "first_order_id", "purchased_at"]
+        dialect = {"sqlite": sqlite, "postgresql": postgresql}.get(dialect_name)
+        if dialect is None:
+            return ledger.insert().from_select(columns, select)
+        # Two orders paid at once can both pass NOT EXISTS; the loser must not
+        # fail (and roll back) the order status change
+        return dialect.insert(ledger).from_select(columns, select).on_conflict_do_nothing(
+            index_elements=["user_id", "product_id"]
+        )
+
+    @classmethod
+    def record_order(cls, connection, order_id):
+        """Add ledger rows for a paid order inside the caller's transaction"""
+        connection.execute(cls._record_statement(Order.__table__.c.id == order_id, connection.dialect.name))
+
+    @classmethod
+    def backfill(cls):
+        """Populate the ledger from all historical paid orders; returns rows added"""
+        result = db.session.execute(cls._record_statement(db.true(), db.session.get_bind().dialect.name))
+        db.session.commit()
+        return result.rowcount
+
+
+class StockReservation(db.Model):
+    """Stock held for an unpaid order; released if the order never completes"""
+    __table_args__ = (
+        db.Index("ix_stock_reservation_order_id", "order_id"),
+        db.Index("ix_stock_reservation_expires_at", "expires_at"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    order_id = db.Column(db.Integer, db.ForeignKey("order.id"), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey("product.id"), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+
+class Cart(db.Model):
+    """Server-side shopping cart; the session cookie only holds its id"""
+    __table_args__ = (
+        db.Index("ix_cart_expires_at", "expires_at"),
+    )
+
+    id = db.Column(db.String(32), primary_key=True)  # opaque token
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), unique=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+
+class CartLine(db.Model):
+    """One (product, size, frame) line of a cart"""
+    __table_args__ = (
+        db.UniqueConstraint("cart_id", "product_id", "size", "frame", name="uq_cart_line_item"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    cart_id = db.Column(db.String(32), db.ForeignKey("cart.id", ondelete="CASCADE"), nullable=False)
+    product_id = db.Column(db.Integer, nullable=False)
+    size = db.Column(db.String(128), nullable=False)
+    frame = db.Column(db.String(128), nullable=False)
+    qty = db.Column(db.Integer, nullable=False, default=1)
+    unit_price_cents = db.Column(db.Integer, nullable=False)  # captured when added
+
+
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(255), unique=True, nullable=False)
@@ -137,22 +385,28 @@ class User(db.Model):
         return check_password_hash(self.password_hash, password)
 
 class QuoteRequest(db.Model):
+    __table_args__ = (
+        db.Index("ix_quote_request_status_created_at", "status", "created_at"),
+        db.Index("ix_quote_request_created_at_id", "created_at", "id"),
+        db.Index("ix_quote_request_service_type", "service_type"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(255), nullable=False)
     email = db.Column(db.String(255), nullable=False)
     phone = db.Column(db.String(50))
     company = db.Column(db.String(255))
-    service_type = db.Column(db.String(128), nullable=False)
+    service_type = _tracked(db.Column(db.String(128), nullable=False))
     event_date = db.Column(db.Date)
     event_location = db.Column(db.String(255))
     budget_range = db.Column(db.String(64))
     project_description = db.Column(db.Text)
     additional_services = db.Column(db.String(512))  # JSON string for multiple services
     urgent = db.Column(db.Boolean, default=False)
-    status = db.Column(db.String(32), default="pending")  # pending, responded, quoted, closed
+    status = _tracked(db.Column(db.String(32), default="pending"))  # pending, responded, quoted, closed
     admin_notes = db.Column(db.Text)
-    quote_amount = db.Column(db.Integer)  # quote in cents
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    quote_amount = _tracked(db.Column(db.Integer))  # quote in cents
+    created_at = _tracked(db.Column(db.DateTime, default=datetime.utcnow))
     
     @property
     def quote_display(self):
@@ -175,6 +429,11 @@ class ServicePackage(db.Model):
     active = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+class CacheVersion(db.Model):
+    """Named version counters shared by all workers for cache invalidation"""
+    name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
 # Corporate service category constants
 CORPORATE_CATEGORIES = [
     "Wedding Videography",
@@ -187,20 +446,25 @@ CORPORATE_CATEGORIES = [
 ]
 
 class Booking(db.Model):
+    __table_args__ = (
+        db.Index("ix_booking_date_status_start", "booking_date", "status", "start_time"),
+        db.Index("ix_booking_created_at", "created_at"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(255), nullable=False)
     email = db.Column(db.String(255), nullable=False)
     phone = db.Column(db.String(50))
     service_type = db.Column(db.String(128), nullable=False)
-    booking_date = db.Column(db.Date, nullable=False)
+    booking_date = _tracked(db.Column(db.Date, nullable=False))
     start_time = db.Column(db.Time, nullable=False)
     end_time = db.Column(db.Time)
     duration_hours = db.Column(db.Integer, default=1)  # Duration in hours
     location = db.Column(db.String(255))
     notes = db.Column(db.Text)
-    status = db.Column(db.String(32), default="pending")  # pending, confirmed, cancelled, completed
+    status = _tracked(db.Column(db.String(32), default="pending"))  # pending, confirmed, cancelled, completed
     quote_request_id = db.Column(db.Integer, db.ForeignKey("quote_request.id"))  # Link to quote if exists
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = _tracked(db.Column(db.DateTime, default=datetime.utcnow))
     
     quote_request = db.relationship("QuoteRequest", backref="bookings")
     
@@ -233,9 +497,86 @@ class Availability(db.Model):
     notes = db.Column(db.String(255))  # Reason for unavailability
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+class BookingDaySummary(db.Model):
+    """Booking calendar figures per day, refreshed on every Booking/Availability write.
+
+    Days with no active bookings and no blackouts have no row.
+    """
+    day = db.Column(db.Date, primary_key=True)
+    booking_count = db.Column(db.Integer, nullable=False, default=0)
+    booked_minutes = db.Column(db.Integer, nullable=False, default=0)
+    free_slots = db.Column(db.Integer, nullable=False, default=0)
+
+class BookingSlotClaim(db.Model):
+    """One row per 15-minute step held by an active booking; the key makes overlaps fail"""
+    __table_args__ = (
+        db.Index("ix_booking_slot_claim_booking_id", "booking_id"),
+    )
+
+    day = db.Column(db.Date, primary_key=True)
+    slot_index = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    booking_id = db.Column(db.Integer, db.ForeignKey("booking.id", ondelete="CASCADE"), nullable=False)
+
+class DailyMetric(db.Model):
+    """Dashboard figures per day, kept current on every Order/QuoteRequest/Booking write.
+
+    ``metric`` names a figure and ``dimension`` splits it (a status or a
+    service type, '' when unsplit); see utils/daily_metrics.py.
+    """
+    __tablename__ = "daily_metrics"
+    __table_args__ = (
+        db.Index("ix_daily_metrics_metric_day", "metric", "day"),
+    )
+
+    PAID_REVENUE = "paid_revenue"      # cents of paid orders, by order day
+    QUOTES = "quotes"                  # quote requests by day and status
+    QUOTE_SERVICES = "quote_services"  # quote requests by day and service type
+    QUOTE_AMOUNT = "quote_amount"      # sum of quoted cents, by quote day
+    QUOTES_PRICED = "quotes_priced"    # quote requests with a quote amount
+    BOOKINGS = "bookings"              # bookings by creation day and status
+    BOOKING_DAYS = "booking_days"      # bookings by booking date and status
+
+    day = db.Column(db.Date, primary_key=True)
+    metric = db.Column(db.String(32), primary_key=True)
+    dimension = db.Column(db.String(128), primary_key=True, default="")
+    value = db.Column(db.BigInteger, nullable=False, default=0)
+
+
+def _figure(model, aggregate, *conditions):
+    """One dashboard figure as a scalar subquery.
+
+    Each figure keeps its own narrow WHERE, so it is answered from an index
+    (a covering index for most counts) rather than by a CASE over every row;
+    ``Analytics.figures`` sends a whole set of them as one statement.
+    """
+    return db.select(aggregate).select_from(model).where(*conditions).scalar_subquery()
+
+
+def _as_day(value):
+    """``value`` as a date. SQLite compares dates as text, so a datetime bound
+    on DailyMetric.day would leave out the whole of its own day."""
+    return value.date() if isinstance(value, datetime) else value
+
+
+def _metric(metric, dimension=None, first=None, last=None):
+    """Total of a daily_metrics figure over an optional day range, as a ``_figure``"""
+    conditions = [DailyMetric.metric == metric]
+    if dimension is not None:
+        conditions.append(DailyMetric.dimension == dimension)
+    if first is not None:
+        conditions.append(DailyMetric.day >= _as_day(first))
+    if last is not None:
+        conditions.append(DailyMetric.day <= _as_day(last))
+    return _figure(DailyMetric, func.coalesce(func.sum(DailyMetric.value), 0), *conditions)
+
+
 # Analytics Class
 class Analytics:
-    """Analytics helper class for dashboard metrics"""
+    """Analytics helper class for dashboard metrics.
+
+    Figures come from the daily_metrics rollup (utils/daily_metrics.py), so
+    each read is a range scan over per-day rows rather than the raw tables.
+    """
     
     @staticmethod
     def get_dashboard_stats(date_range=30):
@@ -249,48 +590,55 @@ class Analytics:
         end_date = date.today()
         start_date = end_date - timedelta(days=date_range)
         
-        # Revenue stats
-        total_revenue = db.session.query(func.sum(Order.amount_cents)).filter(
-            Order.status == 'paid'
-        ).scalar() or 0
-        
-        period_revenue = db.session.query(func.sum(Order.amount_cents)).filter(
-            and_(Order.status == 'paid', Order.created_at >= start_date)
-        ).scalar() or 0
-        
-        # Quote stats
-        total_quotes = QuoteRequest.query.count()
-        pending_quotes = QuoteRequest.query.filter(QuoteRequest.status == 'pending').count()
-        
-        period_quotes = QuoteRequest.query.filter(
-            QuoteRequest.created_at >= start_date
-        ).count()
-        
-        # Booking stats
-        total_bookings = Booking.query.count()
-        confirmed_bookings = Booking.query.filter(Booking.status == 'confirmed').count()
-        
-        period_bookings = Booking.query.filter(
-            Booking.created_at >= start_date
-        ).count()
+        # Every figure in one statement
+        stats = Analytics.figures(
+            total_revenue=_metric(DailyMetric.PAID_REVENUE),
+            period_revenue=_metric(DailyMetric.PAID_REVENUE, first=start_date),
+            total_quotes=_metric(DailyMetric.QUOTES),
+            pending_quotes=_metric(DailyMetric.QUOTES, 'pending'),
+            period_quotes=_metric(DailyMetric.QUOTES, first=start_date),
+            quoted_count=_metric(DailyMetric.QUOTES, 'quoted'),
+            quote_amount=_metric(DailyMetric.QUOTE_AMOUNT),
+            quotes_priced=_metric(DailyMetric.QUOTES_PRICED),
+            total_bookings=_metric(DailyMetric.BOOKINGS),
+            confirmed_bookings=_metric(DailyMetric.BOOKINGS, 'confirmed'),
+            period_bookings=_metric(DailyMetric.BOOKINGS, first=start_date),
+        )
         
         # Conversion rate
-        quoted_count = QuoteRequest.query.filter(QuoteRequest.status == 'quoted').count()
-        conversion_rate = (quoted_count / total_quotes * 100) if total_quotes > 0 else 0
+        total_quotes = stats.total_quotes
+        conversion_rate = (stats.quoted_count / total_quotes * 100) if total_quotes > 0 else 0
+        avg_quote = stats.quote_amount / stats.quotes_priced if stats.quotes_priced else 0
         
         return {
-            'total_revenue': total_revenue / 100,  # Convert to dollars
-            'period_revenue': period_revenue / 100,
+            'total_revenue': stats.total_revenue / 100,  # Convert to dollars
+            'period_revenue': stats.period_revenue / 100,
             'total_quotes': total_quotes,
-            'pending_quotes': pending_quotes,
-            'period_quotes': period_quotes,
-            'total_bookings': total_bookings,
-            'confirmed_bookings': confirmed_bookings,
-            'period_bookings': period_bookings,
+            'pending_quotes': stats.pending_quotes,
+            'period_quotes': stats.period_quotes,
+            'total_bookings': stats.total_bookings,
+            'confirmed_bookings': stats.confirmed_bookings,
+            'period_bookings': stats.period_bookings,
             'conversion_rate': round(conversion_rate, 1),
-            'avg_quote_value': Analytics.get_average_quote_value()
+            'avg_quote_value': round(avg_quote / 100, 2)
         }
     
+    @staticmethod
+    def figures(**figures):
+        """Evaluate named ``_figure`` subqueries in a single round trip; returns a row"""
+        return db.session.execute(
+            db.select(*(subquery.label(name) for name, subquery in figures.items()))
+        ).one()
+    
+    @staticmethod
+    def daily(metric, first=None):
+        """``(day, dimension, value)`` rows of a daily_metrics figure from ``first`` on"""
+        query = db.session.query(DailyMetric.day, DailyMetric.dimension, DailyMetric.value) \
+            .filter(DailyMetric.metric == metric)
+        if first is not None:
+            query = query.filter(DailyMetric.day >= _as_day(first))
+        return query.all()
+    
     @staticmethod
     def get_revenue_trend(months=6):
         """Get monthly revenue trend"""
@@ -311,77 +659,64 @@ class Analytics:
             
         start_date = date(start_year, start_month, 1)
         
-        revenue_data = db.session.query(
-            func.extract('year', Order.created_at).label('year'),
-            func.extract('month', Order.created_at).label('month'),
-            func.sum(Order.amount_cents).label('revenue')
-        ).filter(
-            and_(Order.status == 'paid', Order.created_at >= start_date)
-        ).group_by('year', 'month').order_by('year', 'month').all()
+        revenue = {}
+        for day, _dimension, value in Analytics.daily(DailyMetric.PAID_REVENUE, start_date):
+            month = f"{day.year}-{day.month:02d}"
+            revenue[month] = revenue.get(month, 0) + value
         
         return [
             {
-                'month': f"{int(row.year)}-{int(row.month):02d}",
-                'revenue': (row.revenue or 0) / 100
-            } for row in revenue_data
+                'month': month,
+                'revenue': revenue[month] / 100
+            } for month in sorted(revenue)
         ]
     
     @staticmethod
     def get_service_popularity():
         """Get most popular services from quotes"""
-        service_data = db.session.query(
-            QuoteRequest.service_type,
-            func.count(QuoteRequest.id).label('count')
-        ).group_by(QuoteRequest.service_type).order_by(
-            func.count(QuoteRequest.id).desc()
-        ).limit(10).all()
+        count = func.sum(DailyMetric.value).label('count')
+        service_data = db.session.query(DailyMetric.dimension, count).filter(
+            DailyMetric.metric == DailyMetric.QUOTE_SERVICES
+        ).group_by(DailyMetric.dimension).having(count > 0).order_by(count.desc()).limit(10).all()
         
         return [
-            {'service': row.service_type, 'count': row.count}
+            {'service': row.dimension, 'count': row.count}
             for row in service_data
         ]
     
     @staticmethod
     def get_quote_conversion_funnel():
         """Get quote conversion funnel data"""
-        total = QuoteRequest.query.count()
-        responded = QuoteRequest.query.filter(QuoteRequest.status == 'responded').count()
-        quoted = QuoteRequest.query.filter(QuoteRequest.status == 'quoted').count()
-        closed = QuoteRequest.query.filter(QuoteRequest.status == 'closed').count()
+        funnel = Analytics.figures(
+            total=_metric(DailyMetric.QUOTES),
+            responded=_metric(DailyMetric.QUOTES, 'responded'),
+            quoted=_metric(DailyMetric.QUOTES, 'quoted'),
+            closed=_metric(DailyMetric.QUOTES, 'closed'),
+        )
         
-        return {
-            'total': total,
-            'responded': responded,
-            'quoted': quoted,
-            'closed': closed
-        }
+        return dict(funnel._mapping)
     
     @staticmethod
     def get_booking_analytics():
         """Get booking analytics"""
         today = date.today()
-        
-        # Upcoming bookings
-        upcoming = Booking.query.filter(
-            and_(Booking.booking_date >= today, Booking.status == 'confirmed')
-        ).count()
-        
-        # This month's bookings
         month_start = today.replace(day=1)
-        this_month = Booking.query.filter(
-            and_(Booking.booking_date >= month_start, Booking.booking_date <= today)
-        ).count()
         
-        # Most popular booking days
-        day_popularity = db.session.query(
-            func.extract('dow', Booking.booking_date).label('day_of_week'),
-            func.count(Booking.id).label('count')
-        ).group_by('day_of_week').order_by('count').all()
+        # Upcoming confirmed bookings and this month's bookings so far
+        upcoming, this_month = Analytics.figures(
+            upcoming=_metric(DailyMetric.BOOKING_DAYS, 'confirmed', first=today),
+            month=_metric(DailyMetric.BOOKING_DAYS, first=month_start, last=today),
+        )
         
+        # Most popular booking days
         days = ['Sunday', 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday']
+        counts = {}
+        for day, _dimension, value in Analytics.daily(DailyMetric.BOOKING_DAYS):
+            weekday = days[day.isoweekday() % 7]
+            counts[weekday] = counts.get(weekday, 0) + value
         day_data = [
-            {'day': days[int(row.day_of_week)], 'count': row.count}
-            for row in day_popularity
+            {'day': day, 'count': count}
+            for day, count in sorted(counts.items(), key=lambda item: item[1]) if count
         ]
         
         return {
@@ -393,11 +728,12 @@ class Analytics:
     @staticmethod
     def get_average_quote_value():
         """Get average quote value"""
-        avg_value = db.session.query(
-            func.avg(QuoteRequest.quote_amount)
-        ).filter(QuoteRequest.quote_amount.isnot(None)).scalar()
+        stats = Analytics.figures(
+            amount=_metric(DailyMetric.QUOTE_AMOUNT),
+            priced=_metric(DailyMetric.QUOTES_PRICED),
+        )
         
-        return round((avg_value or 0) / 100, 2)
+        return round((stats.amount / stats.priced if stats.priced else 0) / 100, 2)
     
     @staticmethod
     def get_recent_activities(limit=10):
@@ -437,16 +773,22 @@ class Analytics:
 
 class Review(db.Model):
     """Customer product reviews"""
+    __table_args__ = (
+        db.Index("ix_review_product_id_approved", "product_id", "approved"),
+        db.Index("ix_review_created_at_id", "created_at", "id"),
+        db.Index("ix_review_user_id", "user_id"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
-    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
+    product_id = _tracked(db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False))
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)  # Allow anonymous reviews
     reviewer_name = db.Column(db.String(255), nullable=False)  # For anonymous users
     reviewer_email = db.Column(db.String(255), nullable=True)  # Optional contact
-    rating = db.Column(db.Integer, nullable=False)  # 1-5 star rating
+    rating = _tracked(db.Column(db.Integer, nullable=False))  # 1-5 star rating
     title = db.Column(db.String(255), nullable=True)  # Review title/headline
     comment = db.Column(db.Text, nullable=False)  # Review text
     verified_purchase = db.Column(db.Boolean, default=False)  # If user bought the item
-    approved = db.Column(db.Boolean, default=True)  # Admin approval (auto-approve for now)
+    approved = _tracked(db.Column(db.Boolean, default=True))  # Admin approval (auto-approve for now)
     helpful_count = db.Column(db.Integer, default=0)  # Number of helpful votes
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -471,26 +813,164 @@ class Review(db.Model):
     
     @classmethod
     def get_product_stats(cls, product_id):
-        """Get review statistics for a product"""
-        reviews = cls.query.filter_by(product_id=product_id, approved=True).all()
-        if not reviews:
-            return {
-                'count': 0,
-                'average_rating': 0,
-                'rating_distribution': {1: 0, 2: 0, 3: 0, 4: 0, 5: 0}
-            }
-        
-        total_rating = sum(r.rating for r in reviews)
-        average = round(total_rating / len(reviews), 1)
-        
-        # Rating distribution
-        distribution = {1: 0, 2: 0, 3: 0, 4: 0, 5: 0}
-        for review in reviews:
-            distribution[review.rating] += 1
-            
+        """Get review statistics for a product from its rating summary row"""
+        summary = db.session.get(ProductRatingSummary, product_id)
+        if summary is None:
+            # No summary yet (e.g. never reconciled): aggregate without loading rows
+            summary = ProductRatingSummary.compute(product_id)
+        return summary.as_stats()
+
+
+class ProductRatingSummary(db.Model):
+    """Approved-review counters per product, maintained on every Review write"""
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), primary_key=True)
+    review_count = db.Column(db.Integer, nullable=False, default=0)
+    rating_sum = db.Column(db.Integer, nullable=False, default=0)
+    stars_1 = db.Column(db.Integer, nullable=False, default=0)
+    stars_2 = db.Column(db.Integer, nullable=False, default=0)
+    stars_3 = db.Column(db.Integer, nullable=False, default=0)
+    stars_4 = db.Column(db.Integer, nullable=False, default=0)
+    stars_5 = db.Column(db.Integer, nullable=False, default=0)
+
+    COUNTER_COLUMNS = ('review_count', 'rating_sum', 'stars_1', 'stars_2', 'stars_3', 'stars_4', 'stars_5')
+
+    @property
+    def average_rating(self):
+        if not self.review_count:
+            return 0
+        return round(self.rating_sum / self.review_count, 1)
+
+    def as_stats(self):
+        """Same shape as the historical Review.get_product_stats() result"""
         return {
-            'count': len(reviews),
-            'average_rating': average,
-            'rating_distribution': distribution,
-            'reviews': reviews
+            'count': self.review_count or 0,
+            'average_rating': self.average_rating,
+            'rating_distribution': {star: getattr(self, f'stars_{star}') or 0 for star in range(1, 6)}
+        }
+
+    @staticmethod
+    def _aggregate_columns():
+        return [
+            func.count(Review.id),
+            func.coalesce(func.sum(Review.rating), 0),
+        ] + [
+            func.coalesce(func.sum(case((Review.rating == star, 1), else_=0)), 0)
+            for star in range(1, 6)
+        ]
+
+    @classmethod
+    def compute(cls, product_id):
+        """Build an (unsaved) summary from the approved reviews of one product"""
+        row = db.session.query(*cls._aggregate_columns()).filter(
+            Review.product_id == product_id, Review.approved == True
+        ).one()
+        return cls(product_id=product_id, **dict(zip(cls.COUNTER_COLUMNS, row)))
+
+    @classmethod
+    def reconcile(cls):
+        """Recompute every summary from the review table and repair drift.
+
+        Returns the number of summary rows that were inserted, corrected or
+        removed.
+        """
+        actual = {
+            row[0]: tuple(row[1:])
+            for row in db.session.query(Review.product_id, *cls._aggregate_columns())
+            .filter(Review.approved == True)
+            .group_by(Review.product_id)
         }
+        repaired = 0
+        for summary in cls.query.all():
+            counters = actual.pop(summary.product_id, None)
+            if counters is None:
+                db.session.delete(summary)
+                repaired += 1
+            elif tuple(getattr(summary, c) for c in cls.COUNTER_COLUMNS) != counters:
+                for column, value in zip(cls.COUNTER_COLUMNS, counters):
+                    setattr(summary, column, value)
+                repaired += 1
+        for product_id, counters in actual.items():
+            db.session.add(cls(product_id=product_id, **dict(zip(cls.COUNTER_COLUMNS, counters))))
+            repaired += 1
+        db.session.commit()
+        return repaired
+
+
+@event.listens_for(Order, 'after_insert')
+@event.listens_for(Order, 'after_update')
+def _order_paid(mapper, connection, target):
+    if target.status == 'paid' and sa_inspect(target).attrs.status.history.added:
+        ProductPurchase.record_order(connection, target.id)
+
+
+@event.listens_for(OrderItem, 'after_insert')
+def _order_item_added(mapper, connection, target):
+    # Items flushed after their order was already marked paid
+    orders = Order.__table__
+    status = connection.execute(
+        db.select(orders.c.status).where(orders.c.id == target.order_id)
+    ).scalar()
+    if status == 'paid':
+        ProductPurchase.record_order(connection, target.order_id)
+
+
+def _apply_rating_delta(connection, product_id, rating, delta):
+    """Add ``delta`` approved reviews of ``rating`` stars to a product summary"""
+    table = ProductRatingSummary.__table__
+    star = f'stars_{rating}'
+    result = connection.execute(
+        table.update()
+        .where(table.c.product_id == product_id)
+        .values({
+            'review_count': table.c.review_count + delta,
+            'rating_sum': table.c.rating_sum + delta * rating,
+            star: table.c[star] + delta,
+        })
+    )
+    if result.rowcount == 0 and delta > 0:
+        connection.execute(table.insert().values({
+            'product_id': product_id,
+            'review_count': delta,
+            'rating_sum': delta * rating,
+            star: delta,
+        }))
+
+
+def previous_value(state, attribute):
+    """Value of ``attribute`` before the pending flush; the current value if unchanged.
+
+    Write listeners use it to subtract a row's old figures. The old value is
+    only known for loaded attributes, so columns changed on expired
+    instances need ``_tracked``.
+    """
+    history = state.attrs[attribute].history
+    return history.deleted[0] if history.deleted else getattr(state.obj(), attribute)
+
+
+@event.listens_for(Review, 'after_insert')
+def _review_inserted(mapper, connection, target):
+    if target.approved:
+        _apply_rating_delta(connection, target.product_id, target.rating, 1)
+
+
+@event.listens_for(Review, 'after_update')
+def _review_updated(mapper, connection, target):
+    state = sa_inspect(target)
+    if not any(state.attrs[a].history.has_changes() for a in ('approved', 'rating', 'product_id')):
+        return
+    if previous_value(state, 'approved'):
+        _apply_rating_delta(connection, previous_value(state, 'product_id'), previous_value(state, 'rating'), -1)
+    if target.approved:
+        _apply_rating_delta(connection, target.product_id, target.rating, 1)
+
+
+@event.listens_for(Review, 'after_delete')
+def _review_deleted(mapper, connection, target):
+    if target.approved:
+        _apply_rating_delta(connection, target.product_id, target.rating, -1)
+
+
+@event.listens_for(Product, 'after_delete')
+def _product_deleted(mapper, connection, target):
+    table = ProductRatingSummary.__table__
+    connection.execute(table.delete().where(table.c.product_id == target.id))
@@ -1,23 +1,21 @@
-from flask import Blueprint, render_template, request, redirect, url_for, session, flash, abort, jsonify, make_response
-from models import Product, Order, QuoteRequest, ServicePackage, Booking, Analytics, Review, db, CORPORATE_CATEGORIES
+from flask import Blueprint, current_app, render_template, request, redirect, url_for, session, flash, abort, jsonify, make_response
+from models import Product, ProductOption, Order, QuoteRequest, ServicePackage, Booking, Analytics, Review, db, CORPORATE_CATEGORIES
 from utils.media import save_media
+from utils.pagination import paginate
+from utils.response_cache import response_cache
+from utils.analytics_cache import analytics_cache
+from utils.payment_retry import payment_client
+from utils.email_outbox import email_outbox
+from utils.email_service import email_dispatcher
+from utils.pricing import option_catalog
 from config import Config
 import json
 import csv
 from datetime import datetime, date, timedelta
 from io import StringIO
 from sqlalchemy import func
-
-# Import size and frame options for product customization
-SIZE_OPTIONS = {
-    "20cm x 30cm": 0,        # base price
-    "40cm x 60cm": 8000,     # +S$ 80.00
-}
-FRAME_OPTIONS = {
-    "No frame": 0,
-    "Black": 2000,           # +S$ 20.00
-    "White": 2000,           # +S$ 20.00
-}
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload, undefer
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
 
@@ -81,7 +79,7 @@ def dashboard():
             return render_template(
                 "admin_dashboard.html",
                 error="Title and media file are required.",
-                products=Product.query.order_by(Product.created_at.desc()).all()
+                products=paginate(Product.query, (Product.created_at, Product.id), per_page=5)
             )
 
         media_key, _url = save_media(file)
@@ -115,7 +113,10 @@ def dashboard():
     booking_analytics = Analytics.get_booking_analytics()
     recent_activities = Analytics.get_recent_activities(10)
 
-    products = Product.query.order_by(Product.created_at.desc()).all()
+    products = paginate(
+        Product.query, (Product.created_at, Product.id),
+        request.args.get("cursor"), per_page=5
+    )
     
     return render_template(
         "admin_dashboard.html", 
@@ -205,19 +206,34 @@ def edit_product(product_id):
     return render_template("admin_product_edit.html", 
                          product=product, 
                          categories=CORPORATE_CATEGORIES,
-                         size_options=SIZE_OPTIONS,
-                         frame_options=FRAME_OPTIONS)
+                         size_options=option_catalog.get().sizes,
+                         frame_options=option_catalog.get().frames)
 
 @admin_bp.route("/orders")
 def admin_orders():
     require_admin()
-    orders = Order.query.order_by(Order.created_at.desc()).all()
+    # User and item count come with the page, not one lazy load per row
+    orders = paginate(
+        Order.query.options(selectinload(Order.user), undefer(Order.items_quantity)),
+        (Order.created_at, Order.id),
+        request.args.get("cursor"),
+    )
+    if request.args.get("format") == "json":
+        return jsonify(orders.to_dict(lambda o: {
+            "id": o.id,
+            "email": o.customer_email,
+            "item_count": o.item_count,
+            "amount_cents": o.amount_cents,
+            "currency": o.currency,
+            "status": o.status,
+            "created_at": o.created_at.isoformat() if o.created_at else None,
+        }))
     return render_template("admin_orders.html", orders=orders)
 
 @admin_bp.route("/orders/<int:order_id>", methods=["GET", "POST"])
 def order_detail(order_id):
     require_admin()
-    order = Order.query.get_or_404(order_id)
+    order = Order.query.options(*Order.with_items()).filter_by(id=order_id).first_or_404()
 
     if request.method == "POST":
         new_status = request.form.get("status")
@@ -232,7 +248,9 @@ def order_detail(order_id):
 @admin_bp.route("/quotes")
 def quotes():
     require_admin()
-    quotes = QuoteRequest.query.order_by(QuoteRequest.created_at.desc()).all()
+    quotes = paginate(
+        QuoteRequest.query, (QuoteRequest.created_at, QuoteRequest.id), request.args.get("cursor")
+    )
     return render_template("admin_quotes.html", quotes=quotes)
 
 @admin_bp.route("/quotes/<int:quote_id>", methods=["GET", "POST"])
@@ -315,9 +333,13 @@ def delete_package(package_id):
 def bookings():
     require_admin()
     today = date.today()
-    upcoming_bookings = Booking.query.filter(
-        Booking.booking_date >= today
-    ).order_by(Booking.booking_date, Booking.start_time).all()
+    upcoming_query = Booking.query.filter(Booking.booking_date >= today)
+    upcoming_bookings = paginate(
+        upcoming_query,
+        (Booking.booking_date, Booking.start_time, Booking.id),
+        request.args.get("cursor"),
+        descending=False
+    )
     
     past_bookings = Booking.query.filter(
         Booking.booking_date < today
@@ -325,6 +347,7 @@ def bookings():
     
     return render_template("admin_bookings.html", 
                          upcoming_bookings=upcoming_bookings, 
+                         upcoming_count=upcoming_query.count(),
                          past_bookings=past_bookings)
 
 @admin_bp.route("/bookings/<int:booking_id>", methods=["GET", "POST"])
@@ -336,7 +359,13 @@ def booking_detail(booking_id):
         booking.status = request.form.get("status", booking.status)
         booking.notes = request.form.get("admin_notes", booking.notes)
         
-        db.session.commit()
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Re-activating a booking whose slot has been taken in the meantime
+            db.session.rollback()
+            flash("That time slot now belongs to another booking.", "danger")
+            return redirect(url_for("admin.booking_detail", booking_id=booking_id))
         flash("Booking updated successfully.", "success")
         return redirect(url_for("admin.bookings"))
     
@@ -351,10 +380,42 @@ def delete_booking(booking_id):
     flash("Booking deleted successfully.", "success")
     return redirect(url_for("admin.bookings"))
 
+@admin_bp.route("/api/cache-stats")
+def cache_stats():
+    """Hit/miss counters of this worker's public page and analytics caches"""
+    require_admin()
+    return jsonify(dict(response_cache.stats(), analytics=analytics_cache.stats()))
+
+@admin_bp.route("/api/payment-stats")
+def payment_stats():
+    """Latency, retry and failure counters of this worker's payment client"""
+    require_admin()
+    return jsonify(payment_client.stats())
+
+@admin_bp.route("/api/email-stats")
+def email_stats():
+    """Outbox backlog by status and this worker's email dispatch counters"""
+    require_admin()
+    return jsonify({"outbox": email_outbox.counts(), "dispatch": email_dispatcher.stats()})
+
 # Analytics Routes
+# Analytics API metrics; those taking the ``range`` argument are cached per range
+ANALYTICS_METRICS = {
+    'dashboard': (Analytics.get_dashboard_stats, True),
+    'revenue-trend': (lambda: Analytics.get_revenue_trend(6), False),
+    'service-popularity': (Analytics.get_service_popularity, False),
+    'conversion-funnel': (Analytics.get_quote_conversion_funnel, False),
+    'booking-analytics': (Analytics.get_booking_analytics, False),
+    'recent-activities': (lambda: Analytics.get_recent_activities(10), False),
+}
+
 @admin_bp.route("/api/analytics/<metric>")
 def analytics_api(metric):
-    """API endpoint for real-time analytics data"""
+    """API endpoint for real-time analytics data.
+
+    Results come from the per-worker analytics cache; the ETag is derived
+    from the JSON body, so a poll of an unchanged metric gets a 304.
+    """
     require_admin()
     
     date_range = request.args.get('range', '30')
@@ -363,22 +424,22 @@ def analytics_api(metric):
     except (ValueError, TypeError):
         date_range = 30
     
-    if metric == 'dashboard':
-        data = Analytics.get_dashboard_stats(date_range)
-    elif metric == 'revenue-trend':
-        data = Analytics.get_revenue_trend(6)
-    elif metric == 'service-popularity':
-        data = Analytics.get_service_popularity()
-    elif metric == 'conversion-funnel':
-        data = Analytics.get_quote_conversion_funnel()
-    elif metric == 'booking-analytics':
-        data = Analytics.get_booking_analytics()
-    elif metric == 'recent-activities':
-        data = Analytics.get_recent_activities(10)
-    else:
+    if metric not in ANALYTICS_METRICS:
         return jsonify({'error': 'Invalid metric'}), 400
+    compute, takes_range = ANALYTICS_METRICS[metric]
+    if takes_range:
+        entry, state = analytics_cache.get((metric, date_range), lambda: compute(date_range))
+    else:
+        entry, state = analytics_cache.get((metric, None), compute)
     
-    return jsonify(data)
+    if request.if_none_match.contains(entry["etag"]):
+        response = current_app.response_class(status=304)
+    else:
+        response = current_app.response_class(entry["body"], mimetype="application/json")
+    response.set_etag(entry["etag"])
+    response.headers["Cache-Control"] = "private, no-cache"
+    response.headers["X-Cache"] = state
+    return response
 
 @admin_bp.route("/analytics/export")
 def export_analytics():
@@ -454,37 +515,35 @@ def customization_options():
         # Handle form submission to update global options
         action = request.form.get("action")
         
-        if action == "add_size":
-            size_name = request.form.get("size_name", "").strip()
-            size_price = request.form.get("size_price", type=float, default=0)
-            if size_name:
-                SIZE_OPTIONS[size_name] = int(size_price * 100)  # Convert to cents
-                flash(f"Added size option: {size_name}", "success")
-        
-        elif action == "add_frame":
-            frame_name = request.form.get("frame_name", "").strip()  
-            frame_price = request.form.get("frame_price", type=float, default=0)
-            if frame_name:
-                FRAME_OPTIONS[frame_name] = int(frame_price * 100)  # Convert to cents
-                flash(f"Added frame option: {frame_name}", "success")
-        
-        elif action == "delete_size":
-            size_to_delete = request.form.get("size_to_delete")
-            if size_to_delete and size_to_delete in SIZE_OPTIONS:
-                del SIZE_OPTIONS[size_to_delete]
-                flash(f"Deleted size option: {size_to_delete}", "success")
-        
-        elif action == "delete_frame":
-            frame_to_delete = request.form.get("frame_to_delete")
-            if frame_to_delete and frame_to_delete in FRAME_OPTIONS:
-                del FRAME_OPTIONS[frame_to_delete]
-                flash(f"Deleted frame option: {frame_to_delete}", "success")
+        if action in ("add_size", "add_frame"):
+            kind = ProductOption.SIZE if action == "add_size" else ProductOption.FRAME
+            name = request.form.get(f"{kind}_name", "").strip()
+            price = request.form.get(f"{kind}_price", type=float, default=0) or 0
+            if name:
+                option = ProductOption.query.filter_by(kind=kind, label=name).first()
+                if option is None:
+                    position = db.session.query(func.coalesce(func.max(ProductOption.position), -1)).scalar() + 1
+                    option = ProductOption(kind=kind, label=name, position=position)
+                    db.session.add(option)
+                option.price_cents = int(round(price * 100))  # Convert to cents
+                db.session.commit()
+                flash(f"Added {kind} option: {name}", "success")
+
+        elif action in ("delete_size", "delete_frame"):
+            kind = ProductOption.SIZE if action == "delete_size" else ProductOption.FRAME
+            name = request.form.get(f"{kind}_to_delete")
+            option = ProductOption.query.filter_by(kind=kind, label=name).first() if name else None
+            if option:
+                db.session.delete(option)
+                db.session.commit()
+                flash(f"Deleted {kind} option: {name}", "success")
         
         return redirect(url_for("admin.customization_options"))
     
+    prices = option_catalog.get()
     return render_template("admin_customization_options.html", 
-                         size_options=SIZE_OPTIONS,
-                         frame_options=FRAME_OPTIONS)
+                         size_options=prices.sizes,
+                         frame_options=prices.frames)
 
 # -----------------------------
 # Review Management
@@ -510,7 +569,8 @@ def reviews():
     if product_filter:
         reviews_query = reviews_query.filter_by(product_id=product_filter)
     
-    reviews = reviews_query.order_by(Review.created_at.desc()).all()
+    reviews = paginate(reviews_query, (Review.created_at, Review.id), request.args.get("cursor"))
+    matching_reviews = reviews_query.count()
     
     # Get products for filter dropdown
     products = Product.query.order_by(Product.title).all()
@@ -529,6 +589,7 @@ def reviews():
     
     return render_template("admin_reviews.html", 
                          reviews=reviews,
+                         matching_reviews=matching_reviews,
                          products=products,
                          stats=stats,
                          current_filters={'status': status_filter, 'product': product_filter})
@@ -1,6 +1,7 @@
 from flask import Blueprint, render_template, request, redirect, url_for, session, flash
 from werkzeug.security import generate_password_hash, check_password_hash
 from models import User, db
+from utils.cart_store import cart_store
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/auth')
 
@@ -40,6 +41,7 @@ def register():
 
     # Log them in automatically
     session["user_id"] = user.id
+    cart_store.login(user.id)
     flash("Welcome! Your account has been created.", "success")
     return redirect(url_for("public.index"))
 
@@ -75,6 +77,7 @@ def login():
 
     session["user_id"] = user.id
     session.pop("admin", None)  # Clear admin session if any
+    cart_store.login(user.id)  # merge the anonymous cart into the saved one
     flash("Welcome back!", "success")
     return redirect(url_for("public.index"))
 
@@ -1,10 +1,16 @@
 from flask import Blueprint, request, jsonify, render_template, redirect, url_for, flash, session, current_app
 from sqlalchemy.exc import SQLAlchemyError
-from models import db, Order, OrderItem, Product, User
+from models import db, Order, OrderItem, User
 from utils.dummy_payments import provider as dummy_provider
-from utils.email_service import send_order_confirmation_email, send_payment_failure_email
+from utils.cart_store import cart_store
+from utils.checkout import checkout_key, place_order
+from utils.stock import stock_reservations, OutOfStock
+from utils.pricing import cart_pricing
+from utils.email_outbox import email_outbox
+from utils.webhooks import webhook_inbox, verify_signature, InvalidSignature
+from utils.payment_retry import payment_client
 import os
-import stripe
+import json
 import logging
 from datetime import datetime
 import traceback
@@ -22,29 +28,21 @@ class StripeService:
     """Service class to handle Stripe operations"""
     
     @staticmethod
-    def initialize_stripe():
-        """Initialize Stripe with API keys"""
-        try:
-            stripe.api_key = current_app.config.get('STRIPE_SECRET_KEY')
-            return True
-        except Exception as e:
-            logger.error(f"Failed to initialize Stripe: {e}")
-            return False
+    def _fake_session(order_id):
+        session_id = f'cs_test_fake_{datetime.now().strftime("%Y%m%d%H%M%S")}'
+        return {
+            'id': session_id,
+            'url': f"/payment/fake-checkout?session_id={session_id}&order_id={order_id}"
+        }
     
     @staticmethod
     def create_checkout_session(items, customer_email=None, order_id=None):
-        """Create a Stripe checkout session (fake mode for testing)"""
+        """Create a Stripe checkout session (fake unless STRIPE_CHECKOUT_MODE is 'live')"""
         try:
-            if not StripeService.initialize_stripe():
-                raise Exception("Stripe not properly configured")
-            
             # For fake/test mode, simulate the session creation
-            if current_app.config.get('STRIPE_SECRET_KEY', '').startswith('sk_test_fake'):
-                # Return a fake session for testing
-                return {
-                    'id': f'cs_test_fake_{datetime.now().strftime("%Y%m%d%H%M%S")}',
-                    'url': f"/payment/fake-checkout?session_id=cs_test_fake_{datetime.now().strftime('%Y%m%d%H%M%S')}&order_id={order_id}"
-                }
+            if current_app.config.get('STRIPE_CHECKOUT_MODE', 'fake') != 'live' or \
+                    current_app.config.get('STRIPE_SECRET_KEY', '').startswith('sk_test_fake'):
+                return StripeService._fake_session(order_id)
             
             # Convert cart items to Stripe line items (for real Stripe)
             line_items = []
@@ -61,11 +59,16 @@ class StripeService:
                     'quantity': item['qty'],
                 })
             
-            # For now, return fake session (replace with real Stripe when ready)
-            return {
-                'id': f'cs_test_fake_{datetime.now().strftime("%Y%m%d%H%M%S")}',
-                'url': f"/payment/fake-checkout?session_id=cs_test_fake_{datetime.now().strftime('%Y%m%d%H%M%S')}&order_id={order_id}"
-            }
+            # One idempotency key per order, so a retried checkout reuses its session
+            checkout = payment_client.create_checkout_session(
+                line_items,
+                success_url=current_app.config.get('PAYMENT_SUCCESS_URL') + '?session_id={CHECKOUT_SESSION_ID}',
+                cancel_url=current_app.config.get('PAYMENT_CANCEL_URL'),
+                customer_email=customer_email,
+                metadata={'order_id': order_id},
+                idempotency_key=f'checkout-order-{order_id}',
+            )
+            return {'id': checkout['id'], 'url': checkout['url']}
             
         except Exception as e:
             logger.error(f"Error creating checkout session: {e}")
@@ -93,19 +96,14 @@ def create_intent():
 	if not email or not items:
 		return jsonify({'error': 'email and items are required'}), 400
 
-	# Validate items and compute amount
-	product_map = {}
-	amount_cents = 0
+	# Validate items, then price them all with one product query
 	for item in items:
-		pid = item.get('product_id')
-		qty = int(item.get('quantity', 1))
-		if not pid or qty <= 0:
+		if not item.get('product_id') or int(item.get('quantity', 1)) <= 0:
 			return jsonify({'error': f'invalid item spec {item}'}), 400
-		product = Product.query.get(pid)
-		if not product:
-			return jsonify({'error': f'product {pid} not found'}), 404
-		product_map[pid] = product
-		amount_cents += product.price_cents * qty
+	priced = cart_pricing.price(items, use_stored_prices=False)
+	if priced.missing:
+		return jsonify({'error': f'product {priced.missing[0]} not found'}), 404
+	amount_cents = priced.total_cents
 
 	# Create dummy payment intent
 	intent = dummy_provider.create_payment_intent(amount_cents, currency, metadata={'email': email})
@@ -121,17 +119,21 @@ def create_intent():
 	db.session.add(order)
 	db.session.flush()  # to get order.id
 
-	for item in items:
-		pid = item['product_id']
-		qty = int(item.get('quantity', 1))
-		product = product_map[pid]
+	for line in priced:
 		db.session.add(OrderItem(
 			order_id=order.id,
-			product_id=pid,
-			quantity=qty,
-			unit_price_cents=product.price_cents
+			product_id=line['product_id'],
+			quantity=line['qty'],
+			unit_price_cents=line['unit_price_cents']
 		))
 
+	# Hold the stock until the intent is confirmed or the order expires
+	try:
+		stock_reservations.reserve(order.id, [(line['product_id'], line['qty']) for line in priced])
+	except OutOfStock as e:
+		db.session.rollback()
+		return jsonify({'error': 'out_of_stock', 'product_id': e.product_id}), 409
+
 	try:
 		db.session.commit()
 	except SQLAlchemyError as e:
@@ -160,15 +162,15 @@ def confirm_intent():
 	if not intent:
 		return jsonify({'error': 'intent_not_found'}), 404
 
-	# Update associated order status to paid
+	# Update associated order status to paid, committed with the intent
 	order = Order.query.filter_by(stripe_payment_intent=intent_id).first()
 	if order and order.status != 'paid':
 		order.status = 'paid'
-		try:
-			db.session.commit()
-		except SQLAlchemyError as e:
-			db.session.rollback()
-			return jsonify({'error': 'db_error', 'details': str(e)}), 500
+	try:
+		db.session.commit()
+	except SQLAlchemyError as e:
+		db.session.rollback()
+		return jsonify({'error': 'db_error', 'details': str(e)}), 500
 
 	return jsonify({'payment_intent': intent.to_dict(), 'order_id': order.id if order else None})
 
@@ -190,57 +192,11 @@ def get_intent(intent_id):
 def create_checkout_session():
     """Create a Stripe checkout session from cart"""
     try:
-        # Get cart from session
-        cart_raw = session.get("cart", [])
-        if not cart_raw:
+        # Price every cart line with one product query
+        priced = cart_pricing.price(cart_store.lines())
+        if not priced:
             return jsonify({'error': 'Cart is empty'}), 400
-
-        # Process cart items
-        items = []
-        total = 0
-        
-        # Size and frame options (should match your existing constants)
-        SIZE_OPTIONS = {
-            "20cm x 30cm": 0,
-            "30cm x 40cm": 2000,  # +$20.00
-            "40cm x 50cm": 4000,  # +$40.00
-        }
-        
-        FRAME_OPTIONS = {
-            "No frame": 0,
-            "Basic wooden frame": 1500,  # +$15.00
-            "Premium metal frame": 3000,  # +$30.00
-        }
-
-        for idx, it in enumerate(cart_raw):
-            pid = it.get("product_id") or it.get("id")
-            qty = int(it.get("qty", 1))
-            size = it.get("size", "20cm x 30cm")
-            frame = it.get("frame", "No frame")
-
-            p = Product.query.get(pid)
-            if not p:
-                continue
-
-            unit = it.get("unit_price_cents")
-            if unit is None:
-                size_add = int(SIZE_OPTIONS.get(size, 0))
-                frame_add = int(FRAME_OPTIONS.get(frame, 0))
-                unit = int(p.price_cents) + size_add + frame_add
-                it["unit_price_cents"] = unit
-
-            subtotal = int(unit) * qty
-            total += subtotal
-
-            items.append({
-                "idx": idx,
-                "title": p.title,
-                "size": size,
-                "frame": frame,
-                "qty": qty,
-                "unit_price_cents": unit,
-                "subtotal_cents": subtotal,
-            })
+        items = priced.lines
 
         # Get customer email
         customer_email = None
@@ -249,34 +205,15 @@ def create_checkout_session():
             if user:
                 customer_email = user.email
 
-        # Create pending order
-        order = Order(
+        # Create the pending order, or reuse it when this cart is retried
+        order, _created = place_order(
+            checkout_key("stripe", priced, customer_email),
+            priced,
             email=customer_email or "guest@flashstudio.com",
-            amount_cents=total,
             currency=current_app.config.get('CURRENCY', 'sgd'),
-            status="pending"
+            status="pending",
+            user_id=session.get("user_id"),
         )
-        
-        if session.get("user_id"):
-            order.user_id = session["user_id"]
-        
-        db.session.add(order)
-        db.session.flush()
-
-        # Create order items
-        for idx, item in enumerate(items):
-            cart_item = cart_raw[idx]
-            product_id = cart_item.get("product_id") or cart_item.get("id")
-            
-            order_item = OrderItem(
-                order_id=order.id,
-                product_id=product_id,
-                quantity=item["qty"],
-                unit_price_cents=item["unit_price_cents"]
-            )
-            db.session.add(order_item)
-        
-        db.session.commit()
 
         # Create Stripe checkout session
         checkout_session = StripeService.create_checkout_session(
@@ -294,6 +231,9 @@ def create_checkout_session():
             'session_id': checkout_session['id']
         })
 
+    except OutOfStock as e:
+        return jsonify({'error': 'out_of_stock', 'product_id': e.product_id}), 409
+
     except Exception as e:
         logger.error(f"Error in create_checkout_session: {e}")
         logger.error(traceback.format_exc())
@@ -301,6 +241,30 @@ def create_checkout_session():
         return jsonify({'error': 'Failed to create checkout session'}), 500
 
 
+@payment_bp.route('/webhook', methods=['POST'])
+def webhook():
+    """Verify and enqueue a payment webhook; the worker pool applies it to the order"""
+    secret = current_app.config.get('STRIPE_WEBHOOK_SECRET')
+    if not secret:
+        return jsonify({'error': 'webhook_not_configured'}), 503
+
+    payload = request.get_data()
+    try:
+        verify_signature(payload, request.headers.get('Stripe-Signature'), secret,
+                         current_app.config.get('WEBHOOK_SIGNATURE_TOLERANCE', 300))
+        event = json.loads(payload)
+        if not event.get('id') or not event.get('type'):
+            raise ValueError('event id and type are required')
+    except InvalidSignature as e:
+        logger.warning(f"Rejected webhook: {e}")
+        return jsonify({'error': 'invalid_signature'}), 400
+    except ValueError as e:
+        return jsonify({'error': 'invalid_payload', 'details': str(e)}), 400
+
+    duplicate = not webhook_inbox.append(event, payload)
+    return jsonify({'received': True, 'duplicate': duplicate})
+
+
 @payment_bp.route('/fake-checkout')
 def fake_checkout():
     """Fake Stripe checkout page for testing"""
@@ -314,12 +278,12 @@ def fake_checkout():
     # Get order
     order = None
     if order_id:
-        order = db.session.get(Order, int(order_id))
+        order = db.session.get(Order, int(order_id), options=Order.with_items())
     else:
         # Try from session
         pending_order_id = session.get('pending_order_id')
         if pending_order_id:
-            order = db.session.get(Order, pending_order_id)
+            order = db.session.get(Order, pending_order_id, options=Order.with_items())
     
     if not order:
         flash("Order not found", "danger")
@@ -339,7 +303,7 @@ def complete_fake_checkout():
             flash("No order specified", "warning")
             return redirect(url_for('public.cart'))
         
-        order = db.session.get(Order, int(order_id))
+        order = db.session.get(Order, int(order_id), options=Order.with_items())
         if not order:
             flash("Order not found", "danger")
             return redirect(url_for('public.cart'))
@@ -348,51 +312,26 @@ def complete_fake_checkout():
         payment_choice = request.form.get('payment_choice', 'success')
         
         if payment_choice == 'success':
-            # Successful payment
+            # Successful payment; the confirmation email commits with it and is sent in the background
             order.status = 'paid'
             order.stripe_payment_intent = f'pi_fake_{datetime.now().strftime("%Y%m%d%H%M%S")}'
+            email_outbox.queue_order_confirmation(order)
             db.session.commit()
             
-            # Send confirmation email (don't let email failures break the payment process)
-            email_sent = False
-            try:
-                email_result = send_order_confirmation_email(order)
-                if email_result.get('success'):
-                    logger.info(f"Order confirmation email sent for order {order.id}")
-                    email_sent = True
-                else:
-                    logger.warning(f"Failed to send confirmation email for order {order.id}: {email_result.get('error')}")
-            except Exception as e:
-                logger.error(f"Error sending confirmation email for order {order.id}: {e}")
-                logger.error(traceback.format_exc())
-                # Continue processing - email failure shouldn't break the payment flow
-            
             # Clear cart and session
-            session.pop('cart', None)
+            cart_store.clear()
             session.pop('pending_order_id', None)
             session.modified = True
             
-            # Update success message based on email status
-            if email_sent:
-                flash("Payment successful! A confirmation email has been sent to your email address.", "success")
-            else:
-                flash("Payment successful! Please save your order number for reference. If you don't receive a confirmation email, please contact support.", "success")
-            
+            flash("Payment successful! A confirmation email is on its way to your email address.", "success")
             return redirect(url_for('payment.success', session_id=f'cs_fake_{order.id}'))
             
         elif payment_choice == 'failure':
             # Failed payment
             order.status = 'failed'
+            email_outbox.queue_payment_failure(order, "Payment was declined by the card issuer")
             db.session.commit()
             
-            # Send failure notification email
-            try:
-                email_result = send_payment_failure_email(order, "Payment was declined by the card issuer")
-                if email_result.get('success'):
-                    logger.info(f"Payment failure notification sent for order {order.id}")
-            except Exception as e:
-                logger.error(f"Error sending payment failure notification: {e}")
-            
             flash("Payment failed. Please check your payment details and try again.", "danger")
             return redirect(url_for('payment.cancel'))
             
@@ -423,7 +362,7 @@ def success():
         # Extract order ID from fake session
         try:
             order_id = int(session_id.split('_')[-1])
-            order = db.session.get(Order, order_id)
+            order = db.session.get(Order, order_id, options=Order.with_items())
         except (ValueError, IndexError):
             logger.warning(f"Could not extract order ID from session_id: {session_id}")
     
@@ -431,12 +370,10 @@ def success():
         # Try to get from session as fallback
         pending_order_id = session.get('pending_order_id')
         if pending_order_id:
-            order = db.session.get(Order, pending_order_id)
+            order = db.session.get(Order, pending_order_id, options=Order.with_items())
             logger.info(f"Found order from session: {order.id}" if order else "No order found in session")
     
     if order and order.status == 'paid':
-        # Ensure order items are loaded (for template display)
-        db.session.refresh(order)
         logger.info(f"Displaying success page for paid order {order.id}")
         return render_template('payment/success.html', order=order)
     elif order:
@@ -1,5 +1,17 @@
-from flask import Blueprint, render_template, request, redirect, url_for, session, flash, abort, jsonify
-from models import Product, User, Order, OrderItem, QuoteRequest, ServicePackage, Booking, Availability, Review, db, CORPORATE_CATEGORIES
+from flask import Blueprint, render_template, request, redirect, url_for, session, flash, abort, jsonify, current_app
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
+from models import Product, User, Order, OrderItem, QuoteRequest, ServicePackage, Booking, Availability, Review, ProductPurchase, db, CORPORATE_CATEGORIES
+from utils.catalog_cache import catalog_cache
+from utils.search import product_search
+from utils.pagination import paginate
+from utils.response_cache import response_cache, PACKAGES
+from utils.cart_store import cart_store
+from utils.checkout import checkout_key, place_order
+from utils.stock import OutOfStock
+from utils.pricing import cart_pricing, option_catalog, DEFAULT_SIZE, DEFAULT_FRAME
+from utils.booking_index import booking_index, slot_starts, format_minutes
+from utils.booking_calendar import booking_calendar as calendar_view
 from datetime import datetime, date, timedelta, time
 import uuid
 import json
@@ -7,41 +19,28 @@ import json
 public_bp = Blueprint("public", __name__)
 
 # -----------------------------
-# Pricing options (cents)
+# Helpers: cart
 # -----------------------------
-SIZE_OPTIONS = {
-    "20cm x 30cm": 0,        # base price
-    "40cm x 60cm": 8000,     # +S$ 80.00
-}
-FRAME_OPTIONS = {
-    "No frame": 0,
-    "Black": 2000,           # +S$ 20.00
-    "White": 2000,           # +S$ 20.00
-}
+def _wants_json():
+    return request.headers.get('Content-Type') == 'application/json' or request.is_json
 
-# -----------------------------
-# Helpers: cart & pricing
-# -----------------------------
-def _get_cart():
-    """Return cart list from session, create if missing."""
-    return session.setdefault("cart", [])
-
-def _save_cart(cart):
-    session["cart"] = cart
-    session.modified = True
-
-def _unit_price_cents(product, size, frame):
-    return int(product.price_cents) + int(SIZE_OPTIONS.get(size, 0)) + int(FRAME_OPTIONS.get(frame, 0))
-
-def _cart_totals():
-    cart = _get_cart()
-    total = sum(int(item["unit_price_cents"]) * int(item["qty"]) for item in cart)
-    return total
+def _cart_state(line_id=None):
+    """Totals for AJAX cart responses, computed from the stored unit prices"""
+    lines = cart_store.lines()
+    line = next((l for l in lines if l["id"] == line_id), None)
+    return {
+        'success': True,
+        'qty': line["qty"] if line else 0,
+        'subtotal': line["qty"] * line["unit_price_cents"] if line else 0,
+        'total': sum(l["qty"] * l["unit_price_cents"] for l in lines),
+        'cart_count': sum(l["qty"] for l in lines),
+    }
 
 # -----------------------------
 # Public pages
 # -----------------------------
 @public_bp.route("/corporate-services")
+@response_cache.cached()
 def corporate_services():
     """Corporate services landing page with detailed service offerings."""
     services = [
@@ -150,6 +149,7 @@ def request_quote():
                          selected_service=selected_service)
 
 @public_bp.route("/portfolio")
+@response_cache.cached()
 def portfolio():
     """Portfolio page showcasing corporate work."""
     # Get portfolio items by category
@@ -162,6 +162,7 @@ def portfolio():
     return render_template("portfolio.html", portfolio_items=portfolio_items, categories=CORPORATE_CATEGORIES)
 
 @public_bp.route("/service-packages")
+@response_cache.cached(PACKAGES)
 def service_packages():
     """Display service packages to customers."""
     # Group packages by service type
@@ -221,76 +222,43 @@ def booking_calendar():
                 
             except ValueError:
                 flash("Invalid date or time format.", "danger")
-                return render_template("booking_calendar.html", 
-                                     form_data=request.form, 
-                                     categories=CORPORATE_CATEGORIES)
+                return _render_booking_calendar(form_data=request.form)
         
         # Validate required fields
         if not booking.name or not booking.email or not booking.service_type or not booking_date or not start_time:
             flash("Please fill in all required fields.", "danger")
-            return render_template("booking_calendar.html", 
-                                 form_data=request.form, 
-                                 categories=CORPORATE_CATEGORIES)
+            return _render_booking_calendar(form_data=request.form)
         
-        # Check for conflicts
-        conflicts = Booking.query.filter(
-            Booking.booking_date == booking.booking_date,
-            Booking.status.in_(["pending", "confirmed"]),
-            db.or_(
-                db.and_(Booking.start_time <= booking.start_time, Booking.end_time > booking.start_time),
-                db.and_(Booking.start_time < booking.end_time, Booking.end_time >= booking.end_time),
-                db.and_(booking.start_time <= Booking.start_time, booking.end_time >= Booking.end_time)
-            )
-        ).first()
+        # Check for conflicts against the in-memory booking index
+        conflicts = booking_index.conflict(booking.booking_date, booking.start_time, booking.duration_hours)
         
         if conflicts:
             flash("Sorry, that time slot is already booked. Please select a different time.", "danger")
-            return render_template("booking_calendar.html", 
-                                 form_data=request.form, 
-                                 categories=CORPORATE_CATEGORIES)
+            return _render_booking_calendar(form_data=request.form)
         
-        # Save booking
+        # Save booking; its slot claims make a concurrent booking of the same slot fail here
         try:
             db.session.add(booking)
             db.session.commit()
             flash("Your booking request has been submitted! We'll confirm your appointment within 24 hours.", "success")
             return redirect(url_for("public.booking_calendar"))
+        except IntegrityError:
+            db.session.rollback()
+            flash("Sorry, that time slot is already booked. Please select a different time.", "danger")
+            return _render_booking_calendar(form_data=request.form)
         except Exception as e:
             db.session.rollback()
             flash("There was an error submitting your booking. Please try again.", "danger")
     
-    # Get existing bookings for calendar display (next 30 days)
-    today = date.today()
-    end_date = today + timedelta(days=30)
-    
-    bookings = Booking.query.filter(
-        Booking.booking_date >= today,
-        Booking.booking_date <= end_date,
-        Booking.status.in_(["pending", "confirmed"])
-    ).all()
-    
-    # Create a calendar data structure
-    calendar_data = {}
-    current_date = today
-    while current_date <= end_date:
-        date_str = current_date.strftime("%Y-%m-%d")
-        calendar_data[date_str] = {
-            "date": current_date,
-            "bookings": [],
-            "available_slots": []
-        }
-        current_date += timedelta(days=1)
-    
-    # Add bookings to calendar
-    for booking in bookings:
-        date_str = booking.booking_date.strftime("%Y-%m-%d")
-        if date_str in calendar_data:
-            calendar_data[date_str]["bookings"].append(booking)
-    
+    return _render_booking_calendar()
+
+def _render_booking_calendar(**context):
+    """Render the booking page with the prebuilt month view"""
     return render_template("booking_calendar.html", 
                          categories=CORPORATE_CATEGORIES,
-                         calendar_data=calendar_data,
-                         today=today)
+                         calendar_data=calendar_view.month(),
+                         today=date.today(),
+                         **context)
 
 @public_bp.route("/api/check-availability")
 def check_availability():
@@ -306,26 +274,15 @@ def check_availability():
         check_date = datetime.strptime(booking_date, "%Y-%m-%d").date()
         check_start_time = datetime.strptime(start_time, "%H:%M").time()
         
-        # Calculate end time
-        start_datetime = datetime.combine(check_date, check_start_time)
-        end_datetime = start_datetime + timedelta(hours=duration)
-        check_end_time = end_datetime.time()
-        
-        # Check for conflicts
-        conflicts = Booking.query.filter(
-            Booking.booking_date == check_date,
-            Booking.status.in_(["pending", "confirmed"]),
-            db.or_(
-                db.and_(Booking.start_time <= check_start_time, Booking.end_time > check_start_time),
-                db.and_(Booking.start_time < check_end_time, Booking.end_time >= check_end_time),
-                db.and_(check_start_time <= Booking.start_time, check_end_time >= Booking.end_time)
-            )
-        ).first()
+        # Check for conflicts (answered from memory once the index is warm)
+        conflicts = booking_index.conflict(check_date, check_start_time, duration)
         
+        if conflicts and conflicts.booking_id is None:
+            return jsonify({"available": False, "message": f"Time slot is unavailable: {conflicts.label}"})
         if conflicts:
             return jsonify({
                 "available": False, 
-                "message": f"Time slot conflicts with existing booking from {conflicts.time_display}"
+                "message": f"Time slot conflicts with existing booking from {conflicts.label}"
             })
         
         return jsonify({"available": True, "message": "Time slot is available"})
@@ -333,10 +290,51 @@ def check_availability():
     except Exception as e:
         return jsonify({"available": False, "message": "Invalid date or time format"})
 
+@public_bp.route("/api/availability")
+def availability():
+    """Bookable start times for every day from ``from`` to ``to`` (inclusive).
+
+    The ETag is derived from the bookings version, so a calendar re-fetching
+    an unchanged month gets a 304 without any slot computation.
+    """
+    config = current_app.config
+    try:
+        first = datetime.strptime(request.args.get("from", ""), "%Y-%m-%d").date()
+        last = datetime.strptime(request.args.get("to", ""), "%Y-%m-%d").date()
+        duration = int(request.args.get("duration", 1))
+    except ValueError:
+        return jsonify({"error": "from and to must be YYYY-MM-DD, duration an integer"}), 400
+
+    today = date.today()
+    first = max(first, today)
+    if duration < 1 or last < first:
+        return jsonify({"error": "empty range or invalid duration"}), 400
+    if (last - first).days >= config.get("BOOKING_AVAILABILITY_MAX_DAYS", 92):
+        return jsonify({"error": "range too long"}), 400
+
+    etag = f"avail-{booking_index.version()}-{first}-{last}-{duration}"
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+    else:
+        starts = slot_starts(config)
+        response = jsonify({
+            "from": first.isoformat(),
+            "to": last.isoformat(),
+            "duration": duration,
+            "days": {
+                day.isoformat(): [format_minutes(start) for start in free]
+                for day, free in booking_index.free_starts(first, last, duration, starts)
+            },
+        })
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
 @public_bp.route("/", endpoint="index")
+@response_cache.cached()
 def home():
     # Get available categories for the navigation
-    categories = [c[0] for c in db.session.query(Product.category).distinct() if c[0]]
+    categories = catalog_cache.categories()
     
     # Create featured products if they don't exist
     if not Product.query.filter_by(featured=True).first():
@@ -403,8 +401,15 @@ def _build_products_query():
     media_type = request.args.get("media_type", "").strip()
 
     products_q = Product.query
+    # Newest first by default; full-text searches are ordered by relevance
+    sort_keys, descending = (Product.created_at, Product.id), True
     if q:
-        products_q = products_q.filter(Product.title.ilike(f"%{q}%"))
+        hits = product_search.match(q)
+        if hits is not None:
+            products_q = products_q.join(hits, hits.c.product_id == Product.id)
+            sort_keys, descending = (hits.c.rank, Product.id), False
+        else:
+            products_q = products_q.filter(product_search.fallback_filter(q))
     if min_price is not None:
         products_q = products_q.filter(Product.price_cents >= min_price * 100)
     if max_price is not None:
@@ -418,23 +423,25 @@ def _build_products_query():
         "q": q, "min_price": min_price, "max_price": max_price,
         "category": category, "media_type": media_type,
     }
-    return products_q, filters
+    return products_q, filters, (sort_keys, descending)
 
 @public_bp.route("/shop")
+@response_cache.cached()
 def shop():
-    products_q, filters = _build_products_query()
-    products = products_q.order_by(Product.created_at.desc()).all()
-    categories  = [c[0] for c in db.session.query(Product.category).distinct() if c[0]]
-    media_types = [m[0] for m in db.session.query(Product.mime_type).distinct() if m[0]]
+    products_q, filters, (sort_keys, descending) = _build_products_query()
+    products = paginate(products_q, sort_keys, request.args.get("cursor"), descending=descending)
+    facets = catalog_cache.get()
     return render_template(
         "shop.html",
         products=products,
-        categories=categories,
-        media_types=media_types,
+        categories=facets["categories"],
+        media_types=facets["media_types"],
+        price_range=(facets["min_price_cents"] // 100, -(-facets["max_price_cents"] // 100)),
         filters=filters,
     )
 
 @public_bp.route("/about")
+@response_cache.cached()
 def about():
     return render_template("about.html")
 
@@ -484,10 +491,11 @@ def contact():
 @public_bp.route("/api/products/<int:product_id>/quick-view")
 def quick_view(product_id):
     p = Product.query.get_or_404(product_id)
+    prices = option_catalog.get()
     return render_template("partials/quick_view.html", 
                          product=p,
-                         size_options=SIZE_OPTIONS,
-                         frame_options=FRAME_OPTIONS)
+                         size_options=prices.sizes_for(p),
+                         frame_options=prices.frames_for(p))
 
 # -----------------------------
 # Video player page
@@ -505,66 +513,50 @@ def video(product_id):
 @public_bp.route("/product/<int:product_id>", methods=["GET", "POST"])
 def product(product_id):
     p = Product.query.get_or_404(product_id)
+    prices = option_catalog.get()
+    size_options, frame_options = prices.sizes_for(p), prices.frames_for(p)
 
     if request.method == "POST":
-        size  = request.form.get("size", "20cm x 30cm")
-        frame = request.form.get("frame", "No frame")
+        size  = request.form.get("size", DEFAULT_SIZE)
+        frame = request.form.get("frame", DEFAULT_FRAME)
         qty   = request.form.get("qty", type=int, default=1)
         qty   = 1 if qty is None or qty < 1 else qty
 
-        unit_price = _unit_price_cents(p, size, frame)
+        # only options offered on this product; otherwise its first option
+        if size not in size_options:
+            size = next(iter(size_options), DEFAULT_SIZE)
+        if frame not in frame_options:
+            frame = next(iter(frame_options), DEFAULT_FRAME)
 
-        cart = _get_cart()
-        # merge with existing same (product,size,frame)
-        for item in cart:
-            if item["product_id"] == p.id and item["size"] == size and item["frame"] == frame:
-                item["qty"] += qty
-                _save_cart(cart)
-                
-                # Return JSON response for AJAX requests
-                if request.headers.get('Content-Type') == 'application/json' or request.is_json:
-                    cart_count = sum(int(item.get("qty", 1)) for item in cart)
-                    return jsonify({
-                        'success': True,
-                        'message': f'{p.title} added to cart',
-                        'cart_count': cart_count
-                    })
-                
-                flash("Added to cart.", "success")
-                return redirect(url_for("public.cart"))
-
-        # else push new line
-        cart.append({
-            "product_id": p.id,
-            "title": p.title,
-            "size": size,
-            "frame": frame,
-            "qty": qty,
-            "unit_price_cents": unit_price,
-            # show image in cart (your files live under static/uploads)
-            "image": p.media_key,     # assume Product.media_key is the filename
-        })
-        _save_cart(cart)
+        unit_price = prices.unit_price_cents(p, size, frame)
+
+        # merges with an existing (product, size, frame) line
+        cart_store.add(p.id, size, frame, qty, unit_price)
         
         # Return JSON response for AJAX requests
-        if request.headers.get('Content-Type') == 'application/json' or request.is_json:
-            cart_count = sum(int(item.get("qty", 1)) for item in _get_cart())
+        if _wants_json():
             return jsonify({
                 'success': True,
                 'message': f'{p.title} added to cart',
-                'cart_count': cart_count
+                'cart_count': cart_store.count()
             })
         
         flash("Added to cart.", "success")
         return redirect(url_for("public.cart"))
 
-    # GET: show page with reviews
+    # GET: show page with the rating summary and one page of reviews
     review_stats = Review.get_product_stats(product_id)
+    review_stats["reviews"] = paginate(
+        Review.query.filter_by(product_id=product_id, approved=True).options(joinedload(Review.user)),
+        (Review.created_at, Review.id),
+        request.args.get("cursor"),
+        per_page=current_app.config.get("REVIEWS_PER_PAGE", 10)
+    )
     return render_template(
         "product.html",
         product=p,
-        size_options=SIZE_OPTIONS,    # dict for select
-        frame_options=FRAME_OPTIONS,  # dict for select
+        size_options=size_options,    # mapping for select
+        frame_options=frame_options,  # mapping for select
         review_stats=review_stats,
     )
 
@@ -611,18 +603,8 @@ def submit_review(product_id):
         flash("You have already reviewed this product.", "warning")
         return redirect(url_for("public.product", product_id=product_id))
     
-    # Check if user has purchased this product (verified purchase)
-    verified_purchase = False
-    if user_id:
-        # Check if user has an order with this product
-        user_orders = Order.query.filter_by(user_id=user_id).all()
-        for order in user_orders:
-            for item in order.items:
-                if item.product_id == product_id:
-                    verified_purchase = True
-                    break
-            if verified_purchase:
-                break
+    # Check if user has purchased this product (verified purchase ledger lookup)
+    verified_purchase = bool(user_id) and ProductPurchase.has_purchased(user_id, product_id)
     
     # Create the review
     review = Review(
@@ -649,110 +631,45 @@ def submit_review(product_id):
 
 @public_bp.route("/cart")
 def cart():
-    cart_raw = session.get("cart", [])
-    items = []
-    total = 0
-
-    for idx, it in enumerate(cart_raw):
-        # basic fields with safe defaults
-        pid   = it.get("product_id") or it.get("id")
-        qty   = int(it.get("qty", 1))
-        size  = it.get("size", "20cm x 30cm")
-        frame = it.get("frame", "No frame")
-
-        # skip if product was removed from DB
-        p = Product.query.get(pid)
-        if not p:
-            continue
-
-        # If old cart entry has no unit price, recompute and persist it
-        unit = it.get("unit_price_cents")
-        if unit is None:
-            size_add  = int(SIZE_OPTIONS.get(size, 0))
-            frame_add = int(FRAME_OPTIONS.get(frame, 0))
-            unit = int(p.price_cents) + size_add + frame_add
-            it["unit_price_cents"] = unit  # normalize old entry
-
-        subtotal = int(unit) * qty
-        total += subtotal
-
-        items.append({
-            "idx": idx,
-            "title": p.title,
-            "image": p.media_key,                # stored under static/uploads/
-            "size": size,
-            "frame": frame,
-            "qty": qty,
-            "unit_price_cents": unit,
-            "subtotal_cents": subtotal,
-        })
-
-    # Save normalized cart back into the session
-    session["cart"] = cart_raw
-    session.modified = True
-
-    return render_template("cart.html", items=items, total=total)
+    # Price every line with one product query; skips products removed from the DB
+    priced = cart_pricing.price(cart_store.lines())
+    return render_template("cart.html", items=priced.lines, total=priced.total_cents)
 
 @public_bp.route("/cart/inc/<int:item_idx>", methods=["POST"])
 def cart_inc(item_idx):
-    cart = _get_cart()
-    if 0 <= item_idx < len(cart):
-        cart[item_idx]["qty"] += 1
-        _save_cart(cart)
+    cart_store.increment(item_idx, 1)
     
     # Return JSON response for AJAX requests
-    if request.headers.get('Content-Type') == 'application/json' or request.is_json:
-        total = _cart_totals()
-        cart_count = sum(int(item.get("qty", 1)) for item in cart)
-        return jsonify({
-            'success': True,
-            'qty': cart[item_idx]["qty"] if 0 <= item_idx < len(cart) else 0,
-            'subtotal': (cart[item_idx]["qty"] * cart[item_idx]["unit_price_cents"]) if 0 <= item_idx < len(cart) else 0,
-            'total': total,
-            'cart_count': cart_count
-        })
+    if _wants_json():
+        return jsonify(_cart_state(item_idx))
     
     return redirect(url_for("public.cart"))
 
 @public_bp.route("/cart/dec/<int:item_idx>", methods=["POST"])
 def cart_dec(item_idx):
-    cart = _get_cart()
-    if 0 <= item_idx < len(cart):
-        cart[item_idx]["qty"] = max(1, int(cart[item_idx]["qty"]) - 1)
-        _save_cart(cart)
+    cart_store.increment(item_idx, -1)
     
     # Return JSON response for AJAX requests
-    if request.headers.get('Content-Type') == 'application/json' or request.is_json:
-        total = _cart_totals()
-        cart_count = sum(int(item.get("qty", 1)) for item in cart)
-        return jsonify({
-            'success': True,
-            'qty': cart[item_idx]["qty"] if 0 <= item_idx < len(cart) else 0,
-            'subtotal': (cart[item_idx]["qty"] * cart[item_idx]["unit_price_cents"]) if 0 <= item_idx < len(cart) else 0,
-            'total': total,
-            'cart_count': cart_count
-        })
+    if _wants_json():
+        return jsonify(_cart_state(item_idx))
     
     return redirect(url_for("public.cart"))
 
 @public_bp.route("/cart/del/<int:item_idx>", methods=["POST"])
 def cart_del(item_idx):
-    cart = _get_cart()
-    removed_item = None
-    if 0 <= item_idx < len(cart):
-        removed_item = cart.pop(item_idx)
-        _save_cart(cart)
+    removed = next((l for l in cart_store.lines() if l["id"] == item_idx), None)
+    cart_store.remove(item_idx)
     
     # Return JSON response for AJAX requests
-    if request.headers.get('Content-Type') == 'application/json' or request.is_json:
-        total = _cart_totals()
-        cart_count = sum(int(item.get("qty", 1)) for item in cart)
+    if _wants_json():
+        state = _cart_state()
+        product = db.session.get(Product, removed["product_id"]) if removed else None
         return jsonify({
             'success': True,
-            'removed_item': removed_item.get('title', 'Item') if removed_item else 'Item',
-            'total': total,
-            'cart_count': cart_count,
-            'cart_empty': len(cart) == 0
+            'removed_item': product.title if product else 'Item',
+            'total': state['total'],
+            'cart_count': state['cart_count'],
+            'cart_empty': state['cart_count'] == 0
         })
     
     return redirect(url_for("public.cart"))
@@ -762,52 +679,12 @@ def cart_del(item_idx):
 # -----------------------------
 @public_bp.route("/checkout", methods=["GET", "POST"])
 def checkout():
-    cart_raw = session.get("cart", [])
-    if not cart_raw:
+    # Price cart items the same way as the cart() route
+    priced = cart_pricing.price(cart_store.lines())
+    if not priced:
         flash("Your cart is empty.", "warning")
         return redirect(url_for("public.shop"))
-
-    # Process cart items same as in cart() route
-    items = []
-    total = 0
-
-    for idx, it in enumerate(cart_raw):
-        # basic fields with safe defaults
-        pid   = it.get("product_id") or it.get("id")
-        qty   = int(it.get("qty", 1))
-        size  = it.get("size", "20cm x 30cm")
-        frame = it.get("frame", "No frame")
-
-        # skip if product was removed from DB
-        p = Product.query.get(pid)
-        if not p:
-            continue
-
-        # If old cart entry has no unit price, recompute and persist it
-        unit = it.get("unit_price_cents")
-        if unit is None:
-            size_add  = int(SIZE_OPTIONS.get(size, 0))
-            frame_add = int(FRAME_OPTIONS.get(frame, 0))
-            unit = int(p.price_cents) + size_add + frame_add
-            it["unit_price_cents"] = unit  # normalize old entry
-
-        subtotal = int(unit) * qty
-        total += subtotal
-
-        items.append({
-            "idx": idx,
-            "title": p.title,
-            "image": p.media_key,
-            "size": size,
-            "frame": frame,
-            "qty": qty,
-            "unit_price_cents": unit,
-            "subtotal_cents": subtotal,
-        })
-
-    # Save normalized cart back into the session
-    session["cart"] = cart_raw
-    session.modified = True
+    items, total = priced.lines, priced.total_cents
 
     if request.method == "POST":
         # Get form data
@@ -831,43 +708,26 @@ def checkout():
             return render_template("checkout.html", total=total, items=items, 
                                  name=name, address=address, email=email, phone=phone)
         
-        # Create Order record in database
+        # Create the Order (or reuse the one a retry of this cart already created)
         try:
-            order = Order(
+            order, _created = place_order(
+                checkout_key("checkout", priced, email),
+                priced,
                 email=email,
-                amount_cents=total,
                 currency="sgd",
-                status="pending"
+                status="pending",
+                user_id=session.get("user_id"),  # Link to user if logged in
             )
             
-            # Link to user if logged in
-            if session.get("user_id"):
-                order.user_id = session["user_id"]
-            
-            db.session.add(order)
-            db.session.flush()  # Get the order ID
-            
-            # Create OrderItem records
-            for idx, item in enumerate(items):
-                # Get the original cart item to find product_id
-                cart_item = cart_raw[idx]
-                product_id = cart_item.get("product_id") or cart_item.get("id")
-                
-                order_item = OrderItem(
-                    order_id=order.id,
-                    product_id=product_id,
-                    quantity=item["qty"],
-                    unit_price_cents=item["unit_price_cents"]
-                )
-                db.session.add(order_item)
-            
-            db.session.commit()
-            
             # Clear cart and redirect to confirmation
-            session["cart"] = []
-            session.modified = True
+            cart_store.clear()
             return redirect(url_for("public.confirmation", order_no=f"ORD{order.id:05d}"))
             
+        except OutOfStock as e:
+            product = db.session.get(Product, e.product_id)
+            flash(f"Sorry, {product.title if product else 'an item in your cart'} does not have enough stock left.", "danger")
+            return render_template("checkout.html", total=total, items=items, 
+                                 name=name, address=address, email=email, phone=phone)
         except Exception as e:
             db.session.rollback()
             flash("There was an error processing your order. Please try again.", "danger")
@@ -899,15 +759,11 @@ def confirmation():
 
 @public_bp.app_context_processor
 def inject_cart_count():
-    # Get cart count
-    cart = session.get("cart", [])
-    try:
-        count = sum(int(item.get("qty", 1)) for item in cart)
-    except Exception:
-        count = 0
+    # Get cart count (no lookup for visitors without a cart)
+    count = cart_store.count()
         
-    # Get available categories
-    categories = [c[0] for c in db.session.query(Product.category).distinct() if c[0]]
+    # Get available categories (cached per catalog version)
+    categories = catalog_cache.categories()
     
     return {
         "cart_count": count,
@@ -929,8 +785,12 @@ def orders():
         flash("User not found. Please log in again.", "error")
         return redirect(url_for("auth.auth"))
     
-    # Get user's orders
-    user_orders = Order.query.filter_by(user_id=user.id).order_by(Order.created_at.desc()).all()
+    # Get user's orders, one page at a time
+    user_orders = paginate(
+        Order.query.options(*Order.with_items()).filter_by(user_id=user.id),
+        (Order.created_at, Order.id),
+        request.args.get("cursor"),
+    )
     
     return render_template("orders.html", orders=user_orders)
 
@@ -977,7 +837,7 @@ def profile():
         return redirect(url_for("public.profile"))
     
     # GET request - show profile page
-    # Get user's orders
-    orders = Order.query.filter_by(user_id=user.id).order_by(Order.created_at.desc()).all()
+    # Get user's most recent orders (full history lives on the orders page)
+    orders = paginate(Order.query.filter_by(user_id=user.id), (Order.created_at, Order.id))
     
     return render_template("profile.html", user=user, orders=orders)
\ No newline at end of file
@@ -0,0 +1,42 @@
+import os
+import shutil
+import tempfile
+from datetime import date, timedelta
+import pytest
+
+# Point the app at a throwaway database before any test module imports it, so
+# a test run never writes into the development database. TEST_DATABASE_URI
+# runs the suite against another database instead.
+_workdir = tempfile.mkdtemp(prefix="flash_tests_")
+os.environ["SQLALCHEMY_DATABASE_URI"] = os.getenv(
+    "TEST_DATABASE_URI", f"sqlite:///{os.path.join(_workdir, 'test.db')}"
+)
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(_workdir, ignore_errors=True)
+
+
+@pytest.fixture
+def free_booking_day():
+    """Return ``pick(first, last, span=1)``: the first day ``today + first`` ..
+    ``today + last`` starting ``span`` days without any booking, slot claim or
+    availability row, so booking tests do not trip over data from other tests
+    or earlier runs.
+    """
+    from app import app, db
+    from models import Availability, Booking, BookingSlotClaim
+
+    def pick(first, last, span=1):
+        start, end = date.today() + timedelta(days=first), date.today() + timedelta(days=last + span)
+        with app.app_context():
+            taken = set()
+            for column in (Booking.booking_date, BookingSlotClaim.day, Availability.date):
+                taken.update(day for (day,) in db.session.query(column).filter(column >= start, column < end))
+        for offset in range(first, last + 1):
+            day = date.today() + timedelta(days=offset)
+            if not any(day + timedelta(days=n) in taken for n in range(span)):
+                return day
+        pytest.fail(f"no free booking day between +{first} and +{last} days")
+
+    return pick
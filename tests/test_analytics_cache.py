@@ -0,0 +1,97 @@
+import threading
+import time
+from app import app, db
+from utils.analytics_cache import analytics_cache
+
+
+def setup_module(module):
+    with app.app_context():
+        db.create_all()
+
+
+def _admin_client():
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['admin'] = True
+    return client
+
+
+def test_polls_hit_the_cache_and_revalidate_with_304():
+    analytics_cache.clear()
+    client = _admin_client()
+    first = client.get('/admin/api/analytics/dashboard?range=7')
+    assert first.status_code == 200
+    assert first.headers['X-Cache'] == 'MISS'
+    assert 'total_revenue' in first.get_json()
+
+    second = client.get('/admin/api/analytics/dashboard?range=7')
+    assert second.headers['X-Cache'] == 'HIT'
+    assert second.headers['ETag'] == first.headers['ETag']
+
+    unchanged = client.get('/admin/api/analytics/dashboard?range=7',
+                           headers={'If-None-Match': first.headers['ETag']})
+    assert unchanged.status_code == 304
+    assert unchanged.data == b''
+
+    other_range = client.get('/admin/api/analytics/dashboard?range=30')
+    assert other_range.headers['X-Cache'] == 'MISS'
+    assert client.get('/admin/api/analytics/bogus').status_code == 400
+
+
+def test_concurrent_misses_compute_once():
+    analytics_cache.clear()
+    calls = []
+    gate = threading.Event()
+
+    def compute():
+        calls.append(1)
+        gate.wait(5)
+        return {'value': 42}
+
+    results = []
+
+    def poll():
+        with app.app_context():
+            results.append(analytics_cache.get(('single-flight', None), compute))
+
+    threads = [threading.Thread(target=poll) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.2)
+    gate.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert len(results) == 8
+    assert len({entry['etag'] for entry, _state in results}) == 1
+
+
+def test_stale_entries_are_served_while_refreshing():
+    analytics_cache.clear()
+    values = iter([1, 2])
+    refreshed = threading.Event()
+
+    def compute():
+        value = next(values)
+        if value == 2:
+            refreshed.set()
+        return {'value': value}
+
+    key = ('stale', None)
+    with app.app_context():
+        entry, state = analytics_cache.get(key, compute)
+        assert state == 'MISS'
+        entry['fresh_until'] = time.monotonic() - 1
+
+        stale, state = analytics_cache.get(key, compute)
+        assert state == 'STALE'
+        assert stale['body'] == entry['body']
+        assert refreshed.wait(5)
+        for _ in range(50):
+            fresh, state = analytics_cache.get(key, compute)
+            if state == 'HIT':
+                break
+            time.sleep(0.02)
+        assert state == 'HIT'
+        assert fresh['etag'] != entry['etag']
@@ -0,0 +1,49 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import time
+from app import app, db
+from models import Booking, BookingSlotClaim
+from utils.booking_claims import slot_indexes
+
+
+def setup_module(module):
+    with app.app_context():
+        db.create_all()
+
+
+def _book(client, day, start, hours, email):
+    return client.post('/booking-calendar', data={
+        'name': 'Race', 'email': email, 'service_type': 'Portrait',
+        'booking_date': day.isoformat(), 'start_time': start, 'duration_hours': hours,
+    })
+
+
+def test_overlapping_bookings_share_a_claim():
+    ten_to_twelve = set(slot_indexes(time(10), time(12), 2))
+    assert ten_to_twelve & set(slot_indexes(time(11, 45), None, 1))
+    assert not ten_to_twelve & set(slot_indexes(time(12), None, 1))
+
+
+def test_parallel_bookings_of_one_slot_admit_exactly_one(free_booking_day):
+    day = free_booking_day(20, 200)
+
+    def attempt(i):
+        return _book(app.test_client(), day, '11:00' if i % 2 else '10:00', 2, f'race{i}@example.com').status_code
+
+    with ThreadPoolExecutor(max_workers=32) as pool:
+        statuses = list(pool.map(attempt, range(200)))
+
+    assert 500 not in statuses
+    with app.app_context():
+        booked = Booking.query.filter_by(booking_date=day).all()
+        assert len(booked) == 1
+        assert BookingSlotClaim.query.filter_by(day=day).count() == 8
+        booking_id = booked[0].id
+
+    # Cancelling frees the slot for the next customer
+    admin = app.test_client()
+    with admin.session_transaction() as sess:
+        sess['admin'] = True
+    admin.post(f'/admin/bookings/{booking_id}', data={'status': 'cancelled'})
+    assert _book(app.test_client(), day, '10:00', 1, 'after@example.com').status_code == 302
+    with app.app_context():
+        assert BookingSlotClaim.query.filter_by(day=day).count() == 4
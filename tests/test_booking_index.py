@@ -0,0 +1,106 @@
+from datetime import time, timedelta
+from sqlalchemy import event
+from app import app, db
+from models import Availability, Booking
+from utils.booking_index import DaySchedule, Interval
+
+
+def setup_module(module):
+    with app.app_context():
+        db.create_all()
+
+
+def test_day_schedule_finds_overlaps():
+    day = DaySchedule([
+        Interval(540, 1020, 1, 'long'),   # 09:00-17:00
+        Interval(600, 660, 2, 'short'),   # 10:00-11:00
+        Interval(1080, 1140, 3, 'late'),  # 18:00-19:00
+    ])
+    assert day.conflict(1020, 1080) is None
+    assert day.conflict(480, 540) is None
+    assert day.conflict(960, 1000).booking_id == 1
+    assert day.conflict(1100, 1200).booking_id == 3
+    assert DaySchedule().conflict(0, 1440) is None
+
+
+def test_availability_probes_skip_the_database(free_booking_day):
+    day = free_booking_day(7, 120).isoformat()
+    client = app.test_client()
+    resp = client.post('/booking-calendar', data={
+        'name': 'Index Test', 'email': 'index@example.com', 'service_type': 'Portrait',
+        'booking_date': day, 'start_time': '14:00', 'duration_hours': 2,
+    })
+    assert resp.status_code == 302
+
+    clash = client.get(f'/api/check-availability?date={day}&time=15:00&duration=1').get_json()
+    assert not clash['available']
+    assert '02:00 PM' in clash['message']
+
+    statements = []
+
+    def record(conn, cursor, statement, *rest):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        free = client.get(f'/api/check-availability?date={day}&time=16:00&duration=1').get_json()
+        before = client.get(f'/api/check-availability?date={day}&time=12:00&duration=2').get_json()
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+    assert free['available'] and before['available']
+    assert statements == []
+
+    again = client.post('/booking-calendar', data={
+        'name': 'Index Test', 'email': 'index@example.com', 'service_type': 'Portrait',
+        'booking_date': day, 'start_time': '13:00', 'duration_hours': 2,
+    })
+    assert b'already booked' in again.data
+
+
+def test_availability_grid_and_etag(free_booking_day):
+    day = free_booking_day(10, 120, span=2)
+    with app.app_context():
+        db.session.add(Booking(name='Grid', email='grid@example.com', service_type='Portrait',
+                               booking_date=day, start_time=time(10), end_time=time(12), duration_hours=2))
+        db.session.add(Availability(date=day, start_time=time(15), end_time=time(16),
+                                    is_available=False, notes='Studio maintenance'))
+        db.session.commit()
+
+    client = app.test_client()
+    url = f'/api/availability?from={day}&to={day + timedelta(days=1)}&duration=1'
+    resp = client.get(url)
+    assert resp.status_code == 200
+    days = resp.get_json()['days']
+    assert days[day.isoformat()] == ['09:00', '12:00', '13:00', '14:00', '16:00', '17:00']
+    assert len(days[(day + timedelta(days=1)).isoformat()]) == 9
+
+    cached = client.get(url, headers={'If-None-Match': resp.headers['ETag']})
+    assert cached.status_code == 304
+
+    blocked = client.get(f'/api/check-availability?date={day}&time=15:00&duration=1').get_json()
+    assert blocked['message'] == 'Time slot is unavailable: Studio maintenance'
+
+
+def test_calendar_summaries_follow_booking_writes(free_booking_day):
+    from models import BookingDaySummary
+    day = free_booking_day(3, 29)
+    client = app.test_client()
+    client.post('/booking-calendar', data={
+        'name': 'Calendar', 'email': 'calendar@example.com', 'service_type': 'Portrait',
+        'booking_date': day.isoformat(), 'start_time': '09:00', 'duration_hours': 4,
+    })
+    with app.app_context():
+        summary = db.session.get(BookingDaySummary, day)
+        assert (summary.booking_count, summary.booked_minutes, summary.free_slots) == (1, 240, 5)
+        booking_id = Booking.query.filter_by(email='calendar@example.com', booking_date=day).one().id
+    assert b'5 slot(s) free' in client.get('/booking-calendar').data
+
+    admin = app.test_client()
+    with admin.session_transaction() as sess:
+        sess['admin'] = True
+    admin.post(f'/admin/bookings/{booking_id}', data={'status': 'cancelled'})
+    with app.app_context():
+        assert db.session.get(BookingDaySummary, day) is None
+    assert b'5 slot(s) free' not in client.get('/booking-calendar').data
@@ -0,0 +1,84 @@
+import uuid
+from app import app, db
+from models import Product, User, ProductOption
+from werkzeug.security import generate_password_hash
+
+# A fresh user per run, so a saved cart from an earlier run is never merged
+USER_EMAIL = f'cart-{uuid.uuid4().hex[:8]}@example.com'
+
+
+def setup_module(module):
+    with app.app_context():
+        db.create_all()
+        ProductOption.seed_defaults()
+        if not Product.query.filter_by(title='Cart Product').first():
+            db.session.add(Product(title='Cart Product', description='Desc', price_cents=1000, media_key='x', stock=10))
+        db.session.add(User(email=USER_EMAIL, password_hash=generate_password_hash('pw')))
+        db.session.commit()
+
+
+def _product_id():
+    with app.app_context():
+        return Product.query.filter_by(title='Cart Product').first().id
+
+
+def _add(client, product_id, qty=1, size='20cm x 30cm'):
+    return client.post(f'/product/{product_id}', data={'size': size, 'frame': 'No frame', 'qty': qty})
+
+
+def test_cookie_holds_only_cart_id():
+    client = app.test_client()
+    pid = _product_id()
+    for i in range(30):
+        _add(client, pid, size='40cm x 60cm' if i % 2 else '20cm x 30cm')
+    with client.session_transaction() as sess:
+        assert set(sess.keys()) <= {'cart_id', '_flashes'}
+        cart_id = sess['cart_id']
+    assert len(cart_id) == 32
+    resp = client.get('/cart')
+    assert resp.status_code == 200
+    assert b'Cart Product' in resp.data
+
+
+def test_line_operations_are_keyed_by_line_id():
+    client = app.test_client()
+    pid = _product_id()
+    _add(client, pid, qty=2)
+    _add(client, pid, qty=1, size='40cm x 60cm')
+    state = client.post('/cart/inc/0', json={}).get_json()
+    assert state['cart_count'] == 3  # unknown line: nothing changes
+
+    from utils.cart_store import cart_store
+    with client.session_transaction() as sess:
+        cart_id = sess['cart_id']
+    with app.app_context():
+        first, second = cart_store.backend.lines(cart_id)
+
+    state = client.post(f'/cart/inc/{first["id"]}', json={}).get_json()
+    assert state['qty'] == 3 and state['cart_count'] == 4
+    state = client.post(f'/cart/dec/{second["id"]}', json={}).get_json()
+    assert state['qty'] == 1  # never below one
+    state = client.post(f'/cart/del/{first["id"]}', json={}).get_json()
+    assert state['removed_item'] == 'Cart Product'
+    assert state['cart_count'] == 1 and not state['cart_empty']
+    state = client.post(f'/cart/del/{second["id"]}', json={}).get_json()
+    assert state['cart_empty']
+    with client.session_transaction() as sess:
+        assert 'cart_id' not in sess
+
+
+def test_login_merges_anonymous_cart_into_saved_cart():
+    pid = _product_id()
+    first = app.test_client()
+    first.post('/auth/login', data={'username': USER_EMAIL, 'password': 'pw'})
+    _add(first, pid, qty=2)
+
+    second = app.test_client()
+    _add(second, pid, qty=1)
+    _add(second, pid, qty=1, size='40cm x 60cm')
+    second.post('/auth/login', data={'username': USER_EMAIL, 'password': 'pw'})
+
+    state = second.post('/cart/inc/0', json={}).get_json()
+    assert state['cart_count'] == 4
+    with first.session_transaction() as a, second.session_transaction() as b:
+        assert a['cart_id'] == b['cart_id']
@@ -0,0 +1,91 @@
+from datetime import date, datetime, time, timedelta
+from app import app, db
+from models import Analytics, Booking, Order, QuoteRequest
+from utils.daily_metrics import daily_metrics
+
+
+def setup_module(module):
+    with app.app_context():
+        db.create_all()
+        daily_metrics.rebuild()
+
+
+def test_incremental_rollup_matches_rebuild(free_booking_day):
+    now = datetime.utcnow()
+    first_day = free_booking_day(400, 2000, span=15)
+    with app.app_context():
+        orders = [Order(email=f'roll{i}@example.com', amount_cents=1000 * (i + 1), currency='sgd',
+                        status=('paid', 'pending')[i % 2], created_at=now - timedelta(days=i * 20))
+                  for i in range(6)]
+        quotes = [QuoteRequest(name=f'Roll {i}', email=f'rq{i}@example.com',
+                               service_type=('Drone Footage', 'Live Streaming')[i % 2],
+                               status=('pending', 'quoted', 'closed')[i % 3],
+                               quote_amount=50000 + i if i % 2 else None, created_at=now - timedelta(days=i * 9))
+                  for i in range(6)]
+        bookings = [Booking(name=f'Roll {i}', email=f'rb{i}@example.com', service_type='Drone Footage',
+                            booking_date=first_day + timedelta(days=i), start_time=time(10),
+                            duration_hours=1, status=('pending', 'confirmed')[i % 2])
+                    for i in range(4)]
+        db.session.add_all(orders + quotes + bookings)
+        db.session.commit()
+
+        # Updates that move figures between statuses, days and dimensions, and deletes
+        orders[1].status = 'paid'
+        orders[0].amount_cents += 500
+        quotes[0].status = 'quoted'
+        quotes[0].quote_amount = 70000
+        quotes[1].service_type = 'Drone Footage'
+        bookings[0].status = 'confirmed'
+        bookings[1].booking_date += timedelta(days=10)
+        db.session.delete(quotes[2])
+        db.session.delete(bookings[3])
+        db.session.commit()
+
+        stats = Analytics.get_dashboard_stats(30)
+        funnel = Analytics.get_quote_conversion_funnel()
+        paid = db.session.query(db.func.sum(Order.amount_cents)).filter(Order.status == 'paid').scalar()
+
+        _written, corrected = daily_metrics.rebuild()
+        assert corrected == 0
+
+        assert stats['total_revenue'] == paid / 100
+        assert stats['total_quotes'] == funnel['total'] == QuoteRequest.query.count()
+        assert funnel['quoted'] == QuoteRequest.query.filter_by(status='quoted').count()
+        assert stats['total_bookings'] == Booking.query.count()
+        assert Analytics.get_dashboard_stats(30) == stats
+
+
+def test_rebuild_repairs_writes_that_bypass_the_orm():
+    with app.app_context():
+        order = Order(email='bulk@example.com', amount_cents=4200, currency='sgd', status='paid')
+        db.session.add(order)
+        db.session.commit()
+        before = Analytics.get_dashboard_stats()['total_revenue']
+
+        db.session.execute(Order.__table__.update().where(Order.__table__.c.id == order.id)
+                           .values(status='refunded'))
+        db.session.commit()
+        assert Analytics.get_dashboard_stats()['total_revenue'] == before
+
+        _written, corrected = daily_metrics.rebuild(days=2)
+        assert corrected == 1
+        assert Analytics.get_dashboard_stats()['total_revenue'] == before - 42
+
+
+def test_period_figures_include_their_first_day():
+    from models import DailyMetric, _metric
+    start = date.today() - timedelta(days=7)
+    with app.app_context():
+        before = Analytics.get_dashboard_stats(7)['period_revenue']
+        db.session.add(Order(email='edge@example.com', amount_cents=700, currency='sgd', status='paid',
+                             created_at=datetime.combine(start, time(0, 5))))
+        db.session.commit()
+        assert Analytics.get_dashboard_stats(7)['period_revenue'] == before + 7
+
+        # A datetime bound counts its whole day, as a date bound does
+        by_date = Analytics.figures(paid=_metric(DailyMetric.PAID_REVENUE, first=start)).paid
+        by_datetime = Analytics.figures(paid=_metric(DailyMetric.PAID_REVENUE,
+                                                     first=datetime.combine(start, time(12)))).paid
+        assert by_datetime == by_date
+        assert {row[0] for row in Analytics.daily(DailyMetric.PAID_REVENUE, datetime.combine(start, time(12)))} \
+            >= {start}
@@ -0,0 +1,38 @@
+from app import app, db
+from utils.dummy_payments import DummyPaymentIntent, DummyPaymentProvider, MemoryIntentStore, SQLIntentStore
+
+
+def setup_module(module):
+    with app.app_context():
+        db.create_all()
+
+
+def test_memory_store_is_bounded_and_enforces_ttl():
+    store = MemoryIntentStore(max_entries=3)
+    intents = [DummyPaymentIntent(100) for _ in range(5)]
+    for intent in intents:
+        store.add(intent)
+    assert len(store) == 3
+    assert store.get(intents[0].id) is None and store.get(intents[4].id) is not None
+
+    stale = DummyPaymentIntent(100, ttl_seconds=-1)
+    store.add(stale)
+    assert store.get(stale.id) is None
+    assert store.transition(stale.id, ('requires_confirmation',), 'succeeded') is None
+
+
+def test_sql_store_is_shared_between_workers():
+    with app.app_context():
+        worker_a, worker_b = DummyPaymentProvider(SQLIntentStore()), DummyPaymentProvider(SQLIntentStore())
+        intent = worker_a.create_payment_intent(2500, 'sgd', metadata={'email': 'a@example.com'})
+        assert worker_b.retrieve(intent.id).metadata == {'email': 'a@example.com'}
+        db.session.commit()
+        assert worker_b.confirm(intent.id).status == 'succeeded'
+        db.session.commit()
+        assert worker_a.retrieve(intent.id).status == 'succeeded'
+
+        expired = DummyPaymentIntent(100, ttl_seconds=-1)
+        worker_a.store.add(expired)
+        db.session.commit()
+        assert worker_b.retrieve(expired.id) is None
+        assert worker_b.store.purge_expired() >= 1
@@ -0,0 +1,180 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from app import app, db
+from models import EmailOutbox, Order, OrderItem, Product
+from utils.email_outbox import email_outbox
+from utils.email_service import email_dispatcher
+
+# Status and delay of every stub answer, and whether it takes JSON arrays
+STUB = {'status': 200, 'delay': 0, 'arrays': True}
+RECEIVED = []
+REQUESTS = []
+
+
+class EmailStub(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        time.sleep(STUB['delay'])
+        message = json.loads(body)
+        REQUESTS.append(message)
+        status = STUB['status']
+        if isinstance(message, list) and not STUB['arrays']:
+            status, answer = 400, {'success': False}
+        elif isinstance(message, list):
+            RECEIVED.extend(message)
+            answer = [{'success': status == 200} for _ in message]
+        else:
+            RECEIVED.append(message)
+            answer = {'success': status == 200}
+        data = json.dumps(answer).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def setup_module(module):
+    module.server = ThreadingHTTPServer(('127.0.0.1', 0), EmailStub)
+    threading.Thread(target=module.server.serve_forever, daemon=True).start()
+    module.saved = {key: app.config.get(key) for key in
+                    ('EMAIL_FUNCTION_URL', 'EMAIL_MAX_ATTEMPTS', 'EMAIL_RETRY_BASE_SECONDS', 'EMAIL_BATCH_SIZE')}
+    app.config.update(EMAIL_FUNCTION_URL=f'http://127.0.0.1:{module.server.server_address[1]}/api/EmailNotifications',
+                      EMAIL_MAX_ATTEMPTS=3, EMAIL_RETRY_BASE_SECONDS=0)
+    with app.app_context():
+        db.create_all()
+
+
+def teardown_module(module):
+    app.config.update(module.saved)
+    email_dispatcher.batches_supported = True
+    module.server.shutdown()
+
+
+def _settle(email_id):
+    """Send due emails here and wait for ones leased by background workers"""
+    with app.app_context():
+        for _ in range(200):
+            email_outbox.drain(app.config)
+            status = db.session.get(EmailOutbox, email_id).status
+            db.session.commit()
+            if status in ('sent', 'dead'):
+                return status
+            time.sleep(0.02)
+    return status
+
+
+def _order():
+    product = Product(title='Outbox print', price_cents=2500, media_key='outbox.jpg', stock=10)
+    db.session.add(product)
+    db.session.flush()
+    order = Order(email='outbox@example.com', amount_cents=2500, currency='sgd', status='pending')
+    db.session.add(order)
+    db.session.flush()
+    db.session.add(OrderItem(order_id=order.id, product_id=product.id, quantity=1, unit_price_cents=2500))
+    db.session.commit()
+    return order.id
+
+
+def test_checkout_queues_email_without_waiting_for_it():
+    STUB.update(status=200, delay=1.0)
+    RECEIVED.clear()
+    with app.app_context():
+        order_id = _order()
+
+    started = time.monotonic()
+    response = app.test_client().post('/payment/fake-checkout/complete',
+                                      data={'order_id': order_id, 'payment_choice': 'success'})
+    assert response.status_code == 302
+    assert time.monotonic() - started < 0.8
+
+    with app.app_context():
+        assert db.session.get(Order, order_id).status == 'paid'
+        email = EmailOutbox.query.filter_by(order_id=order_id).one()
+        assert email.kind == 'order_confirmation' and email.recipient == 'outbox@example.com'
+        email_id = email.id
+
+    assert _settle(email_id) == 'sent'
+    assert any(body['order_id'] == f'ORD{order_id:05d}' for body in RECEIVED)
+
+
+def test_failed_sends_retry_then_dead_letter():
+    STUB.update(status=503, delay=0)
+    with app.app_context():
+        order = db.session.get(Order, _order())
+        email = email_outbox.queue_payment_failure(order)
+        db.session.commit()
+        email_id = email.id
+
+    assert _settle(email_id) == 'dead'
+    with app.app_context():
+        email = db.session.get(EmailOutbox, email_id)
+        assert email.attempts == 3 and '503' in email.last_error
+
+        STUB.update(status=200)
+        assert email_outbox.requeue_dead() >= 1
+    assert _settle(email_id) == 'sent'
+
+
+def test_rejected_email_is_dead_after_one_attempt():
+    STUB.update(status=400, delay=0)
+    with app.app_context():
+        email = email_outbox.enqueue('custom', {'type': 'custom', 'to': 'bad@example.com'})
+        db.session.commit()
+        email_id = email.id
+
+    assert _settle(email_id) == 'dead'
+    with app.app_context():
+        assert db.session.get(EmailOutbox, email_id).attempts == 1
+
+
+def _queue(count):
+    with app.app_context():
+        emails = [email_outbox.enqueue('custom', {'type': 'custom', 'to': f'burst{n}@example.com'})
+                  for n in range(count)]
+        db.session.commit()
+        return [email.id for email in emails]
+
+
+def test_burst_reuses_connections():
+    STUB.update(status=200, delay=0)
+    with app.app_context():
+        opened = email_dispatcher.connections_opened()
+    ids = _queue(30)
+    assert all(_settle(email_id) == 'sent' for email_id in ids)
+    with app.app_context():
+        stats = email_dispatcher.stats()
+    # One connection per concurrent sender, not one per email
+    assert stats['connections_opened'] - opened <= 4
+    assert stats['sent'] >= 30 and stats['requests'] >= 30
+
+
+def test_batches_coalesce_and_fall_back_to_single_sends():
+    STUB.update(status=200, delay=0, arrays=True)
+    app.config['EMAIL_BATCH_SIZE'] = 10
+    REQUESTS.clear()
+    with app.app_context():
+        batches = email_dispatcher.stats()['batch_requests']
+    ids = _queue(20)
+    assert all(_settle(email_id) == 'sent' for email_id in ids)
+    assert any(isinstance(body, list) and len(body) > 1 for body in REQUESTS)
+    with app.app_context():
+        assert email_dispatcher.stats()['batch_requests'] > batches
+
+    # A function that rejects arrays still gets every email, one per request
+    STUB.update(arrays=False)
+    RECEIVED.clear()
+    with app.app_context():
+        messages = [{'type': 'custom', 'to': f'single{n}@example.com'} for n in range(3)]
+        results = email_dispatcher.send_many(messages, timeout=5)
+    assert [result['success'] for result in results] == [True, True, True]
+    assert [body['to'] for body in RECEIVED] == [message['to'] for message in messages]
+    assert not email_dispatcher.batches_supported
+    app.config['EMAIL_BATCH_SIZE'] = 1
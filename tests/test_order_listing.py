@@ -0,0 +1,72 @@
+from sqlalchemy import event
+from app import app, db
+from models import Product, User, Order, OrderItem
+from werkzeug.security import generate_password_hash
+
+
+def setup_module(module):
+    with app.app_context():
+        db.create_all()
+        for i in range(3):
+            if not Product.query.filter_by(title=f'Listing Product {i}').first():
+                db.session.add(Product(title=f'Listing Product {i}', description='Desc', price_cents=1000, media_key='x', stock=10))
+        for email in ('few@example.com', 'many@example.com'):
+            if not User.query.filter_by(email=email).first():
+                db.session.add(User(email=email, password_hash=generate_password_hash('pw')))
+        db.session.commit()
+
+
+def _seed_orders(email, count):
+    with app.app_context():
+        user = User.query.filter_by(email=email).first()
+        products = Product.query.filter(Product.title.like('Listing Product %')).all()
+        for _ in range(count - Order.query.filter_by(user_id=user.id).count()):
+            order = Order(email=email, amount_cents=6000, currency='sgd', status='paid', user_id=user.id)
+            db.session.add(order)
+            db.session.flush()
+            for product in products:
+                db.session.add(OrderItem(order_id=order.id, product_id=product.id, quantity=2, unit_price_cents=1000))
+        db.session.commit()
+        return user.id
+
+
+def _count_queries(client, url):
+    statements = []
+
+    def record(conn, cursor, statement, *rest):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    client.get(url)  # warm per-worker caches first
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        resp = client.get(url)
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+    assert resp.status_code == 200
+    return resp, len(statements)
+
+
+def test_order_pages_use_constant_queries():
+    counts = []
+    for email, orders in (('few@example.com', 2), ('many@example.com', 20)):
+        user_id = _seed_orders(email, orders)
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['user_id'] = user_id
+        resp, queries = _count_queries(client, '/orders')
+        assert resp.data.count(b'Listing Product 0') == orders
+        counts.append(queries)
+    assert counts[0] == counts[1]
+
+
+def test_admin_orders_show_item_counts_without_loading_items():
+    _seed_orders('many@example.com', 20)
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['admin'] = True
+    resp, queries = _count_queries(client, '/admin/orders?format=json')
+    data = resp.get_json()
+    assert any(row['item_count'] == 6 for row in data['items'])
+    assert queries <= 3
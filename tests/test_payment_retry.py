@@ -0,0 +1,119 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from utils.payment_retry import PaymentClient, PaymentError, CircuitOpen
+
+# path -> list of (status, delay_seconds[, raw_body]) answered in turn; the last one repeats
+SCRIPT = {}
+SEEN = []
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def _answer(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length).decode() if length else ''
+        SEEN.append((self.command, self.path, self.headers.get('Idempotency-Key'), body))
+        steps = SCRIPT.get(self.path.split('?')[0], [(200, 0)])
+        status, delay, *raw = steps.pop(0) if len(steps) > 1 else steps[0]
+        time.sleep(delay)
+        payload = {'id': 'pi_stub', 'object': 'payment_intent'} if status < 400 else \
+            {'error': {'message': f'stub {status}', 'code': 'stub'}}
+        data = raw[0] if raw else json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html' if raw else 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    do_GET = do_POST = _answer
+
+    def log_message(self, *args):
+        pass
+
+
+def setup_module(module):
+    module.server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    threading.Thread(target=module.server.serve_forever, daemon=True).start()
+
+
+def teardown_module(module):
+    module.server.shutdown()
+
+
+def _client(**overrides):
+    config = {
+        'STRIPE_API_BASE': f'http://127.0.0.1:{server.server_address[1]}',
+        'STRIPE_SECRET_KEY': 'sk_test_stub',
+        'PAYMENT_READ_TIMEOUT': 0.5,
+        'PAYMENT_DEADLINE_SECONDS': 3,
+        'PAYMENT_MAX_RETRIES': 3,
+        'PAYMENT_BACKOFF_BASE': 0.01,
+        'PAYMENT_BACKOFF_CAP': 0.05,
+        'PAYMENT_BREAKER_THRESHOLD': 2,
+        'PAYMENT_BREAKER_RESET_SECONDS': 0.3,
+    }
+    config.update(overrides)
+    return PaymentClient(config)
+
+
+def test_retries_server_errors_with_one_idempotency_key():
+    SEEN.clear()
+    SCRIPT['/v1/payment_intents'] = [(503, 0), (500, 0), (200, 0)]
+    client = _client()
+    intent = client.create_payment_intent(1500, 'sgd', metadata={'order_id': 7})
+    assert intent['id'] == 'pi_stub'
+    keys = {key for _, _, key, _ in SEEN}
+    assert len(SEEN) == 3 and len(keys) == 1 and None not in keys
+    assert 'metadata%5Border_id%5D=7' in SEEN[0][3]
+    stats = client.stats()
+    assert stats['retries'] == 2 and stats['succeeded'] == 1 and stats['failed'] == 0
+    assert stats['p50_ms'] is not None and stats['circuit'] == 'closed'
+
+
+def test_client_errors_are_not_retried():
+    SEEN.clear()
+    SCRIPT['/v1/customers'] = [(400, 0)]
+    client = _client()
+    with pytest.raises(PaymentError) as error:
+        client.create_customer('a@example.com')
+    assert error.value.status == 400 and not error.value.retryable
+    assert len(SEEN) == 1 and client.stats()['circuit'] == 'closed'
+
+
+def test_slow_provider_is_bounded_and_trips_the_breaker():
+    SCRIPT['/v1/payment_intents/pi_slow'] = [(200, 2)]
+    client = _client(PAYMENT_MAX_RETRIES=1)
+    for _ in range(2):
+        started = time.monotonic()
+        with pytest.raises(PaymentError):
+            client.retrieve_payment_intent('pi_slow')
+        assert time.monotonic() - started < 2
+    assert client.stats()['circuit'] == 'open'
+
+    SEEN.clear()
+    with pytest.raises(CircuitOpen):
+        client.retrieve_payment_intent('pi_slow')
+    assert not SEEN and client.stats()['rejected_open'] == 1
+
+    # After the reset period one trial call goes out and closes the circuit
+    SCRIPT['/v1/payment_intents/pi_slow'] = [(200, 0)]
+    time.sleep(0.35)
+    assert client.retrieve_payment_intent('pi_slow')['id'] == 'pi_stub'
+    assert client.stats()['circuit'] == 'closed'
+
+
+def test_non_json_success_body_is_a_payment_error():
+    SEEN.clear()
+    SCRIPT['/v1/payment_intents/pi_html'] = [(200, 0, b'<html>Bad gateway</html>')]
+    client = _client(PAYMENT_MAX_RETRIES=1)
+    for _ in range(2):
+        with pytest.raises(PaymentError) as error:
+            client.retrieve_payment_intent('pi_html')
+        assert error.value.status == 200 and error.value.code == 'invalid_response'
+    assert len(SEEN) == 4
+    stats = client.stats()
+    assert stats['failed'] == 2 and stats['succeeded'] == 0 and stats['circuit'] == 'open'
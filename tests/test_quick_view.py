@@ -0,0 +1,23 @@
+from app import app, db
+from models import Product, ProductOption
+
+
+def setup_module(module):
+    with app.app_context():
+        db.create_all()
+        ProductOption.seed_defaults()
+
+
+def test_quick_view_lists_the_product_options():
+    with app.app_context():
+        product = Product(title='Quick View Print', description='Desc', price_cents=2500, media_key='qv', stock=5)
+        db.session.add(product)
+        db.session.commit()
+        product_id = product.id
+
+    resp = app.test_client().get(f'/api/products/{product_id}/quick-view')
+    assert resp.status_code == 200, resp.data
+    assert b'Quick View Print' in resp.data
+    assert b'40cm x 60cm' in resp.data
+    assert b'(+S$ 20.00)' in resp.data
+    assert app.test_client().get('/api/products/999999/quick-view').status_code == 404
@@ -0,0 +1,26 @@
+from app import app, db
+from models import Product, ProductRatingSummary, Review
+
+
+def setup_module(module):
+    with app.app_context():
+        db.create_all()
+
+
+def test_edits_of_expired_reviews_move_the_summary():
+    with app.app_context():
+        product = Product(title='Rated Print', description='Desc', price_cents=1000, media_key='r', stock=1)
+        db.session.add(product)
+        db.session.commit()
+        reviews = [Review(product_id=product.id, reviewer_name=f'R{i}', comment='ok', rating=5, approved=True)
+                   for i in range(2)]
+        db.session.add_all(reviews)
+        db.session.commit()
+
+        # The commit expired both reviews; the listener still sees the old values
+        reviews[0].rating = 2
+        reviews[1].approved = False
+        db.session.commit()
+
+        summary = db.session.get(ProductRatingSummary, product.id)
+        assert (summary.review_count, summary.rating_sum, summary.stars_5, summary.stars_2) == (1, 2, 0, 1)
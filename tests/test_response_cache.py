@@ -0,0 +1,32 @@
+from flask import session
+from app import app, db
+from utils.cache_versions import CATALOG
+from utils.response_cache import response_cache
+
+
+def setup_module(module):
+    with app.app_context():
+        db.create_all()
+
+
+@response_cache.cached()
+def _plain_page():
+    return 'plain'
+
+
+@response_cache.cached()
+def _page_touching_the_session():
+    session['last_seen'] = 'catalog'
+    return 'personal'
+
+
+def test_pages_that_change_the_session_are_not_stored():
+    with app.test_request_context('/cache-test/plain'):
+        assert _plain_page().headers['X-Cache'] == 'MISS'
+        assert response_cache.store.get(response_cache.key((CATALOG,))) is not None
+        assert _plain_page().headers['X-Cache'] == 'HIT'
+
+    with app.test_request_context('/cache-test/session'):
+        assert _page_touching_the_session().headers['X-Cache'] == 'MISS'
+        assert response_cache.store.get(response_cache.key((CATALOG,))) is None
+        assert _page_touching_the_session().headers['X-Cache'] == 'MISS'
@@ -0,0 +1,64 @@
+import json
+import time
+import uuid
+from app import app, db
+from models import Order, WebhookEvent
+from utils.webhooks import fake_event, sign_payload, webhook_inbox
+
+SECRET = 'whsec_test_secret'
+
+
+def setup_module(module):
+    app.config['STRIPE_WEBHOOK_SECRET'] = SECRET
+    with app.app_context():
+        db.create_all()
+
+
+def _post(client, event, secret=SECRET):
+    body = json.dumps(event).encode()
+    return client.post('/payment/webhook', data=body, content_type='application/json',
+                       headers={'Stripe-Signature': sign_payload(body, secret)})
+
+
+def _settle():
+    """Drain the inbox here and wait for events leased by background workers"""
+    with app.app_context():
+        for _ in range(100):
+            webhook_inbox.drain(app.config)
+            if not WebhookEvent.query.filter(WebhookEvent.status.in_(('pending', 'processing'))).count():
+                return
+            time.sleep(0.05)
+
+
+def test_signature_and_dedupe():
+    client = app.test_client()
+    event = fake_event('payment_intent.succeeded', 'pi_unknown_1')
+    assert _post(client, event, secret='whsec_wrong').status_code == 400
+    first = _post(client, event)
+    assert first.status_code == 200 and not first.get_json()['duplicate']
+    assert _post(client, event).get_json()['duplicate']
+    with app.app_context():
+        assert WebhookEvent.query.filter_by(event_id=event['id']).count() == 1
+
+
+def test_events_apply_in_order_per_intent():
+    run = uuid.uuid4().hex[:8]
+    with app.app_context():
+        orders = [Order(email=f'hook{i}@example.com', amount_cents=1000, currency='sgd',
+                        status='pending', stripe_payment_intent=f'pi_hook_{run}_{i}') for i in range(5)]
+        db.session.add_all(orders)
+        db.session.commit()
+        intents = {order.stripe_payment_intent: order.id for order in orders}
+
+    client = app.test_client()
+    for kind in ('payment_intent.payment_failed', 'payment_intent.succeeded'):
+        for intent in intents:
+            assert _post(client, fake_event(kind, intent)).status_code == 200
+    _settle()
+
+    with app.app_context():
+        for intent, order_id in intents.items():
+            assert db.session.get(Order, order_id).status == 'paid'
+            events = WebhookEvent.query.filter_by(intent_key=intent).order_by(WebhookEvent.id).all()
+            assert [e.status for e in events] == ['processed', 'processed']
+            assert events[0].processed_at <= events[1].processed_at
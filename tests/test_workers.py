@@ -0,0 +1,38 @@
+import threading
+from app import app
+from utils.workers import PeriodicWorker
+
+
+def test_worker_repeats_while_busy_survives_errors_and_wakes():
+    ticks = []
+    done = threading.Event()
+
+    def tick(config):
+        ticks.append(len(ticks))
+        if len(ticks) == 2:
+            raise RuntimeError("boom")
+        if len(ticks) == 5:
+            done.set()
+        return len(ticks) < 2  # busy for the first tick only
+
+    worker = PeriodicWorker("test-worker")
+    worker.start(app, tick, interval=60, immediate=True)
+    try:
+        # The busy first tick repeats at once; the failed second one waits for a wake
+        for _ in range(100):
+            if done.wait(0.05):
+                break
+            assert worker.is_alive()
+            worker.wake()
+        assert ticks == [0, 1, 2, 3, 4]
+    finally:
+        worker.stop()
+    for thread in worker._threads:
+        thread.join(2)
+    assert not worker.is_alive()
+
+
+def test_worker_is_off_without_an_interval():
+    worker = PeriodicWorker("off")
+    worker.start(app, lambda config: None, interval=0)
+    assert not worker.is_alive()
@@ -0,0 +1,142 @@
+"""Admin Analytics Result Cache
+
+Every open dashboard tab polls ``/admin/api/analytics/<metric>``. Results
+are kept per worker, keyed by ``(metric, range)``, as the serialized JSON
+body plus an ETag derived from it:
+
+    fresh   younger than ANALYTICS_CACHE_TTL seconds: served as is
+    stale   for ANALYTICS_CACHE_STALE seconds more: served as is while one
+            background thread recomputes it
+    expired recomputed before answering
+
+Concurrent misses of one key are single-flighted: the first request
+computes, the others wait for its result, so a burst of polls costs one
+computation per worker. Unchanged results keep their ETag, letting the
+browser revalidate with a 304.
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+from models import db
+
+logger = logging.getLogger(__name__)
+
+
+class _Flight:
+    """One in-progress computation that other requests can wait for"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.entry = None
+        self.error = None
+
+
+class AnalyticsCache:
+    """Per-process TTL cache with single-flight and stale-while-revalidate"""
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "stale": 0, "misses": 0, "waits": 0, "refreshes": 0}
+
+    def get(self, key, compute):
+        """Return ``(entry, state)`` for ``key``; ``compute()`` returns the JSON-able result.
+
+        ``entry`` holds ``body`` and ``etag``; ``state`` is HIT, STALE or MISS.
+        """
+        config = current_app.config
+        ttl = config.get("ANALYTICS_CACHE_TTL", 30)
+        if ttl <= 0:
+            return self._build(compute), "BYPASS"
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now < entry["fresh_until"]:
+                self.counters["hits"] += 1
+                return entry, "HIT"
+            if entry is not None and now < entry["stale_until"]:
+                self.counters["stale"] += 1
+                if key not in self._flights:
+                    self._flights[key] = _Flight()
+                    self._refresh_in_background(key, compute)
+                return entry, "STALE"
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.counters["misses"] += 1
+            else:
+                self.counters["waits"] += 1
+
+        if leader:
+            self._run(key, flight, compute)
+        else:
+            flight.done.wait(config.get("ANALYTICS_CACHE_WAIT_SECONDS", 30))
+        if flight.error is not None:
+            raise flight.error
+        if flight.entry is None:
+            # The leader is taking too long; answer this request ourselves
+            return self._build(compute), "MISS"
+        return flight.entry, "MISS"
+
+    def _build(self, compute):
+        body = current_app.json.dumps(compute()).encode()
+        return {"body": body, "etag": hashlib.sha1(body).hexdigest()}
+
+    def _run(self, key, flight, compute):
+        """Compute ``key`` for ``flight`` and publish the result to the waiters"""
+        config = current_app.config
+        try:
+            entry = self._build(compute)
+            now = time.monotonic()
+            entry["fresh_until"] = now + config.get("ANALYTICS_CACHE_TTL", 30)
+            entry["stale_until"] = entry["fresh_until"] + config.get("ANALYTICS_CACHE_STALE", 120)
+            flight.entry = entry
+            with self._lock:
+                self._entries[key] = entry
+                self._entries.move_to_end(key)
+                while len(self._entries) > config.get("ANALYTICS_CACHE_MAX_ENTRIES", 256):
+                    self._entries.popitem(last=False)
+        except Exception as e:
+            flight.error = e
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def _refresh_in_background(self, key, compute):
+        flight = self._flights[key]
+        app = current_app._get_current_object()
+        self.counters["refreshes"] += 1
+
+        def run():
+            with app.app_context():
+                try:
+                    self._run(key, flight, compute)
+                    if flight.error is not None:
+                        logger.error(f"Analytics refresh of {key} failed: {flight.error}")
+                finally:
+                    db.session.remove()
+
+        threading.Thread(target=run, name="analytics-refresh", daemon=True).start()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters, entries=len(self._entries))
+        lookups = stats["hits"] + stats["stale"] + stats["misses"] + stats["waits"]
+        stats["hit_ratio"] = round((stats["hits"] + stats["stale"]) / lookups, 3) if lookups else 0.0
+        return stats
+
+
+# Create a singleton instance
+analytics_cache = AnalyticsCache()
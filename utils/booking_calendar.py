@@ -0,0 +1,160 @@
+"""Booking Calendar Month View
+
+The booking page shows the next CALENDAR_DAYS days with a booking count and
+the number of free slots for each day. Those figures are kept in
+``booking_day_summary``: every Booking or Availability insert, update or
+delete refreshes the rows of the days it touches inside the same flush, so
+the public form and the admin screens keep it current without extra calls.
+
+Each worker also keeps the assembled month until the ``bookings`` version
+changes or the date rolls over, so most page views run no calendar query.
+Existing data is summarised with ``flask bookings rebuild-calendar``.
+"""
+
+import threading
+from collections import namedtuple
+from datetime import date, timedelta
+from types import MappingProxyType
+from flask import current_app
+from sqlalchemy import event, inspect as sa_inspect
+from sqlalchemy.dialects import postgresql, sqlite
+from models import db, Availability, Booking, BookingDaySummary, previous_value
+from utils.cache_versions import cache_versions
+from utils.booking_index import (
+    ACTIVE_STATUSES, BOOKINGS, DaySchedule, Interval, blackout_span, booking_span, slot_starts,
+)
+
+CALENDAR_DAYS = 30
+
+CalendarDay = namedtuple("CalendarDay", "date booking_count free_slots")
+
+
+def summarize(bookings, blackouts, config):
+    """Summary columns for a day from its booking and blackout ``(start, end)`` spans"""
+    slot = config.get("BOOKING_SLOT_MINUTES", 60)
+    schedule = DaySchedule(Interval(start, end, None, "") for start, end in bookings + blackouts)
+    return {
+        "booking_count": len(bookings),
+        "booked_minutes": sum(end - start for start, end in bookings),
+        "free_slots": sum(1 for start in slot_starts(config) if schedule.conflict(start, start + slot) is None),
+    }
+
+
+def refresh_day(connection, day):
+    """Recompute the summary row of ``day`` on the flush connection.
+
+    The row is created if missing and locked before the day is read, so
+    transactions booking different slots of one day recompute it one after
+    the other instead of the last one overwriting the others' bookings.
+    """
+    bookings, blackouts, summaries = Booking.__table__, Availability.__table__, BookingDaySummary.__table__
+    dialect = {"sqlite": sqlite, "postgresql": postgresql}.get(connection.dialect.name)
+    if dialect is not None:
+        connection.execute(
+            dialect.insert(summaries).values(day=day).on_conflict_do_nothing(index_elements=["day"])
+        )
+    connection.execute(db.select(summaries.c.day).where(summaries.c.day == day).with_for_update())
+
+    booked = [
+        booking_span(*row) for row in connection.execute(
+            db.select(bookings.c.start_time, bookings.c.end_time, bookings.c.duration_hours)
+            .where(bookings.c.booking_date == day, bookings.c.status.in_(ACTIVE_STATUSES))
+        )
+    ]
+    blocked = [
+        blackout_span(*row) for row in connection.execute(
+            db.select(blackouts.c.start_time, blackouts.c.end_time)
+            .where(blackouts.c.date == day, blackouts.c.is_available.is_(False))
+        )
+    ]
+    if not booked and not blocked:
+        connection.execute(summaries.delete().where(summaries.c.day == day))
+        return
+
+    values = summarize(booked, blocked, current_app.config)
+    result = connection.execute(summaries.update().where(summaries.c.day == day).values(values))
+    if result.rowcount == 0:
+        connection.execute(summaries.insert().values(day=day, **values))
+
+
+class BookingCalendar:
+    """Per-process month view built from booking_day_summary"""
+
+    def __init__(self):
+        self._month = None
+        self._key = None
+        self._lock = threading.Lock()
+
+    def month(self):
+        """Read-only mapping of ISO date -> CalendarDay for today and the next CALENDAR_DAYS days"""
+        key = (cache_versions.get(BOOKINGS), date.today())
+        if self._month is not None and self._key == key:
+            return self._month
+
+        with self._lock:
+            if self._month is None or self._key != key:
+                self._month = self._build(key[1])
+                self._key = key
+            return self._month
+
+    @staticmethod
+    def _build(today):
+        last = today + timedelta(days=CALENDAR_DAYS)
+        rows = {
+            row.day: row for row in BookingDaySummary.query.filter(
+                BookingDaySummary.day >= today, BookingDaySummary.day <= last
+            )
+        }
+        open_slots = len(slot_starts(current_app.config))
+        month = {}
+        for offset in range(CALENDAR_DAYS + 1):
+            day = today + timedelta(days=offset)
+            row = rows.get(day)
+            month[day.isoformat()] = CalendarDay(
+                day, row.booking_count if row else 0, row.free_slots if row else open_slots
+            )
+        return MappingProxyType(month)
+
+    def rebuild(self):
+        """Recompute every summary row from the booking and availability tables"""
+        days = {
+            row[0] for row in db.session.query(Booking.booking_date)
+            .filter(Booking.status.in_(ACTIVE_STATUSES)).distinct()
+        } | {
+            row[0] for row in db.session.query(Availability.date)
+            .filter(Availability.is_available.is_(False)).distinct()
+        }
+        connection = db.session.connection()
+        connection.execute(BookingDaySummary.__table__.delete())
+        for day in sorted(days):
+            refresh_day(connection, day)
+        cache_versions.bump(connection, BOOKINGS)
+        db.session.commit()
+        return len(days)
+
+
+# Create a singleton instance
+booking_calendar = BookingCalendar()
+
+
+def _watch(model, date_attribute, attributes):
+    """Refresh the summaries of the days a ``model`` write touches"""
+    def _inserted_or_deleted(mapper, connection, target):
+        refresh_day(connection, getattr(target, date_attribute))
+
+    def _updated(mapper, connection, target):
+        state = sa_inspect(target)
+        if not any(state.attrs[a].history.has_changes() for a in attributes):
+            return
+        days = {previous_value(state, date_attribute), getattr(target, date_attribute)}
+        # A fixed order, so two writers moving bookings between days cannot deadlock
+        for day in sorted(days):
+            refresh_day(connection, day)
+
+    event.listen(model, "after_insert", _inserted_or_deleted)
+    event.listen(model, "after_delete", _inserted_or_deleted)
+    event.listen(model, "after_update", _updated)
+
+
+_watch(Booking, "booking_date", ("booking_date", "start_time", "end_time", "duration_hours", "status"))
+_watch(Availability, "date", ("date", "start_time", "end_time", "is_available"))
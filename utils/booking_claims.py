@@ -0,0 +1,94 @@
+"""Booking Slot Claims
+
+Every pending or confirmed booking owns one ``booking_slot_claim`` row per
+CLAIM_MINUTES step it covers, keyed by ``(day, slot_index)``. The claims are
+inserted in the same flush as the booking, so two overlapping bookings can
+never both commit: the second one fails on the primary key with an
+IntegrityError, without table locks or serializable transactions. The
+booking index remains the fast pre-check that produces a friendly message;
+the claims are what make the check race-free.
+
+Claims follow the booking: they are released when it is cancelled,
+completed or deleted and re-taken when its date or time changes.
+"""
+
+import logging
+from sqlalchemy import event, inspect as sa_inspect
+from sqlalchemy.exc import IntegrityError
+from models import db, Booking, BookingSlotClaim
+from utils.booking_index import ACTIVE_STATUSES, booking_span
+
+logger = logging.getLogger(__name__)
+
+CLAIM_MINUTES = 15
+
+_SLOT_ATTRIBUTES = ("booking_date", "start_time", "end_time", "duration_hours", "status")
+
+
+def slot_indexes(start_time, end_time, duration_hours):
+    """Indexes of the CLAIM_MINUTES steps a booking covers; overlapping bookings share one"""
+    start, end = booking_span(start_time, end_time, duration_hours)
+    return range(start // CLAIM_MINUTES, -(-end // CLAIM_MINUTES))
+
+
+class SlotClaims:
+    """Insert and release the claim rows of bookings"""
+
+    @staticmethod
+    def claim(connection, booking):
+        """Claim every slot of ``booking``; raises IntegrityError if one is taken"""
+        connection.execute(BookingSlotClaim.__table__.insert(), [
+            {"day": booking.booking_date, "slot_index": index, "booking_id": booking.id}
+            for index in slot_indexes(booking.start_time, booking.end_time, booking.duration_hours)
+        ])
+
+    @staticmethod
+    def release(connection, booking_id):
+        claims = BookingSlotClaim.__table__
+        connection.execute(claims.delete().where(claims.c.booking_id == booking_id))
+
+    def rebuild(self):
+        """Re-claim every active booking, oldest first.
+
+        Bookings that overlap an earlier one (possible for rows written
+        before claims existed) are skipped and returned as ``(id, day)``
+        pairs so they can be resolved by hand.
+        """
+        bookings = Booking.query.filter(Booking.status.in_(ACTIVE_STATUSES)) \
+            .order_by(Booking.created_at, Booking.id).all()
+        db.session.execute(BookingSlotClaim.__table__.delete())
+        clashes = []
+        for booking in bookings:
+            try:
+                with db.session.begin_nested():
+                    self.claim(db.session.connection(), booking)
+            except IntegrityError:
+                logger.warning(f"Booking {booking.id} overlaps an earlier booking on {booking.booking_date}")
+                clashes.append((booking.id, booking.booking_date))
+        db.session.commit()
+        return clashes
+
+
+# Create a singleton instance
+slot_claims = SlotClaims()
+
+
+@event.listens_for(Booking, "after_insert")
+def _booking_inserted(mapper, connection, target):
+    if target.status in ACTIVE_STATUSES:
+        slot_claims.claim(connection, target)
+
+
+@event.listens_for(Booking, "after_update")
+def _booking_updated(mapper, connection, target):
+    state = sa_inspect(target)
+    if not any(state.attrs[a].history.has_changes() for a in _SLOT_ATTRIBUTES):
+        return
+    slot_claims.release(connection, target.id)
+    if target.status in ACTIVE_STATUSES:
+        slot_claims.claim(connection, target)
+
+
+@event.listens_for(Booking, "after_delete")
+def _booking_deleted(mapper, connection, target):
+    slot_claims.release(connection, target.id)
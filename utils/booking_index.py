@@ -0,0 +1,205 @@
+"""Booking Interval Index
+
+Slot-conflict checks (the booking form and ``/api/check-availability``, which
+the calendar UI calls on every date/time change) are answered from a
+per-worker index of pending and confirmed bookings instead of an overlap
+query. The index covers BOOKING_INDEX_DAYS from today, is built with one
+range query and is rebuilt when the shared ``bookings`` version changes.
+Days outside the window are loaded on demand. Blackout rows of
+``Availability`` (``is_available`` false) are indexed like bookings, so
+they block the same slots.
+
+Each day keeps its intervals sorted by start together with a running
+maximum of their end times, so a conflict check is one bisect.
+"""
+
+import threading
+from bisect import bisect_left
+from collections import defaultdict, namedtuple
+from datetime import date, datetime, timedelta
+from flask import current_app
+from models import db, Availability, Booking
+from utils.cache_versions import cache_versions
+
+BOOKINGS = "bookings"
+ACTIVE_STATUSES = ("pending", "confirmed")
+
+cache_versions.watch(Booking, BOOKINGS)
+cache_versions.watch(Availability, BOOKINGS)
+
+# Minutes since midnight; ``end`` may run past 1440 for late bookings.
+# Blackouts have no booking_id.
+Interval = namedtuple("Interval", "start end booking_id label")
+
+
+def minutes(value):
+    """Minutes since midnight of a ``time``"""
+    return value.hour * 60 + value.minute
+
+
+def slot_starts(config):
+    """Bookable start times of a day, in minutes, from the BOOKING_* settings"""
+    first, last = (
+        minutes(datetime.strptime(config.get(key, default), "%H:%M").time())
+        for key, default in (("BOOKING_DAY_START", "09:00"), ("BOOKING_LAST_START", "17:00"))
+    )
+    return tuple(range(first, last + 1, config.get("BOOKING_SLOT_MINUTES", 60)))
+
+
+def format_minutes(value):
+    return f"{value // 60:02d}:{value % 60:02d}"
+
+
+def booking_span(start_time, end_time, duration_hours):
+    """``(start, end)`` minutes a booking occupies on its day"""
+    start = minutes(start_time)
+    end = minutes(end_time) if end_time else None
+    if end is None or end <= start:
+        end = start + 60 * (duration_hours or 1)
+    return start, end
+
+
+def blackout_span(start_time, end_time):
+    """``(start, end)`` minutes of a blackout; an end at or before the start means midnight"""
+    start, end = minutes(start_time), minutes(end_time)
+    return start, end if end > start else 24 * 60
+
+
+def booking_interval(booking):
+    """The Interval a booking occupies on its day"""
+    start, end = booking_span(booking.start_time, booking.end_time, booking.duration_hours)
+    return Interval(start, end, booking.id, booking.time_display)
+
+
+class DaySchedule:
+    """One day's intervals sorted by start, with a running max of end times"""
+
+    __slots__ = ("intervals", "_starts", "_reach")
+
+    def __init__(self, intervals=()):
+        self.intervals = tuple(sorted(intervals))
+        self._starts = [interval.start for interval in self.intervals]
+        # _reach[i] is the index of the latest-ending interval among 0..i
+        self._reach = []
+        best = None
+        for i, interval in enumerate(self.intervals):
+            if best is None or interval.end > self.intervals[best].end:
+                best = i
+            self._reach.append(best)
+
+    def conflict(self, start, end):
+        """An interval overlapping ``[start, end)`` minutes, or None"""
+        i = bisect_left(self._starts, end)
+        if i == 0:
+            return None
+        latest = self.intervals[self._reach[i - 1]]
+        return latest if latest.end > start else None
+
+    def __len__(self):
+        return len(self.intervals)
+
+
+EMPTY_DAY = DaySchedule()
+
+
+class _Snapshot:
+    __slots__ = ("version", "first", "last", "days")
+
+    def __init__(self, version, first, last, days):
+        self.version = version
+        self.first = first
+        self.last = last
+        self.days = days
+
+
+class BookingIndex:
+    """Per-process booking intervals invalidated by the bookings version"""
+
+    def __init__(self):
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _load(first, last):
+        """Active bookings and blackouts between ``first`` and ``last`` grouped into DaySchedules"""
+        grouped = defaultdict(list)
+        for booking in Booking.query.filter(
+            Booking.booking_date >= first,
+            Booking.booking_date <= last,
+            Booking.status.in_(ACTIVE_STATUSES),
+        ):
+            grouped[booking.booking_date].append(booking_interval(booking))
+        for blackout in Availability.query.filter(
+            Availability.date >= first,
+            Availability.date <= last,
+            Availability.is_available.is_(False),
+        ):
+            start, end = blackout_span(blackout.start_time, blackout.end_time)
+            grouped[blackout.date].append(Interval(start, end, None, blackout.notes or "Unavailable"))
+        return {day: DaySchedule(intervals) for day, intervals in grouped.items()}
+
+    def _current(self):
+        version = cache_versions.get(BOOKINGS)
+        today = date.today()
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == version and snapshot.first == today:
+            return snapshot
+
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None or snapshot.version != version or snapshot.first != today:
+                last = today + timedelta(days=current_app.config.get("BOOKING_INDEX_DAYS", 120))
+                snapshot = _Snapshot(version, today, last, self._load(today, last))
+                self._snapshot = snapshot
+            return snapshot
+
+    def day(self, day):
+        """The DaySchedule of ``day``"""
+        snapshot = self._current()
+        schedule = snapshot.days.get(day)
+        if schedule is not None:
+            return schedule
+        if snapshot.first <= day <= snapshot.last:
+            return EMPTY_DAY
+        schedule = self._load(day, day).get(day, EMPTY_DAY)
+        snapshot.days[day] = schedule
+        return schedule
+
+    def days(self, first, last):
+        """``(day, DaySchedule)`` pairs from ``first`` to ``last``.
+
+        Days the snapshot does not hold yet are fetched with one range query.
+        """
+        snapshot = self._current()
+        span = [first + timedelta(days=n) for n in range((last - first).days + 1)]
+        missing = [day for day in span
+                   if day not in snapshot.days and not snapshot.first <= day <= snapshot.last]
+        if missing:
+            loaded = self._load(missing[0], missing[-1])
+            for day in missing:
+                snapshot.days[day] = loaded.get(day, EMPTY_DAY)
+        return [(day, snapshot.days.get(day, EMPTY_DAY)) for day in span]
+
+    def free_starts(self, first, last, duration_hours, starts):
+        """``(day, [start minutes])`` for every day, keeping starts whose slot is free"""
+        length = 60 * duration_hours
+        return [
+            (day, [start for start in starts if schedule.conflict(start, start + length) is None])
+            for day, schedule in self.days(first, last)
+        ]
+
+    def version(self):
+        """The bookings version the index is built from"""
+        return cache_versions.get(BOOKINGS)
+
+    def conflict(self, day, start_time, duration_hours=1):
+        """The booking interval clashing with a slot, or None when it is free"""
+        start = minutes(start_time)
+        return self.day(day).conflict(start, start + 60 * duration_hours)
+
+    def invalidate(self):
+        self._snapshot = None
+
+
+# Create a singleton instance
+booking_index = BookingIndex()
@@ -0,0 +1,80 @@
+"""Cache Version Counters
+
+Writers bump a named counter in the ``cache_version`` table inside the same
+transaction as their change, so every gunicorn worker observes the new value
+once the transaction commits. Readers keep a per-process snapshot of all
+counters that is refreshed with a single query at most every
+``CACHE_VERSION_TTL`` seconds, and immediately after a local commit that
+bumped a counter.
+"""
+
+import threading
+import time
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from models import db, CacheVersion
+
+CATALOG = "catalog"
+
+
+class CacheVersions:
+    """Process-local view of the shared cache_version table"""
+
+    def __init__(self):
+        self._snapshot = {}
+        self._loaded_at = None
+        self._lock = threading.Lock()
+        self._pending = threading.local()
+
+    def get(self, name):
+        """Return the current version of ``name`` (0 if never bumped)"""
+        ttl = current_app.config.get("CACHE_VERSION_TTL", 1.0)
+        loaded_at = self._loaded_at
+        if loaded_at is None or time.monotonic() - loaded_at >= ttl:
+            self.refresh()
+        return self._snapshot.get(name, 0)
+
+    def refresh(self):
+        """Reload every counter with one query"""
+        rows = db.session.query(CacheVersion.name, CacheVersion.version).all()
+        with self._lock:
+            self._snapshot = {name: version for name, version in rows}
+            self._loaded_at = time.monotonic()
+
+    def invalidate(self):
+        """Force the next ``get`` to re-read the table"""
+        self._loaded_at = None
+
+    def bump(self, connection, name):
+        """Increment ``name`` on the connection of the current flush"""
+        table = CacheVersion.__table__
+        result = connection.execute(
+            table.update()
+            .where(table.c.name == name)
+            .values(version=table.c.version + 1)
+        )
+        if result.rowcount == 0:
+            connection.execute(table.insert().values(name=name, version=1))
+        self._pending.dirty = True
+
+    def watch(self, model, name):
+        """Bump ``name`` whenever a row of ``model`` is inserted, updated or deleted"""
+        def _bump(mapper, connection, target):
+            self.bump(connection, name)
+
+        for identifier in ("after_insert", "after_update", "after_delete"):
+            event.listen(model, identifier, _bump)
+
+    def _after_commit(self, session):
+        if getattr(self._pending, "dirty", False):
+            self._pending.dirty = False
+            self.invalidate()
+
+    def _after_rollback(self, session, previous_transaction):
+        self._pending.dirty = False
+
+
+cache_versions = CacheVersions()
+event.listen(Session, "after_commit", cache_versions._after_commit)
+event.listen(Session, "after_soft_rollback", cache_versions._after_rollback)
@@ -0,0 +1,453 @@
+"""Server-side Cart Store
+
+The session cookie only carries an opaque ``cart_id``; cart lines live in a
+backend selected by CART_BACKEND:
+    sql     ``cart`` / ``cart_line`` tables (default)
+    memory  per-process dict, for development and tests
+    redis   any Redis-compatible server (CART_REDIS_URL), requires the
+            optional ``redis`` package
+
+Line operations (add, increment, remove) are single atomic statements or
+transactions in every backend. Carts expire CART_TTL_DAYS after their last
+change; on login an anonymous cart is merged into the user's saved cart.
+"""
+
+import copy
+import json
+import secrets
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import current_app, session
+from sqlalchemy import case, func
+from sqlalchemy.dialects import postgresql, sqlite
+from models import db, Cart, CartLine
+
+try:
+    import redis
+except ImportError:  # optional dependency
+    redis = None
+
+SESSION_KEY = "cart_id"
+
+
+def new_cart_id():
+    """Opaque, unguessable cart identifier"""
+    return secrets.token_hex(16)
+
+
+# -----------------------------
+# SQL backend
+# -----------------------------
+class SQLCartStore:
+    """Carts in the application database"""
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+
+    @staticmethod
+    def _upsert(table):
+        """Dialect INSERT supporting ON CONFLICT, or None when unavailable"""
+        dialect = db.session.get_bind().dialect.name
+        if dialect == "sqlite":
+            return sqlite.insert(table)
+        if dialect == "postgresql":
+            return postgresql.insert(table)
+        return None
+
+    def _touch(self, cart_id):
+        """Create the cart row or push back its expiry, dropping expired contents"""
+        carts, lines = Cart.__table__, CartLine.__table__
+        now = datetime.utcnow()
+        db.session.execute(lines.delete().where(lines.c.cart_id.in_(
+            db.select(carts.c.id).where(carts.c.id == cart_id, carts.c.expires_at <= now)
+        )))
+        values = {"updated_at": now, "expires_at": now + self.ttl}
+        result = db.session.execute(carts.update().where(carts.c.id == cart_id).values(**values))
+        if result.rowcount == 0:
+            stmt = self._upsert(carts)
+            if stmt is None:
+                db.session.execute(carts.insert().values(id=cart_id, **values))
+            else:
+                db.session.execute(stmt.values(id=cart_id, **values)
+                                   .on_conflict_do_update(index_elements=["id"], set_=values))
+
+    @staticmethod
+    def _live(cart_id):
+        carts = Cart.__table__
+        return db.and_(carts.c.id == cart_id, carts.c.expires_at > datetime.utcnow())
+
+    def _add_line(self, cart_id, product_id, size, frame, qty, unit_price_cents):
+        lines = CartLine.__table__
+        values = dict(cart_id=cart_id, product_id=product_id, size=size, frame=frame,
+                      qty=qty, unit_price_cents=unit_price_cents)
+        stmt = self._upsert(lines)
+        if stmt is not None:
+            db.session.execute(stmt.values(**values).on_conflict_do_update(
+                index_elements=["cart_id", "product_id", "size", "frame"],
+                set_={"qty": lines.c.qty + stmt.excluded.qty},
+            ))
+            return
+        result = db.session.execute(lines.update().where(
+            lines.c.cart_id == cart_id, lines.c.product_id == product_id,
+            lines.c.size == size, lines.c.frame == frame,
+        ).values(qty=lines.c.qty + qty))
+        if result.rowcount == 0:
+            db.session.execute(lines.insert().values(**values))
+
+    def lines(self, cart_id):
+        carts, lines = Cart.__table__, CartLine.__table__
+        rows = db.session.execute(
+            db.select(lines.c.id, lines.c.product_id, lines.c.size, lines.c.frame,
+                      lines.c.qty, lines.c.unit_price_cents)
+            .join(carts, carts.c.id == lines.c.cart_id)
+            .where(self._live(cart_id))
+            .order_by(lines.c.id)
+        ).mappings().all()
+        return [dict(row) for row in rows]
+
+    def count(self, cart_id):
+        carts, lines = Cart.__table__, CartLine.__table__
+        return db.session.execute(
+            db.select(func.coalesce(func.sum(lines.c.qty), 0))
+            .join(carts, carts.c.id == lines.c.cart_id)
+            .where(self._live(cart_id))
+        ).scalar()
+
+    def add(self, cart_id, product_id, size, frame, qty, unit_price_cents):
+        self._touch(cart_id)
+        self._add_line(cart_id, product_id, size, frame, qty, unit_price_cents)
+        db.session.commit()
+
+    def increment(self, cart_id, line_id, delta):
+        lines = CartLine.__table__
+        new_qty = lines.c.qty + delta
+        result = db.session.execute(
+            lines.update()
+            .where(lines.c.id == line_id, lines.c.cart_id == cart_id)
+            .values(qty=case((new_qty < 1, 1), else_=new_qty))
+        )
+        if result.rowcount:
+            self._touch(cart_id)
+        db.session.commit()
+        return result.rowcount > 0
+
+    def remove(self, cart_id, line_id):
+        lines = CartLine.__table__
+        result = db.session.execute(
+            lines.delete().where(lines.c.id == line_id, lines.c.cart_id == cart_id)
+        )
+        if result.rowcount:
+            self._touch(cart_id)
+        db.session.commit()
+        return result.rowcount > 0
+
+    def clear(self, cart_id):
+        carts, lines = Cart.__table__, CartLine.__table__
+        db.session.execute(lines.delete().where(lines.c.cart_id == cart_id))
+        db.session.execute(carts.delete().where(carts.c.id == cart_id))
+        db.session.commit()
+
+    def user_cart(self, user_id):
+        carts = Cart.__table__
+        return db.session.execute(
+            db.select(carts.c.id).where(carts.c.user_id == user_id, carts.c.expires_at > datetime.utcnow())
+        ).scalar()
+
+    def assign(self, cart_id, user_id):
+        carts = Cart.__table__
+        db.session.execute(carts.update().where(carts.c.user_id == user_id, carts.c.id != cart_id)
+                           .values(user_id=None))
+        self._touch(cart_id)
+        db.session.execute(carts.update().where(carts.c.id == cart_id).values(user_id=user_id))
+        db.session.commit()
+
+    def merge(self, source_id, target_id):
+        self._touch(target_id)
+        for line in self.lines(source_id):
+            self._add_line(target_id, line["product_id"], line["size"], line["frame"],
+                           line["qty"], line["unit_price_cents"])
+        self.clear(source_id)  # commits
+
+    def purge_expired(self):
+        carts, lines = Cart.__table__, CartLine.__table__
+        expired = db.select(carts.c.id).where(carts.c.expires_at <= datetime.utcnow())
+        db.session.execute(lines.delete().where(lines.c.cart_id.in_(expired)))
+        result = db.session.execute(carts.delete().where(carts.c.expires_at <= datetime.utcnow()))
+        db.session.commit()
+        return result.rowcount
+
+
+# -----------------------------
+# Document backends (memory / Redis)
+# -----------------------------
+class _DocumentCartStore:
+    """Backends storing each cart as one document updated atomically.
+
+    Subclasses implement ``_load(cart_id)`` and ``_update(cart_id, fn, create)``
+    which applies ``fn`` to the document under a lock or transaction.
+    """
+
+    @staticmethod
+    def _new_doc():
+        return {"user_id": None, "next_id": 0, "lines": []}
+
+    @staticmethod
+    def _add_to_doc(doc, product_id, size, frame, qty, unit_price_cents):
+        for line in doc["lines"]:
+            if (line["product_id"], line["size"], line["frame"]) == (product_id, size, frame):
+                line["qty"] += qty
+                return
+        doc["next_id"] += 1
+        doc["lines"].append({"id": doc["next_id"], "product_id": product_id, "size": size,
+                             "frame": frame, "qty": qty, "unit_price_cents": unit_price_cents})
+
+    def lines(self, cart_id):
+        doc = self._load(cart_id)
+        return [dict(line) for line in doc["lines"]] if doc else []
+
+    def count(self, cart_id):
+        return sum(line["qty"] for line in self.lines(cart_id))
+
+    def add(self, cart_id, product_id, size, frame, qty, unit_price_cents):
+        self._update(cart_id, lambda doc: self._add_to_doc(
+            doc, product_id, size, frame, qty, unit_price_cents), create=True)
+
+    def increment(self, cart_id, line_id, delta):
+        def apply(doc):
+            for line in doc["lines"]:
+                if line["id"] == line_id:
+                    line["qty"] = max(1, line["qty"] + delta)
+                    return True
+            return False
+        return bool(self._update(cart_id, apply))
+
+    def remove(self, cart_id, line_id):
+        def apply(doc):
+            kept = [line for line in doc["lines"] if line["id"] != line_id]
+            removed = len(kept) != len(doc["lines"])
+            doc["lines"] = kept
+            return removed
+        return bool(self._update(cart_id, apply))
+
+    def merge(self, source_id, target_id):
+        source_lines = self.lines(source_id)
+
+        def apply(doc):
+            for line in source_lines:
+                self._add_to_doc(doc, line["product_id"], line["size"], line["frame"],
+                                 line["qty"], line["unit_price_cents"])
+        self._update(target_id, apply, create=True)
+        self.clear(source_id)
+
+
+class MemoryCartStore(_DocumentCartStore):
+    """Per-process carts; contents are lost on restart"""
+
+    def __init__(self, ttl):
+        self.ttl = ttl.total_seconds()
+        self._carts = {}  # cart_id -> (expires_at, doc)
+        self._users = {}  # user_id -> cart_id
+        self._lock = threading.Lock()
+
+    def _live_doc(self, cart_id):
+        entry = self._carts.get(cart_id)
+        if entry is None:
+            return None
+        if entry[0] < time.time():
+            del self._carts[cart_id]
+            return None
+        return entry[1]
+
+    def _load(self, cart_id):
+        with self._lock:
+            doc = self._live_doc(cart_id)
+            return copy.deepcopy(doc) if doc else None
+
+    def _update(self, cart_id, fn, create=False):
+        with self._lock:
+            doc = self._live_doc(cart_id)
+            if doc is None:
+                if not create:
+                    return None
+                doc = self._new_doc()
+            result = fn(doc)
+            self._carts[cart_id] = (time.time() + self.ttl, doc)
+            return result
+
+    def clear(self, cart_id):
+        with self._lock:
+            entry = self._carts.pop(cart_id, None)
+            if entry and self._users.get(entry[1]["user_id"]) == cart_id:
+                del self._users[entry[1]["user_id"]]
+
+    def user_cart(self, user_id):
+        with self._lock:
+            cart_id = self._users.get(user_id)
+            return cart_id if cart_id and self._live_doc(cart_id) else None
+
+    def assign(self, cart_id, user_id):
+        def apply(doc):
+            doc["user_id"] = user_id
+        self._update(cart_id, apply, create=True)
+        with self._lock:
+            self._users[user_id] = cart_id
+
+    def purge_expired(self):
+        now = time.time()
+        with self._lock:
+            expired = [cart_id for cart_id, (expires_at, _) in self._carts.items() if expires_at < now]
+            for cart_id in expired:
+                del self._carts[cart_id]
+        return len(expired)
+
+
+class RedisCartStore(_DocumentCartStore):
+    """Carts as JSON documents in a Redis-compatible server, expired with EXPIRE"""
+
+    def __init__(self, ttl, url, prefix="flash:cart:"):
+        if redis is None:
+            raise RuntimeError("CART_BACKEND=redis requires the 'redis' package")
+        self.ttl = int(ttl.total_seconds())
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def _key(self, cart_id):
+        return f"{self.prefix}{cart_id}"
+
+    def _user_key(self, user_id):
+        return f"{self.prefix}user:{user_id}"
+
+    def _load(self, cart_id):
+        raw = self.client.get(self._key(cart_id))
+        return json.loads(raw) if raw else None
+
+    def _update(self, cart_id, fn, create=False):
+        key = self._key(cart_id)
+        outcome = {}
+
+        def transaction(pipe):
+            raw = pipe.get(key)
+            doc = json.loads(raw) if raw else (self._new_doc() if create else None)
+            if doc is None:
+                outcome["result"] = None
+                return
+            outcome["result"] = fn(doc)
+            pipe.multi()
+            pipe.set(key, json.dumps(doc), ex=self.ttl)
+            if doc["user_id"] is not None:
+                pipe.set(self._user_key(doc["user_id"]), cart_id, ex=self.ttl)
+
+        self.client.transaction(transaction, key)
+        return outcome.get("result")
+
+    def clear(self, cart_id):
+        doc = self._load(cart_id)
+        self.client.delete(self._key(cart_id))
+        if doc and doc["user_id"] is not None:
+            user_key = self._user_key(doc["user_id"])
+            if self.client.get(user_key) == cart_id.encode():
+                self.client.delete(user_key)
+
+    def user_cart(self, user_id):
+        cart_id = self.client.get(self._user_key(user_id))
+        return cart_id.decode() if cart_id and self.client.exists(self._key(cart_id.decode())) else None
+
+    def assign(self, cart_id, user_id):
+        def apply(doc):
+            doc["user_id"] = user_id
+        self._update(cart_id, apply, create=True)
+
+    def purge_expired(self):
+        return 0  # Redis expires keys itself
+
+
+# -----------------------------
+# Session front-end
+# -----------------------------
+class CartStore:
+    """The current visitor's cart, resolved from the session cookie"""
+
+    def __init__(self):
+        self._backend = None
+        self._lock = threading.Lock()
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            with self._lock:
+                if self._backend is None:
+                    self._backend = self._create_backend(current_app.config)
+        return self._backend
+
+    @staticmethod
+    def _create_backend(config):
+        ttl = timedelta(days=config.get("CART_TTL_DAYS", 30))
+        backend = config.get("CART_BACKEND", "sql")
+        if backend == "memory":
+            return MemoryCartStore(ttl)
+        if backend == "redis":
+            return RedisCartStore(ttl, config.get("CART_REDIS_URL", "redis://localhost:6379/0"))
+        return SQLCartStore(ttl)
+
+    @staticmethod
+    def current_id():
+        """Cart id from the session; None when the visitor has no cart"""
+        return session.get(SESSION_KEY)
+
+    def lines(self):
+        cart_id = self.current_id()
+        return self.backend.lines(cart_id) if cart_id else []
+
+    def count(self):
+        """Total quantity, without touching the backend for empty sessions"""
+        cart_id = self.current_id()
+        return self.backend.count(cart_id) if cart_id else 0
+
+    def add(self, product_id, size, frame, qty, unit_price_cents):
+        cart_id = self.current_id()
+        if not cart_id:
+            cart_id = new_cart_id()
+            session[SESSION_KEY] = cart_id
+            if session.get("user_id"):
+                self.backend.assign(cart_id, session["user_id"])
+        self.backend.add(cart_id, product_id, size, frame, qty, unit_price_cents)
+
+    def increment(self, line_id, delta=1):
+        cart_id = self.current_id()
+        return bool(cart_id) and self.backend.increment(cart_id, line_id, delta)
+
+    def remove(self, line_id):
+        cart_id = self.current_id()
+        if not cart_id or not self.backend.remove(cart_id, line_id):
+            return False
+        if not self.backend.count(cart_id):
+            self.clear()
+        return True
+
+    def clear(self):
+        cart_id = session.pop(SESSION_KEY, None)
+        if cart_id:
+            self.backend.clear(cart_id)
+
+    def login(self, user_id):
+        """Merge the anonymous cart into the user's saved cart and adopt it"""
+        anonymous = self.current_id()
+        saved = self.backend.user_cart(user_id)
+        if anonymous and saved and anonymous != saved:
+            self.backend.merge(anonymous, saved)
+            cart_id = saved
+        elif anonymous:
+            self.backend.assign(anonymous, user_id)
+            cart_id = anonymous
+        else:
+            cart_id = saved
+
+        if cart_id and self.backend.count(cart_id):
+            session[SESSION_KEY] = cart_id
+        else:
+            session.pop(SESSION_KEY, None)
+
+
+# Create a singleton instance
+cart_store = CartStore()
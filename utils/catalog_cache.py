@@ -0,0 +1,62 @@
+"""Catalog Facet Cache
+
+Holds the shop facets (categories, media types, price bounds) per worker,
+keyed by the shared ``catalog`` version that is bumped on every Product
+write. Once warm, rendering a page costs no facet queries.
+"""
+
+import threading
+from sqlalchemy import func
+from models import db, Product
+from utils.cache_versions import cache_versions, CATALOG
+
+cache_versions.watch(Product, CATALOG)
+
+
+class CatalogFacetCache:
+    """Per-process facet snapshot invalidated by the catalog version"""
+
+    def __init__(self):
+        self._facets = None
+        self._version = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """Return the facets for the current catalog version"""
+        version = cache_versions.get(CATALOG)
+        if self._facets is not None and self._version == version:
+            return self._facets
+
+        with self._lock:
+            if self._facets is None or self._version != version:
+                self._facets = self._load()
+                self._version = version
+            return self._facets
+
+    def categories(self):
+        return self.get()["categories"]
+
+    def media_types(self):
+        return self.get()["media_types"]
+
+    @staticmethod
+    def _load():
+        categories = tuple(sorted(
+            c[0] for c in db.session.query(Product.category).distinct() if c[0]
+        ))
+        media_types = tuple(sorted(
+            m[0] for m in db.session.query(Product.mime_type).distinct() if m[0]
+        ))
+        min_cents, max_cents = db.session.query(
+            func.min(Product.price_cents), func.max(Product.price_cents)
+        ).one()
+        return {
+            "categories": categories,
+            "media_types": media_types,
+            "min_price_cents": min_cents or 0,
+            "max_price_cents": max_cents or 0,
+        }
+
+
+# Create a singleton instance
+catalog_cache = CatalogFacetCache()
@@ -0,0 +1,148 @@
+"""Idempotent Checkout and Abandoned-Order Reaper
+
+Checkout attempts are keyed by a hash of the session's cart id, the user,
+the email and the priced cart lines. A retry of the same cart (double
+click, back button, payment page reload) reuses the open order instead of
+inserting another one. Open orders that are never paid are moved to
+``expired`` by ``OrderReaper`` in bounded batches, returning their reserved
+stock, either from a background thread in each worker or via
+``flask orders reap``.
+"""
+
+import hashlib
+import json
+import logging
+from datetime import datetime, timedelta
+from flask import session
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from models import db, Order, OrderItem
+from utils.cart_store import cart_store
+from utils.stock import stock_reservations, OutOfStock
+from utils.workers import PeriodicWorker
+
+logger = logging.getLogger(__name__)
+
+# Orders that can still be paid; the idempotency key is only held while open
+OPEN_STATUSES = ("pending", "created")
+EXPIRED = "expired"
+
+
+def checkout_key(flow, priced, email=None):
+    """Idempotency key for checking out ``priced`` from the current session"""
+    payload = {
+        "flow": flow,
+        "cart": cart_store.current_id(),
+        "user": session.get("user_id"),
+        "email": (email or "").strip().lower(),
+        "lines": sorted(
+            (line["product_id"], line["size"], line["frame"], line["qty"], line["unit_price_cents"])
+            for line in priced
+        ),
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+def open_order(key):
+    """The still-open order created for ``key``, if any"""
+    return Order.query.filter(Order.idempotency_key == key, Order.status.in_(OPEN_STATUSES)).first()
+
+
+def place_order(key, priced, **fields):
+    """Return ``(order, created)``: the open order for ``key`` or a new one.
+
+    A new order gets one OrderItem per priced line and reserves their stock,
+    raising OutOfStock (with nothing written) when a product is short. If a
+    concurrent request inserts the same key first, its order is returned.
+    """
+    order = open_order(key)
+    if order is not None:
+        return order, False
+
+    order = Order(idempotency_key=key, amount_cents=priced.total_cents, **fields)
+    db.session.add(order)
+    db.session.flush()  # Get the order ID
+    for line in priced:
+        db.session.add(OrderItem(
+            order_id=order.id,
+            product_id=line["product_id"],
+            quantity=line["qty"],
+            unit_price_cents=line["unit_price_cents"]
+        ))
+    try:
+        stock_reservations.reserve(order.id, [(line["product_id"], line["qty"]) for line in priced])
+    except OutOfStock:
+        db.session.rollback()
+        raise
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        order = open_order(key)
+        if order is None:
+            raise
+        return order, False
+    return order, True
+
+
+@event.listens_for(Order.status, "set")
+def _release_idempotency_key(target, value, oldvalue, initiator):
+    """Closed orders give up their key so the same cart can be checked out again"""
+    if value not in OPEN_STATUSES:
+        target.idempotency_key = None
+
+
+class OrderReaper:
+    """Expires open orders older than ORDER_PENDING_TTL_MINUTES"""
+
+    def __init__(self):
+        self._worker = PeriodicWorker("order-reaper")
+
+    def reap_batch(self, cutoff, limit):
+        """Expire up to ``limit`` open orders created before ``cutoff``; returns their ids"""
+        orders = Order.__table__
+        ids = [row[0] for row in db.session.execute(
+            db.select(orders.c.id)
+            .where(orders.c.status.in_(OPEN_STATUSES), orders.c.created_at < cutoff)
+            .order_by(orders.c.created_at)
+            .limit(limit)
+        )]
+        if ids:
+            db.session.execute(
+                orders.update()
+                .where(orders.c.id.in_(ids), orders.c.status.in_(OPEN_STATUSES))
+                .values(status=EXPIRED, idempotency_key=None)
+            )
+            # Bulk update skips the Order status listener, so release here
+            stock_reservations.release(db.session.connection(), ids)
+        db.session.commit()
+        return ids
+
+    def reap(self, config):
+        """Run batches until no stale orders remain or the batch limit is hit"""
+        cutoff = datetime.utcnow() - timedelta(minutes=config.get("ORDER_PENDING_TTL_MINUTES", 120))
+        batch_size = config.get("ORDER_REAPER_BATCH", 500)
+        total = 0
+        for _ in range(config.get("ORDER_REAPER_MAX_BATCHES", 20)):
+            expired = self.reap_batch(cutoff, batch_size)
+            total += len(expired)
+            if len(expired) < batch_size:
+                break
+        stock_reservations.release_expired(batch_size)
+        return total
+
+    def _tick(self, config):
+        expired = self.reap(config)
+        if expired:
+            logger.info(f"Expired {expired} abandoned orders")
+
+    def start(self, app):
+        """Run ``reap`` every ORDER_REAPER_INTERVAL seconds in a daemon thread"""
+        self._worker.start(app, self._tick, app.config.get("ORDER_REAPER_INTERVAL", 300))
+
+    def stop(self):
+        self._worker.stop()
+
+
+# Create a singleton instance
+order_reaper = OrderReaper()
@@ -0,0 +1,210 @@
+"""Daily Metrics Rollup
+
+The admin dashboard reads its figures from ``daily_metrics`` rows keyed by
+``(day, metric, dimension)`` instead of scanning the order, quote_request
+and booking tables. Every ORM insert, update or delete of those models
+adds its +1/-1 (or +amount/-amount) deltas to the affected rows inside the
+same flush, so the rollup commits together with the change.
+
+Writes that bypass the ORM are not seen. The nightly job
+(``flask analytics rebuild-daily`` or the DailyAnalytics function)
+therefore recomputes the last DAILY_METRICS_REBUILD_DAYS days from the raw
+tables and compacts away rows that have dropped to zero; ``--all``
+backfills the whole history.
+"""
+
+import logging
+from datetime import date, datetime, time, timedelta
+from flask import current_app
+from sqlalchemy import event, func, inspect as sa_inspect
+from sqlalchemy.dialects import postgresql, sqlite
+from models import db, Booking, DailyMetric, Order, QuoteRequest, previous_value
+
+logger = logging.getLogger(__name__)
+
+
+def _day(value):
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+# Contributions of one row: (day, metric, dimension, amount)
+def _order_figures(created_at, status, amount_cents):
+    if status != "paid" or created_at is None:
+        return []
+    return [(_day(created_at), DailyMetric.PAID_REVENUE, "", amount_cents or 0)]
+
+
+def _quote_figures(created_at, status, service_type, quote_amount):
+    if created_at is None:
+        return []
+    day = _day(created_at)
+    figures = [(day, DailyMetric.QUOTES, status or "", 1),
+               (day, DailyMetric.QUOTE_SERVICES, service_type or "", 1)]
+    if quote_amount is not None:
+        figures += [(day, DailyMetric.QUOTE_AMOUNT, "", quote_amount),
+                    (day, DailyMetric.QUOTES_PRICED, "", 1)]
+    return figures
+
+
+def _booking_figures(created_at, booking_date, status):
+    figures = []
+    if created_at is not None:
+        figures.append((_day(created_at), DailyMetric.BOOKINGS, status or "", 1))
+    if booking_date is not None:
+        figures.append((booking_date, DailyMetric.BOOKING_DAYS, status or "", 1))
+    return figures
+
+
+# model, attributes passed to its figures function, and the function
+SOURCES = (
+    (Order, ("created_at", "status", "amount_cents"), _order_figures),
+    (QuoteRequest, ("created_at", "status", "service_type", "quote_amount"), _quote_figures),
+    (Booking, ("created_at", "booking_date", "status"), _booking_figures),
+)
+
+
+def add_figures(connection, deltas):
+    """Add ``{(day, metric, dimension): amount}`` to the rollup rows"""
+    table = DailyMetric.__table__
+    rows = [{"day": day, "metric": metric, "dimension": dimension, "value": amount}
+            for (day, metric, dimension), amount in deltas.items() if amount]
+    if not rows:
+        return
+    dialect = {"sqlite": sqlite, "postgresql": postgresql}.get(connection.dialect.name)
+    if dialect is not None:
+        # Concurrent first writes of a key must not fail the order or booking itself
+        statement = dialect.insert(table)
+        connection.execute(statement.on_conflict_do_update(
+            index_elements=["day", "metric", "dimension"],
+            set_={"value": table.c.value + statement.excluded.value},
+        ), rows)
+        return
+    for row in rows:
+        key = (table.c.day == row["day"], table.c.metric == row["metric"], table.c.dimension == row["dimension"])
+        if not connection.execute(table.update().where(*key).values(value=table.c.value + row["value"])).rowcount:
+            connection.execute(table.insert().values(**row))
+
+
+class DailyMetrics:
+    """Rebuild and compaction of the daily_metrics rollup"""
+
+    @staticmethod
+    def _raw_figures(first, last):
+        """Figures recomputed from the raw tables for days ``first``..``last`` (None: unbounded)"""
+        def within(column, is_datetime):
+            conditions = []
+            if first is not None:
+                conditions.append(column >= (datetime.combine(first, time.min) if is_datetime else first))
+            if last is not None:
+                end = last + timedelta(days=1)
+                conditions.append(column < (datetime.combine(end, time.min) if is_datetime else end))
+            return conditions
+
+        queries = (
+            (DailyMetric.PAID_REVENUE, func.date(Order.created_at), None, func.sum(Order.amount_cents),
+             [Order.status == "paid"] + within(Order.created_at, True)),
+            (DailyMetric.QUOTES, func.date(QuoteRequest.created_at), QuoteRequest.status, func.count(),
+             within(QuoteRequest.created_at, True)),
+            (DailyMetric.QUOTE_SERVICES, func.date(QuoteRequest.created_at), QuoteRequest.service_type, func.count(),
+             within(QuoteRequest.created_at, True)),
+            (DailyMetric.QUOTE_AMOUNT, func.date(QuoteRequest.created_at), None, func.sum(QuoteRequest.quote_amount),
+             [QuoteRequest.quote_amount.isnot(None)] + within(QuoteRequest.created_at, True)),
+            (DailyMetric.QUOTES_PRICED, func.date(QuoteRequest.created_at), None, func.count(),
+             [QuoteRequest.quote_amount.isnot(None)] + within(QuoteRequest.created_at, True)),
+            (DailyMetric.BOOKINGS, func.date(Booking.created_at), Booking.status, func.count(),
+             within(Booking.created_at, True)),
+            (DailyMetric.BOOKING_DAYS, Booking.booking_date, Booking.status, func.count(),
+             within(Booking.booking_date, False)),
+        )
+        figures = {}
+        for metric, day, dimension, aggregate, conditions in queries:
+            columns = [day, dimension if dimension is not None else db.literal(""), aggregate]
+            rows = db.session.execute(
+                db.select(*columns).where(day.isnot(None), *conditions).group_by(*columns[:2])
+            )
+            for row_day, row_dimension, value in rows:
+                key = (_day(row_day), metric, row_dimension or "")
+                figures[key] = figures.get(key, 0) + (value or 0)
+        return figures
+
+    def rebuild(self, days=None):
+        """Recompute the last ``days`` days (None: everything) and drop zero rows.
+
+        Returns ``(rows written, rows corrected)``; a corrected row is one
+        whose stored value differed from the raw tables.
+        """
+        table = DailyMetric.__table__
+        first = date.today() - timedelta(days=days - 1) if days else None
+        fresh = self._raw_figures(first, None)
+
+        in_range = [table.c.day >= first] if first else []
+        stored = {
+            (row.day, row.metric, row.dimension): row.value
+            for row in db.session.execute(db.select(table).where(*in_range))
+        }
+        corrected = sum(1 for key in stored.keys() | fresh.keys() if stored.get(key, 0) != fresh.get(key, 0))
+
+        db.session.execute(table.delete().where(*in_range))
+        if fresh:
+            db.session.execute(table.insert(), [
+                {"day": day, "metric": metric, "dimension": dimension, "value": value}
+                for (day, metric, dimension), value in fresh.items() if value
+            ])
+        # Compaction: older rows that cancelled out to zero
+        db.session.execute(table.delete().where(table.c.value == 0))
+        db.session.commit()
+        if corrected:
+            logger.warning(f"daily_metrics: corrected {corrected} rows while rebuilding")
+        return len(fresh), corrected
+
+    def nightly(self, days=None):
+        """The scheduled job: rebuild the recent window, or everything with ``days=0``"""
+        if days is None:
+            days = current_app.config.get("DAILY_METRICS_REBUILD_DAYS", 3)
+        return self.rebuild(days or None)
+
+
+# Create a singleton instance
+daily_metrics = DailyMetrics()
+
+
+def _merge(deltas, figures, sign):
+    for day, metric, dimension, amount in figures:
+        key = (day, metric, dimension)
+        deltas[key] = deltas.get(key, 0) + sign * amount
+
+
+def _watch(model, attributes, figures):
+    """Apply the rollup deltas of every ``model`` write in its flush"""
+    def _inserted(mapper, connection, target):
+        deltas = {}
+        _merge(deltas, figures(*(getattr(target, a) for a in attributes)), 1)
+        add_figures(connection, deltas)
+
+    def _deleted(mapper, connection, target):
+        deltas = {}
+        _merge(deltas, figures(*(getattr(target, a) for a in attributes)), -1)
+        add_figures(connection, deltas)
+
+    def _updated(mapper, connection, target):
+        state = sa_inspect(target)
+        if not any(state.attrs[a].history.has_changes() for a in attributes):
+            return
+        deltas = {}
+        _merge(deltas, figures(*(previous_value(state, a) for a in attributes)), -1)
+        _merge(deltas, figures(*(getattr(target, a) for a in attributes)), 1)
+        add_figures(connection, deltas)
+
+    event.listen(model, "after_insert", _inserted)
+    event.listen(model, "after_delete", _deleted)
+    event.listen(model, "after_update", _updated)
+
+
+for _model, _attributes, _figures in SOURCES:
+    _watch(_model, _attributes, _figures)
@@ -1,8 +1,36 @@
+"""Dummy Payment Provider
+
+Simulates the subset of Stripe's PaymentIntent API used by the
+``/payment/create-intent`` and ``/payment/confirm`` routes. Intents live in
+a pluggable store chosen by DUMMY_INTENT_STORE:
+
+    sql      the ``dummy_payment_intent`` table, shared by every worker and
+             replica, so confirm may land on another process than create
+    memory   a per-process LRU bounded by DUMMY_INTENT_MAX_ENTRIES
+
+Both stores drop intents once ``expires_at`` (DUMMY_INTENT_TTL_SECONDS after
+creation) has passed; a background sweeper purges them every
+DUMMY_INTENT_SWEEP_INTERVAL seconds. Status changes are compare-and-set, so
+two concurrent confirms of the same intent cannot both transition it.
+"""
+
+import json
+import logging
+import threading
 import uuid
-from datetime import datetime, timedelta
+from collections import OrderedDict
+from datetime import datetime
+from flask import current_app
+from models import db, DummyIntentRecord
+from utils.workers import PeriodicWorker
+
+logger = logging.getLogger(__name__)
+
+CONFIRMABLE = ('requires_confirmation', 'requires_action')
+
 
 class DummyPaymentIntent:
-    def __init__(self, amount_cents: int, currency: str = 'usd', metadata=None):
+    def __init__(self, amount_cents: int, currency: str = 'usd', metadata=None, ttl_seconds: int = 30 * 60):
         self.id = f'dummy_pi_{uuid.uuid4().hex[:24]}'
         self.amount = amount_cents
         self.currency = currency
@@ -10,7 +38,20 @@ class DummyPaymentIntent:
         self.status = 'requires_confirmation'  # mimic stripe initial state
         self.metadata = metadata or {}
         self.created = int(datetime.utcnow().timestamp())
-        self.expires_at = self.created + 30 * 60  # 30 minute expiry
+        self.expires_at = self.created + ttl_seconds
+
+    @classmethod
+    def from_dict(cls, data):
+        intent = cls.__new__(cls)
+        intent.id = data['id']
+        intent.amount = data['amount']
+        intent.currency = data['currency']
+        intent.client_secret = data['client_secret']
+        intent.status = data['status']
+        intent.metadata = data.get('metadata') or {}
+        intent.created = data['created']
+        intent.expires_at = data['expires_at']
+        return intent
 
     def to_dict(self):
         return {
@@ -25,29 +66,171 @@ class DummyPaymentIntent:
             'object': 'payment_intent'
         }
 
+
+def _now():
+    return int(datetime.utcnow().timestamp())
+
+
+# -----------------------------
+# Stores
+# -----------------------------
+class MemoryIntentStore:
+    """Per-process LRU of intents with TTL enforcement"""
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._intents = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, intent):
+        with self._lock:
+            self._intents[intent.id] = intent.to_dict()
+            self._intents.move_to_end(intent.id)
+            while len(self._intents) > self.max_entries:
+                self._intents.popitem(last=False)
+
+    def get(self, intent_id):
+        with self._lock:
+            data = self._intents.get(intent_id)
+            if data is None:
+                return None
+            if data['expires_at'] <= _now():
+                del self._intents[intent_id]
+                return None
+            self._intents.move_to_end(intent_id)
+            return DummyPaymentIntent.from_dict(data)
+
+    def transition(self, intent_id, from_statuses, to_status):
+        """Set the status if it is one of ``from_statuses``; returns the intent or None"""
+        with self._lock:
+            data = self._intents.get(intent_id)
+            if data is None or data['expires_at'] <= _now():
+                self._intents.pop(intent_id, None)
+                return None
+            if data['status'] in from_statuses:
+                data['status'] = to_status
+            return DummyPaymentIntent.from_dict(data)
+
+    def purge_expired(self, limit=1000):
+        now = _now()
+        with self._lock:
+            expired = [key for key, data in self._intents.items() if data['expires_at'] <= now][:limit]
+            for key in expired:
+                del self._intents[key]
+        return len(expired)
+
+    def __len__(self):
+        return len(self._intents)
+
+
+class SQLIntentStore:
+    """Intents in the dummy_payment_intent table, visible to every worker.
+
+    Writes join the caller's session transaction, so an intent is committed
+    together with its provisional order and a confirm with the order update.
+    """
+
+    @staticmethod
+    def _intent(record):
+        return DummyPaymentIntent.from_dict({
+            'id': record.id,
+            'amount': record.amount,
+            'currency': record.currency,
+            'client_secret': record.client_secret,
+            'status': record.status,
+            'metadata': json.loads(record.metadata_json or '{}'),
+            'created': record.created,
+            'expires_at': record.expires_at,
+        })
+
+    def add(self, intent):
+        db.session.execute(DummyIntentRecord.__table__.insert().values(
+            id=intent.id,
+            amount=intent.amount,
+            currency=intent.currency,
+            client_secret=intent.client_secret,
+            status=intent.status,
+            metadata_json=json.dumps(intent.metadata),
+            created=intent.created,
+            expires_at=intent.expires_at,
+        ))
+
+    def get(self, intent_id):
+        table = DummyIntentRecord.__table__
+        record = db.session.execute(
+            table.select().where(table.c.id == intent_id, table.c.expires_at > _now())
+        ).first()
+        return self._intent(record) if record else None
+
+    def transition(self, intent_id, from_statuses, to_status):
+        table = DummyIntentRecord.__table__
+        db.session.execute(
+            table.update()
+            .where(table.c.id == intent_id, table.c.status.in_(from_statuses), table.c.expires_at > _now())
+            .values(status=to_status)
+        )
+        return self.get(intent_id)
+
+    def purge_expired(self, limit=1000):
+        table = DummyIntentRecord.__table__
+        ids = [row[0] for row in db.session.execute(
+            db.select(table.c.id).where(table.c.expires_at <= _now()).limit(limit)
+        )]
+        if ids:
+            db.session.execute(table.delete().where(table.c.id.in_(ids)))
+        db.session.commit()
+        return len(ids)
+
+
+# -----------------------------
+# Provider
+# -----------------------------
 class DummyPaymentProvider:
-    """Lightweight in-memory payment intent simulator.
+    """Lightweight payment intent simulator.
     NOT for production use. Mirrors minimal subset of Stripe's PaymentIntent.
     """
-    def __init__(self):
-        self._intents = {}
+    def __init__(self, store=None):
+        self._store = store
+        self._lock = threading.Lock()
+        self._sweeper = PeriodicWorker('dummy-intent-sweeper')
+
+    @property
+    def store(self):
+        if self._store is None:
+            with self._lock:
+                if self._store is None:
+                    self._store = self._create_store(current_app.config)
+        return self._store
+
+    @staticmethod
+    def _create_store(config):
+        if config.get('DUMMY_INTENT_STORE', 'sql') == 'memory':
+            return MemoryIntentStore(config.get('DUMMY_INTENT_MAX_ENTRIES', 10000))
+        return SQLIntentStore()
 
     def create_payment_intent(self, amount_cents: int, currency: str = 'usd', metadata=None):
-        intent = DummyPaymentIntent(amount_cents, currency, metadata)
-        self._intents[intent.id] = intent
+        ttl = current_app.config.get('DUMMY_INTENT_TTL_SECONDS', 30 * 60)
+        intent = DummyPaymentIntent(amount_cents, currency, metadata, ttl_seconds=ttl)
+        self.store.add(intent)
         return intent
 
     def retrieve(self, intent_id: str):
-        return self._intents.get(intent_id)
+        return self.store.get(intent_id)
 
     def confirm(self, intent_id: str):
-        intent = self._intents.get(intent_id)
-        if not intent:
-            return None
-        if intent.status not in ('requires_confirmation', 'requires_action'):
-            return intent
-        intent.status = 'succeeded'
-        return intent
+        return self.store.transition(intent_id, CONFIRMABLE, 'succeeded')
+
+    def _sweep(self, config):
+        purged = self.store.purge_expired()
+        if purged:
+            logger.info(f"Purged {purged} expired dummy payment intents")
+
+    def start_sweeper(self, app):
+        """Purge expired intents every DUMMY_INTENT_SWEEP_INTERVAL seconds in a daemon thread"""
+        self._sweeper.start(app, self._sweep, app.config.get('DUMMY_INTENT_SWEEP_INTERVAL', 60))
+
+    def stop_sweeper(self):
+        self._sweeper.stop()
 
 # Singleton instance
 provider = DummyPaymentProvider()
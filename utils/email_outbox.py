@@ -0,0 +1,190 @@
+"""Transactional Email Outbox
+
+Checkout never talks to the EmailNotifications function itself. It adds an
+``email_outbox`` row with the rendered request body to the session, so the
+email commits (or rolls back) together with the order status change that
+triggers it. EMAIL_WORKERS threads per process (or
+``flask emails process-outbox``) send queued emails; a commit that queued
+one wakes them immediately.
+
+A worker claims up to EMAIL_BATCH_SIZE emails with conditional UPDATEs that
+lease them for EMAIL_LEASE_SECONDS, so no two workers or processes send one
+at once and an email left ``sending`` by a crashed worker is picked up
+again; the claimed emails go out through the pooled dispatcher in
+``utils.email_service``, as one batch request where enabled. Failed sends
+are retried with jittered exponential backoff; after EMAIL_MAX_ATTEMPTS, or
+straight away when the service rejects the request, the email is ``dead``
+and waits for ``flask emails requeue-dead``.
+"""
+
+import json
+import logging
+import random
+from datetime import datetime, timedelta
+from sqlalchemy import and_, event
+from sqlalchemy.orm import Session
+from models import db, EmailOutbox
+from utils.email_service import EmailService, EmailDeliveryError
+from utils.workers import PeriodicWorker
+
+logger = logging.getLogger(__name__)
+
+# Service answers that a retry cannot fix
+PERMANENT_STATUSES = (400, 401, 403, 404, 413, 422)
+
+_WAKE = "email_outbox_wake"
+
+
+class Outbox:
+    """Durable email queue and the worker pool that sends it"""
+
+    def __init__(self):
+        self._workers = PeriodicWorker("email-worker")
+
+    # Queueing
+    def enqueue(self, kind, email_data, order_id=None):
+        """Add an email to the current session; it is sent once the session commits"""
+        record = EmailOutbox(
+            kind=kind,
+            order_id=order_id,
+            recipient=email_data.get("to") or "",
+            payload=json.dumps(email_data),
+            next_attempt_at=datetime.utcnow(),
+        )
+        db.session.add(record)
+        db.session.info[_WAKE] = True
+        return record
+
+    def queue_order_confirmation(self, order):
+        return self.enqueue("order_confirmation", EmailService.order_confirmation_data(order), order.id)
+
+    def queue_payment_failure(self, order, error_message=None):
+        return self.enqueue("payment_failure", EmailService.payment_failure_data(order, error_message), order.id)
+
+    def wake(self):
+        self._workers.wake()
+
+    # Sending
+    def claim(self, config, limit=1):
+        """Lease up to ``limit`` due emails; returns their ids"""
+        outbox = EmailOutbox.__table__
+        now = datetime.utcnow()
+        due = and_(outbox.c.status.in_(("pending", "sending")), outbox.c.next_attempt_at <= now)
+        candidates = db.session.execute(
+            db.select(outbox.c.id).where(due).order_by(outbox.c.next_attempt_at, outbox.c.id).limit(limit + 20)
+        ).scalars().all()
+        db.session.commit()
+        lease = timedelta(seconds=config.get("EMAIL_LEASE_SECONDS", 120))
+        claimed = []
+        for email_id in candidates:
+            if db.session.execute(
+                outbox.update()
+                .where(outbox.c.id == email_id, due)
+                .values(status="sending", next_attempt_at=now + lease, attempts=outbox.c.attempts + 1)
+            ).rowcount:
+                claimed.append(email_id)
+            db.session.commit()
+            if len(claimed) >= limit:
+                break
+        return claimed
+
+    @staticmethod
+    def retry_delay(attempts, config):
+        """Jittered exponential backoff after the ``attempts``-th failed send"""
+        base = config.get("EMAIL_RETRY_BASE_SECONDS", 30)
+        cap = config.get("EMAIL_RETRY_MAX_SECONDS", 3600)
+        return min(cap, base * 2 ** (attempts - 1)) * random.uniform(0.5, 1.0)
+
+    def _failed(self, email_id, attempts, error, config):
+        """Schedule a retry of a failed email, or dead-letter it"""
+        outbox = EmailOutbox.__table__
+        permanent = isinstance(error, EmailDeliveryError) and error.status in PERMANENT_STATUSES
+        if permanent or attempts >= config.get("EMAIL_MAX_ATTEMPTS", 8):
+            values = {"status": "dead"}
+            logger.error(f"Email {email_id} dead after {attempts} attempts: {error}")
+        else:
+            retry_in = self.retry_delay(attempts, config)
+            values = {"status": "pending", "next_attempt_at": datetime.utcnow() + timedelta(seconds=retry_in)}
+            logger.warning(f"Email {email_id} failed, retrying in {retry_in:.0f}s: {error}")
+        db.session.execute(outbox.update().where(outbox.c.id == email_id, outbox.c.status == "sending")
+                           .values(last_error=str(error)[:2000], **values))
+
+    def send(self, email_ids, config):
+        """Send claimed emails in one dispatch; returns how many were accepted"""
+        outbox = EmailOutbox.__table__
+        rows = db.session.execute(
+            db.select(outbox.c.id, outbox.c.payload, outbox.c.attempts)
+            .where(outbox.c.id.in_(email_ids)).order_by(outbox.c.id)
+        ).all()
+        db.session.commit()
+        try:
+            results = EmailService.deliver_many([json.loads(row.payload) for row in rows],
+                                                timeout=config.get("EMAIL_SEND_TIMEOUT", 10))
+        except Exception as e:
+            results = [e] * len(rows)
+
+        sent = [row.id for row, result in zip(rows, results) if not isinstance(result, Exception)]
+        if sent:
+            db.session.execute(outbox.update().where(outbox.c.id.in_(sent))
+                               .values(status="sent", sent_at=datetime.utcnow(), last_error=None))
+        for row, result in zip(rows, results):
+            if isinstance(result, Exception):
+                self._failed(row.id, row.attempts, result, config)
+        db.session.commit()
+        return len(sent)
+
+    def send_next(self, config):
+        """Claim and send the next batch of due emails; returns how many were attempted"""
+        email_ids = self.claim(config, config.get("EMAIL_BATCH_SIZE", 1))
+        if email_ids:
+            self.send(email_ids, config)
+        return len(email_ids)
+
+    def drain(self, config, limit=None):
+        """Send due emails in this thread; returns how many were attempted"""
+        handled = 0
+        while limit is None or handled < limit:
+            attempted = self.send_next(config)
+            if not attempted:
+                break
+            handled += attempted
+        return handled
+
+    def counts(self):
+        """Number of outbox emails per status"""
+        return dict(db.session.query(EmailOutbox.status, db.func.count()).group_by(EmailOutbox.status).all())
+
+    def requeue_dead(self):
+        """Give dead emails a fresh set of attempts; returns how many"""
+        outbox = EmailOutbox.__table__
+        count = db.session.execute(
+            outbox.update().where(outbox.c.status == "dead")
+            .values(status="pending", attempts=0, next_attempt_at=datetime.utcnow())
+        ).rowcount
+        db.session.commit()
+        self.wake()
+        return count
+
+    # Worker pool
+    def start(self, app):
+        """Run EMAIL_WORKERS daemon threads that send queued emails"""
+        self._workers.start(app, self.send_next, app.config.get("EMAIL_POLL_INTERVAL", 5.0),
+                            threads=app.config.get("EMAIL_WORKERS", 2), immediate=True)
+
+    def stop(self):
+        self._workers.stop()
+
+
+# Create a singleton instance
+email_outbox = Outbox()
+
+
+@event.listens_for(Session, "after_commit")
+def _wake_workers(session):
+    if session.info.pop(_WAKE, False):
+        email_outbox.wake()
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_wake(session):
+    session.info.pop(_WAKE, None)
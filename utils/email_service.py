@@ -1,15 +1,32 @@
 """
 Email service utility for FlashStudio
 Integrates with Azure Functions EmailNotifications service
+
+All requests go through one EmailDispatcher per process, which keeps a pool
+of keep-alive connections (EMAIL_POOL_SIZE) so a burst of emails does not pay
+a TCP/TLS handshake per message. With EMAIL_BATCH_SIZE above 1, queued
+emails are posted as JSON arrays of up to that many messages; a function
+that rejects arrays gets the same messages one by one instead.
 """
 import requests
 import logging
+import threading
+import time
 from datetime import datetime
 from flask import current_app
+from requests.adapters import HTTPAdapter
 
 logger = logging.getLogger(__name__)
 
 
+class EmailDeliveryError(Exception):
+    """The email service could not be reached or did not accept an email"""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
 class EmailService:
     """Service to handle email notifications via Azure Functions"""
     
@@ -21,6 +38,93 @@ class EmailService:
             'https://flashstudio-functions.azurewebsites.net/api/EmailNotifications'
         )
     
+    @staticmethod
+    def is_configured():
+        """False in local development, where emails are logged instead of sent"""
+        function_url = EmailService.get_function_url()
+        return bool(function_url) and 'localhost' not in function_url
+    
+    @staticmethod
+    def order_confirmation_data(order):
+        """Request body of the order confirmation email for ``order``"""
+        # Prepare order items data
+        items = []
+        for item in order.items:
+            items.append({
+                'name': item.product.title if item.product else 'Product',
+                'price': f"{item.unit_price_cents / 100:.2f}",
+                'quantity': item.quantity,
+                'total': f"{(item.unit_price_cents * item.quantity) / 100:.2f}"
+            })
+        
+        return {
+            'type': 'order_confirmation',
+            'to': order.customer_email,
+            'name': order.user.email.split('@')[0] if order.user else 'Valued Customer',  # Use email prefix as name
+            'order_id': f"ORD{order.id:05d}",
+            'total_amount': f"{order.amount_cents / 100:.2f}",
+            'currency': 'S$',
+            'items': items,
+            'order_date': order.created_at.strftime('%B %d, %Y') if order.created_at else datetime.now().strftime('%B %d, %Y')
+        }
+    
+    @staticmethod
+    def payment_failure_data(order, error_message=None):
+        """Request body of the payment failure notification for ``order``"""
+        return {
+            'type': 'custom',
+            'to': order.customer_email,
+            'name': order.user.email.split('@')[0] if order.user else 'Customer',
+            'subject': f'Payment Failed for Order #{order.id:05d}',
+            'message': f"""
+            <p>We were unable to process your payment for order <strong>#{order.id:05d}</strong>.</p>
+            
+            <div style="background: #f8f9fa; padding: 15px; border-radius: 5px; margin: 15px 0;">
+                <p><strong>Order Details:</strong></p>
+                <p>Amount: S$ {order.amount_cents / 100:.2f}</p>
+                <p>Date: {order.created_at.strftime('%B %d, %Y') if order.created_at else 'Today'}</p>
+            </div>
+            
+            <p>Please try again or contact our support team if you continue to experience issues.</p>
+            
+            <p><a href="https://flashstudio.com/cart" style="color: #007bff;">Try Payment Again</a></p>
+            """
+        }
+    
+    @staticmethod
+    def deliver(email_data, timeout=30):
+        """
+        POST one email to the EmailNotifications function
+        
+        Returns:
+            dict: Response from email service
+            
+        Raises:
+            EmailDeliveryError: when the service is unreachable or rejects the email
+        """
+        if not EmailService.is_configured():
+            logger.warning(f"Email function URL not configured, skipping {email_data.get('type')} email")
+            return {
+                'success': True,
+                'message': 'Email service not configured (development mode)',
+                'local_dev': True
+            }
+        
+        return email_dispatcher.send(email_data, timeout)
+    
+    @staticmethod
+    def deliver_many(emails, timeout=30):
+        """
+        POST several emails, coalesced into batches when enabled
+        
+        Returns:
+            list: the service response or an EmailDeliveryError per email, in order
+        """
+        if not EmailService.is_configured():
+            logger.warning(f"Email function URL not configured, skipping {len(emails)} emails")
+            return [{'success': True, 'local_dev': True} for _ in emails]
+        return email_dispatcher.send_many(emails, timeout)
+    
     @staticmethod
     def send_order_confirmation(order):
         """
@@ -33,70 +137,12 @@ class EmailService:
             dict: Response from email service
         """
         try:
-            # Prepare order items data
-            items = []
-            for item in order.items:
-                items.append({
-                    'name': item.product.title if item.product else 'Product',
-                    'price': f"{item.unit_price_cents / 100:.2f}",
-                    'quantity': item.quantity,
-                    'total': f"{(item.unit_price_cents * item.quantity) / 100:.2f}"
-                })
-            
-            # Prepare email data
-            email_data = {
-                'type': 'order_confirmation',
-                'to': order.customer_email,
-                'name': order.user.email.split('@')[0] if order.user else 'Valued Customer',  # Use email prefix as name
-                'order_id': f"ORD{order.id:05d}",
-                'total_amount': f"{order.amount_cents / 100:.2f}",
-                'currency': 'S$',
-                'items': items,
-                'order_date': order.created_at.strftime('%B %d, %Y') if order.created_at else datetime.now().strftime('%B %d, %Y')
-            }
-            
-            # Send email via Azure Function
-            function_url = EmailService.get_function_url()
-            
-            # If no function URL configured, log and return success (for local development)
-            if not function_url or 'localhost' in function_url:
-                logger.warning("Email function URL not configured, skipping email send")
-                return {
-                    'success': True,
-                    'message': 'Email service not configured (development mode)',
-                    'local_dev': True
-                }
-            
-            response = requests.post(
-                function_url,
-                json=email_data,
-                timeout=30,
-                headers={'Content-Type': 'application/json'}
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                logger.info(f"Order confirmation email sent successfully to {order.customer_email}")
-                return result
-            else:
-                logger.error(f"Email service returned status {response.status_code}: {response.text}")
-                return {
-                    'success': False,
-                    'error': f'Email service error: {response.status_code}'
-                }
-                
-        except requests.exceptions.Timeout:
-            logger.error("Email service timeout")
-            return {
-                'success': False,
-                'error': 'Email service timeout'
-            }
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Email service request failed: {e}")
-            return {
-                'success': False,
-                'error': f'Email service unavailable: {e}'
-            }
+            result = EmailService.deliver(EmailService.order_confirmation_data(order))
+            logger.info(f"Order confirmation email sent successfully to {order.customer_email}")
+            return result
+        except EmailDeliveryError as e:
+            logger.error(f"Order confirmation email to {order.customer_email} failed: {e}")
+            return {'success': False, 'error': str(e)}
         except Exception as e:
             logger.error(f"Unexpected error in email service: {e}")
             return {
@@ -117,46 +163,153 @@ class EmailService:
             dict: Response from email service
         """
         try:
-            email_data = {
-                'type': 'custom',
-                'to': order.customer_email,
-                'name': order.user.email.split('@')[0] if order.user else 'Customer',
-                'subject': f'Payment Failed for Order #{order.id:05d}',
-                'message': f"""
-                <p>We were unable to process your payment for order <strong>#{order.id:05d}</strong>.</p>
-                
-                <div style="background: #f8f9fa; padding: 15px; border-radius: 5px; margin: 15px 0;">
-                    <p><strong>Order Details:</strong></p>
-                    <p>Amount: S$ {order.amount_cents / 100:.2f}</p>
-                    <p>Date: {order.created_at.strftime('%B %d, %Y') if order.created_at else 'Today'}</p>
-                </div>
-                
-                <p>Please try again or contact our support team if you continue to experience issues.</p>
-                
-                <p><a href="https://flashstudio.com/cart" style="color: #007bff;">Try Payment Again</a></p>
-                """
-            }
-            
-            function_url = EmailService.get_function_url()
-            
-            if not function_url or 'localhost' in function_url:
-                logger.warning("Email function URL not configured, skipping failure notification")
-                return {'success': True, 'local_dev': True}
-            
-            response = requests.post(function_url, json=email_data, timeout=30)
-            
-            if response.status_code == 200:
-                logger.info(f"Payment failure notification sent to {order.customer_email}")
-                return response.json()
-            else:
-                logger.error(f"Failed to send payment failure notification: {response.status_code}")
-                return {'success': False, 'error': 'Failed to send notification'}
-                
+            result = EmailService.deliver(EmailService.payment_failure_data(order, error_message))
+            logger.info(f"Payment failure notification sent to {order.customer_email}")
+            return result
         except Exception as e:
             logger.error(f"Error sending payment failure notification: {e}")
             return {'success': False, 'error': str(e)}
 
 
+class EmailDispatcher:
+    """Pooled keep-alive client for the EmailNotifications function"""
+    
+    # Answers to an array body that may just mean the function wants single messages
+    ARRAY_REJECTED = (400, 404, 405, 413, 415, 422)
+    
+    def __init__(self):
+        self._session = None
+        self._lock = threading.Lock()
+        self._counts_lock = threading.Lock()
+        self._first_request = None
+        self.batches_supported = True
+        self.counters = {'requests': 0, 'batch_requests': 0, 'sent': 0, 'failed': 0}
+        self._request_seconds = 0.0
+    
+    @property
+    def session(self):
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, max_retries=0,
+                                          pool_maxsize=current_app.config.get('EMAIL_POOL_SIZE', 8))
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    self._session = session
+        return self._session
+    
+    def _count(self, seconds=0.0, **amounts):
+        with self._counts_lock:
+            for name, amount in amounts.items():
+                self.counters[name] += amount
+            self._request_seconds += seconds
+    
+    def _post(self, body, timeout):
+        if self._first_request is None:
+            self._first_request = time.monotonic()
+        started = time.monotonic()
+        try:
+            return self.session.post(EmailService.get_function_url(), json=body, timeout=timeout)
+        except requests.exceptions.Timeout:
+            raise EmailDeliveryError('Email service timeout')
+        except requests.exceptions.RequestException as e:
+            raise EmailDeliveryError(f'Email service unavailable: {e}')
+        finally:
+            self._count(time.monotonic() - started, requests=1)
+    
+    def send(self, email_data, timeout=30):
+        """POST one email; returns the service response or raises EmailDeliveryError"""
+        try:
+            response = self._post(email_data, timeout)
+            if response.status_code != 200:
+                raise EmailDeliveryError(f'Email service error: {response.status_code}', response.status_code)
+            result = response.json()
+        except (EmailDeliveryError, ValueError):
+            self._count(failed=1)
+            raise
+        self._count(sent=1)
+        return result
+    
+    def _attempt(self, email_data, timeout):
+        try:
+            return self.send(email_data, timeout)
+        except (EmailDeliveryError, ValueError) as e:
+            return e if isinstance(e, EmailDeliveryError) else EmailDeliveryError(f'Bad email service response: {e}')
+    
+    def send_many(self, emails, timeout=30):
+        """Deliver ``emails``; returns a response or an EmailDeliveryError per email, in order"""
+        size = current_app.config.get('EMAIL_BATCH_SIZE', 1)
+        if size <= 1 or not self.batches_supported:
+            return [self._attempt(email_data, timeout) for email_data in emails]
+        results = []
+        for start in range(0, len(emails), size):
+            results.extend(self._send_batch(emails[start:start + size], timeout))
+        return results
+    
+    def _send_batch(self, batch, timeout):
+        if len(batch) == 1:
+            return [self._attempt(batch[0], timeout)]
+        try:
+            response = self._post(batch, timeout)
+        except EmailDeliveryError as e:
+            self._count(failed=len(batch))
+            return [e] * len(batch)
+        self._count(batch_requests=1)
+        
+        if response.status_code in self.ARRAY_REJECTED:
+            results = [self._attempt(email_data, timeout) for email_data in batch]
+            if not any(isinstance(result, EmailDeliveryError) for result in results):
+                logger.warning("Email function rejects batches but accepts single emails; batching disabled")
+                self.batches_supported = False
+            return results
+        if response.status_code != 200:
+            self._count(failed=len(batch))
+            return [EmailDeliveryError(f'Email service error: {response.status_code}', response.status_code)] * len(batch)
+        
+        try:
+            body = response.json()
+        except ValueError:
+            body = None
+        if isinstance(body, list) and len(body) == len(batch):
+            # Per-message results, in request order
+            results = [
+                item if not isinstance(item, dict) or item.get('success', True)
+                else EmailDeliveryError(item.get('error') or 'Email rejected in batch', item.get('status'))
+                for item in body
+            ]
+        else:
+            results = [body if isinstance(body, dict) else {'success': True}] * len(batch)
+        failed = sum(isinstance(result, EmailDeliveryError) for result in results)
+        self._count(sent=len(batch) - failed, failed=failed)
+        return results
+    
+    def connections_opened(self):
+        """TCP connections opened so far; each one cost a handshake"""
+        if self._session is None:
+            return 0
+        total = 0
+        for adapter in set(self._session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            total += sum(pools[key].num_connections for key in pools.keys())
+        return total
+    
+    def stats(self):
+        with self._counts_lock:
+            stats = dict(self.counters)
+            seconds = self._request_seconds
+        elapsed = time.monotonic() - self._first_request if self._first_request else 0
+        stats['connections_opened'] = self.connections_opened()
+        stats['batches_supported'] = self.batches_supported
+        stats['avg_request_ms'] = round(seconds * 1000 / stats['requests'], 1) if stats['requests'] else None
+        stats['sent_per_second'] = round(stats['sent'] / elapsed, 2) if elapsed else None
+        return stats
+
+
+# Create a singleton instance
+email_dispatcher = EmailDispatcher()
+
+
 def send_order_confirmation_email(order):
     """
     Convenience function to send order confirmation email
@@ -0,0 +1,158 @@
+"""Keyset (Cursor) Pagination
+
+Pages are fetched by seeking past the sort key of the last row returned
+(e.g. ``(created_at, id)``) instead of using OFFSET, so each page costs one
+indexed range scan of ``per_page + 1`` rows regardless of table size.
+Cursors are opaque URL-safe tokens encoding the last row's key values.
+"""
+
+import base64
+import json
+from datetime import datetime, date, time
+from flask import current_app, request, url_for
+from sqlalchemy import and_, or_
+
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor token cannot be decoded"""
+
+
+# -----------------------------
+# Cursor tokens
+# -----------------------------
+def _dump_value(value):
+    if isinstance(value, datetime):
+        return ["dt", value.isoformat()]
+    if isinstance(value, date):
+        return ["d", value.isoformat()]
+    if isinstance(value, time):
+        return ["t", value.isoformat()]
+    return ["v", value]
+
+
+def _load_value(tagged):
+    kind, value = tagged
+    if kind == "dt":
+        return datetime.fromisoformat(value)
+    if kind == "d":
+        return date.fromisoformat(value)
+    if kind == "t":
+        return time.fromisoformat(value)
+    return value
+
+
+def encode_cursor(values):
+    """Encode a tuple of key values as an opaque token"""
+    raw = json.dumps([_dump_value(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token, key_count):
+    """Decode a token produced by ``encode_cursor``"""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        values = [_load_value(v) for v in json.loads(base64.urlsafe_b64decode(padded))]
+    except (ValueError, TypeError, KeyError):
+        raise InvalidCursor(token)
+    if len(values) != key_count:
+        raise InvalidCursor(token)
+    return values
+
+
+# -----------------------------
+# Pages
+# -----------------------------
+class KeysetPage:
+    """One page of results plus the cursor needed to fetch the next page"""
+
+    def __init__(self, items, per_page, cursor=None, next_cursor=None):
+        self.items = items
+        self.per_page = per_page
+        self.cursor = cursor
+        self.next_cursor = next_cursor
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __bool__(self):
+        return bool(self.items)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def is_first(self):
+        return self.cursor is None
+
+    def _url(self, cursor, param):
+        args = request.args.to_dict()
+        args.pop(param, None)
+        if cursor:
+            args[param] = cursor
+        return url_for(request.endpoint, **(request.view_args or {}), **args)
+
+    def next_url(self, param="cursor"):
+        """URL of the next page, keeping the current query string"""
+        return self._url(self.next_cursor, param) if self.has_next else None
+
+    def first_url(self, param="cursor"):
+        """URL of the first page, keeping the current query string"""
+        return self._url(None, param)
+
+    def to_dict(self, serialize):
+        """JSON-ready representation using ``serialize`` for each item"""
+        return {
+            "items": [serialize(item) for item in self.items],
+            "per_page": self.per_page,
+            "next_cursor": self.next_cursor,
+            "has_next": self.has_next,
+        }
+
+
+def page_size(default=None):
+    """Page size from ``?per_page=``, bounded by PAGE_SIZE_MAX"""
+    config = current_app.config
+    size = request.args.get("per_page", type=int) or default or config.get("PAGE_SIZE", 25)
+    return max(1, min(size, config.get("PAGE_SIZE_MAX", 100)))
+
+
+def _seek_condition(keys, values, descending):
+    """Rows strictly after ``values`` in (keys...) order, expanded for portability"""
+    clauses = []
+    for i, (key, value) in enumerate(zip(keys, values)):
+        step = key < value if descending else key > value
+        clauses.append(and_(*[k == v for k, v in zip(keys[:i], values[:i])], step))
+    return or_(*clauses)
+
+
+def paginate(query, keys, cursor=None, per_page=None, descending=True):
+    """Fetch one keyset page of ``query`` ordered by ``keys``.
+
+    ``query`` must select a single entity (e.g. ``Order.query``). ``keys``
+    must end with a unique column (normally the primary key) so the order is
+    total. An undecodable cursor restarts from the first page.
+    """
+    keys = list(keys)
+    per_page = per_page or page_size()
+
+    if cursor:
+        try:
+            values = decode_cursor(cursor, len(keys))
+            query = query.filter(_seek_condition(keys, values, descending))
+        except InvalidCursor:
+            cursor = None
+
+    ordering = [k.desc() if descending else k.asc() for k in keys]
+    labelled = [k.label(f"_page_key_{i}") for i, k in enumerate(keys)]
+    rows = query.add_columns(*labelled).order_by(None).order_by(*ordering).limit(per_page + 1).all()
+
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = encode_cursor(tuple(rows[-1])[1:])
+
+    return KeysetPage([row[0] for row in rows], per_page, cursor, next_cursor)
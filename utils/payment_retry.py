@@ -0,0 +1,287 @@
+"""Payment Provider Client
+
+One client for every call to the Stripe REST API, replacing per-call
+``stripe.api_key`` assignments:
+
+- a single ``requests.Session`` with a keep-alive connection pool
+  (PAYMENT_POOL_SIZE), separate connect/read timeouts
+- retries of connection errors, timeouts, 429 and 5xx responses with full
+  jitter exponential backoff (PAYMENT_BACKOFF_BASE .. PAYMENT_BACKOFF_CAP),
+  never beyond PAYMENT_DEADLINE_SECONDS in total so a slow provider cannot
+  pin request threads
+- an ``Idempotency-Key`` on every POST, kept across its retries
+- a circuit breaker that opens after PAYMENT_BREAKER_THRESHOLD consecutive
+  failures and rejects calls for PAYMENT_BREAKER_RESET_SECONDS before
+  letting a single trial call through
+- latency, retry and failure counters via ``stats()``
+
+STRIPE_API_BASE points the client at a local stub server in tests.
+"""
+
+import logging
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from flask import current_app
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUSES = (409, 429, 500, 502, 503, 504)
+
+
+class PaymentError(Exception):
+    """A provider call that failed for good"""
+
+    def __init__(self, message, status=None, code=None, retryable=False):
+        super().__init__(message)
+        self.status = status
+        self.code = code
+        self.retryable = retryable
+
+
+class CircuitOpen(PaymentError):
+    """Raised without calling the provider while the breaker is open"""
+
+
+def encode_params(params, prefix=None):
+    """Flatten nested dicts/lists into Stripe's ``a[b][0]=c`` form fields"""
+    fields = []
+    items = params.items() if isinstance(params, dict) else enumerate(params)
+    for key, value in items:
+        name = f"{prefix}[{key}]" if prefix else str(key)
+        if isinstance(value, (dict, list, tuple)):
+            fields.extend(encode_params(value, name))
+        elif value is not None:
+            fields.append((name, str(value).lower() if isinstance(value, bool) else str(value)))
+    return fields
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker: closed -> open -> half-open -> closed"""
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, threshold=5, reset_seconds=30.0):
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """True when a call may go out now"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_seconds:
+                self.state = self.HALF_OPEN
+                self._trial = False
+            if self.state == self.HALF_OPEN and not self._trial:
+                self._trial = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.threshold:
+                if self.state != self.OPEN:
+                    logger.warning(f"Payment circuit opened after {self.failures} failures")
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._trial = False
+
+
+class PaymentMetrics:
+    """Thread-safe counters plus a window of recent call latencies"""
+
+    def __init__(self, window=1000):
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=window)
+        self.counters = {"calls": 0, "succeeded": 0, "failed": 0, "retries": 0, "rejected_open": 0}
+
+    def count(self, counter, amount=1):
+        with self._lock:
+            self.counters[counter] += amount
+
+    def observe(self, seconds):
+        with self._lock:
+            self._latencies.append(seconds * 1000)
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.counters)
+            latencies = sorted(self._latencies)
+        for label, fraction in (("p50_ms", 0.5), ("p95_ms", 0.95), ("p99_ms", 0.99)):
+            stats[label] = round(latencies[min(len(latencies) - 1, int(len(latencies) * fraction))], 1) \
+                if latencies else None
+        return stats
+
+
+class PaymentClient:
+    """Pooled, retrying Stripe REST client guarded by a circuit breaker"""
+
+    def __init__(self, config=None):
+        self._config = config
+        self._session = None
+        self._breaker = None
+        self._lock = threading.Lock()
+        self.metrics = PaymentMetrics()
+
+    @property
+    def config(self):
+        return self._config if self._config is not None else current_app.config
+
+    @property
+    def session(self):
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    pool = self.config.get("PAYMENT_POOL_SIZE", 10)
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool, max_retries=0)
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    self._session = session
+        return self._session
+
+    @property
+    def breaker(self):
+        if self._breaker is None:
+            with self._lock:
+                if self._breaker is None:
+                    self._breaker = CircuitBreaker(self.config.get("PAYMENT_BREAKER_THRESHOLD", 5),
+                                                   self.config.get("PAYMENT_BREAKER_RESET_SECONDS", 30.0))
+        return self._breaker
+
+    def _backoff(self, attempt, response=None):
+        """Full-jitter delay before retry ``attempt`` (1-based), honouring Retry-After"""
+        if response is not None and response.headers.get("Retry-After"):
+            try:
+                return float(response.headers["Retry-After"])
+            except ValueError:
+                pass
+        base = self.config.get("PAYMENT_BACKOFF_BASE", 0.25)
+        cap = self.config.get("PAYMENT_BACKOFF_CAP", 4.0)
+        return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+    @staticmethod
+    def _error(response):
+        try:
+            body = response.json()
+        except ValueError:
+            body = {}
+        error = body.get("error") if isinstance(body, dict) else None
+        if not isinstance(error, dict):
+            error = {}
+        return error.get("message") or f"HTTP {response.status_code}", error.get("code")
+
+    def request(self, method, path, params=None, idempotency_key=None):
+        """Call the API and return the decoded JSON body; raises PaymentError"""
+        config = self.config
+        self.metrics.count("calls")
+        if not self.breaker.allow():
+            self.metrics.count("rejected_open")
+            raise CircuitOpen("payment provider circuit is open", retryable=True)
+
+        headers = {"Authorization": f"Bearer {config.get('STRIPE_SECRET_KEY')}"}
+        if method == "POST":
+            headers["Idempotency-Key"] = idempotency_key or uuid.uuid4().hex
+        url = config.get("STRIPE_API_BASE", "https://api.stripe.com").rstrip("/") + path
+        fields = encode_params(params or {})
+        timeout = (config.get("PAYMENT_CONNECT_TIMEOUT", 3.05), config.get("PAYMENT_READ_TIMEOUT", 10.0))
+        deadline = time.monotonic() + config.get("PAYMENT_DEADLINE_SECONDS", 20.0)
+        max_retries = config.get("PAYMENT_MAX_RETRIES", 3)
+
+        attempt = 0
+        while True:
+            started = time.monotonic()
+            response, failure = None, None
+            try:
+                response = self.session.request(
+                    method, url, headers=headers, timeout=timeout,
+                    data=fields if method == "POST" else None,
+                    params=fields if method != "POST" else None,
+                )
+            except (requests.ConnectionError, requests.Timeout) as e:
+                failure = PaymentError(f"{method} {path} failed: {e}", retryable=True)
+            finally:
+                self.metrics.observe(time.monotonic() - started)
+
+            if response is not None and response.status_code < 400:
+                try:
+                    body = response.json()
+                except ValueError:
+                    # e.g. an HTML error page from a proxy in front of the API;
+                    # retried and counted against the breaker like a 5xx
+                    failure = PaymentError(f"{method} {path} returned a non-JSON body",
+                                           response.status_code, "invalid_response", retryable=True)
+                else:
+                    self.breaker.record_success()
+                    self.metrics.count("succeeded")
+                    return body
+            elif response is not None:
+                message, code = self._error(response)
+                should_retry = response.headers.get("Stripe-Should-Retry")
+                retryable = (should_retry == "true") if should_retry else response.status_code in RETRYABLE_STATUSES
+                failure = PaymentError(message, response.status_code, code, retryable)
+                if not retryable:
+                    # The provider answered; a rejected request says nothing about its health
+                    self.breaker.record_success()
+                    self.metrics.count("failed")
+                    raise failure
+
+            attempt += 1
+            delay = self._backoff(attempt, response)
+            if attempt > max_retries or time.monotonic() + delay >= deadline:
+                self.breaker.record_failure()
+                self.metrics.count("failed")
+                raise failure
+            self.metrics.count("retries")
+            logger.info(f"Retrying {method} {path} in {delay:.2f}s after: {failure}")
+            time.sleep(delay)
+
+    # Stripe operations
+    def create_payment_intent(self, amount, currency="usd", metadata=None, idempotency_key=None):
+        return self.request("POST", "/v1/payment_intents", {
+            "amount": amount, "currency": currency, "metadata": metadata or {},
+        }, idempotency_key)
+
+    def retrieve_payment_intent(self, payment_intent_id):
+        return self.request("GET", f"/v1/payment_intents/{payment_intent_id}")
+
+    def create_customer(self, email, name=None, idempotency_key=None):
+        return self.request("POST", "/v1/customers", {"email": email, "name": name}, idempotency_key)
+
+    def create_checkout_session(self, line_items, success_url, cancel_url, customer_email=None,
+                                metadata=None, idempotency_key=None):
+        return self.request("POST", "/v1/checkout/sessions", {
+            "mode": "payment",
+            "line_items": line_items,
+            "success_url": success_url,
+            "cancel_url": cancel_url,
+            "customer_email": customer_email,
+            "metadata": metadata or {},
+        }, idempotency_key)
+
+    def stats(self):
+        stats = self.metrics.snapshot()
+        stats["circuit"] = self.breaker.state
+        stats["consecutive_failures"] = self.breaker.failures
+        return stats
+
+
+# Create a singleton instance
+payment_client = PaymentClient()
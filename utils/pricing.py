@@ -0,0 +1,194 @@
+"""Cart Pricing Engine
+
+Prices a whole cart in one pass: every referenced product is loaded with a
+single ``IN (...)`` query, then line subtotals and the order total are
+computed in memory. The cart page, checkout and the payment routes all use
+this engine so a checkout costs one product query regardless of cart size.
+
+Size and frame surcharges come from the ``product_option`` table, compiled
+into an immutable per-worker ``PriceTable`` that is rebuilt only when the
+shared ``options`` cache version changes. Products may narrow the offered
+options through ``available_sizes`` / ``available_frames``.
+"""
+
+import json
+import threading
+from functools import lru_cache
+from types import MappingProxyType
+from models import db, Product, ProductOption
+from utils.cache_versions import cache_versions
+
+OPTIONS = "options"
+cache_versions.watch(ProductOption, OPTIONS)
+
+DEFAULT_SIZE = "20cm x 30cm"
+DEFAULT_FRAME = "No frame"
+
+
+@lru_cache(maxsize=1024)
+def _parse_labels(raw):
+    """Decode a product's JSON option override; None means no override"""
+    if not raw:
+        return None
+    try:
+        labels = json.loads(raw)
+    except ValueError:
+        return None
+    return frozenset(labels) if isinstance(labels, list) else None
+
+
+class PriceTable:
+    """Immutable surcharge lookup compiled from the option catalog"""
+
+    def __init__(self, sizes, frames):
+        self.sizes = MappingProxyType(dict(sizes))
+        self.frames = MappingProxyType(dict(frames))
+
+    @staticmethod
+    def _restrict(options, raw_override):
+        allowed = _parse_labels(raw_override)
+        if allowed is None:
+            return options
+        return MappingProxyType({k: v for k, v in options.items() if k in allowed})
+
+    def sizes_for(self, product):
+        """Size options offered on ``product`` (label -> surcharge cents)"""
+        return self._restrict(self.sizes, product.available_sizes)
+
+    def frames_for(self, product):
+        """Frame options offered on ``product`` (label -> surcharge cents)"""
+        return self._restrict(self.frames, product.available_frames)
+
+    def unit_price_cents(self, product, size=DEFAULT_SIZE, frame=DEFAULT_FRAME):
+        """Product base price plus the size and frame surcharges"""
+        return int(product.price_cents) + self.sizes.get(size, 0) + self.frames.get(frame, 0)
+
+
+class OptionCatalog:
+    """Per-process PriceTable invalidated by the ``options`` version"""
+
+    def __init__(self):
+        self._table = None
+        self._version = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """Return the compiled table for the current options version"""
+        version = cache_versions.get(OPTIONS)
+        if self._table is not None and self._version == version:
+            return self._table
+
+        with self._lock:
+            if self._table is None or self._version != version:
+                self._table = self._compile()
+                self._version = version
+            return self._table
+
+    @staticmethod
+    def _compile():
+        # The defaults are seeded by the migration / init_db; an empty table
+        # is an empty catalog
+        rows = db.session.query(ProductOption.kind, ProductOption.label, ProductOption.price_cents) \
+            .order_by(ProductOption.position, ProductOption.id).all()
+        sizes = [(label, int(cents)) for kind, label, cents in rows if kind == ProductOption.SIZE]
+        frames = [(label, int(cents)) for kind, label, cents in rows if kind == ProductOption.FRAME]
+        return PriceTable(sizes, frames)
+
+
+# Create a singleton instance
+option_catalog = OptionCatalog()
+
+
+def unit_price_cents(product, size=DEFAULT_SIZE, frame=DEFAULT_FRAME):
+    """Product base price plus the size and frame surcharges"""
+    return option_catalog.get().unit_price_cents(product, size, frame)
+
+
+class PricedCart:
+    """Result of pricing a cart: priced lines, total and unknown product ids"""
+
+    def __init__(self, lines, missing):
+        self.lines = lines
+        self.missing = missing
+        self.total_cents = sum(line["subtotal_cents"] for line in lines)
+
+    def __iter__(self):
+        return iter(self.lines)
+
+    def __len__(self):
+        return len(self.lines)
+
+    def __bool__(self):
+        return bool(self.lines)
+
+
+class CartPricingEngine:
+    """Batch pricing for session carts and API item lists"""
+
+    @staticmethod
+    def line_product_id(line):
+        """Product id of a cart entry (older entries used ``id``)"""
+        return line.get("product_id") or line.get("id")
+
+    @staticmethod
+    def line_quantity(line):
+        """Quantity of a cart entry (``qty`` in the session, ``quantity`` in the API)"""
+        return int(line.get("qty", line.get("quantity", 1)))
+
+    def load_products(self, lines):
+        """Load every product referenced by ``lines`` with one query"""
+        ids = {self.line_product_id(line) for line in lines}
+        ids.discard(None)
+        if not ids:
+            return {}
+        products = db.session.query(Product).filter(Product.id.in_(ids)).all()
+        return {product.id: product for product in products}
+
+    def price(self, lines, use_stored_prices=True):
+        """Price ``lines`` (session cart entries or API item dicts).
+
+        Lines whose product no longer exists are skipped and their ids are
+        reported in ``PricedCart.missing``. With ``use_stored_prices`` the
+        unit price captured when the item was added to the cart is kept;
+        entries without one get it computed and written back, so the caller
+        can persist the normalized cart.
+        """
+        products = self.load_products(lines)
+        table = option_catalog.get()
+        priced, missing = [], []
+
+        for idx, line in enumerate(lines):
+            pid = self.line_product_id(line)
+            product = products.get(pid)
+            if product is None:
+                missing.append(pid)
+                continue
+
+            qty = self.line_quantity(line)
+            size = line.get("size", DEFAULT_SIZE)
+            frame = line.get("frame", DEFAULT_FRAME)
+
+            unit = line.get("unit_price_cents") if use_stored_prices else None
+            if unit is None:
+                unit = table.unit_price_cents(product, size, frame)
+                if use_stored_prices:
+                    line["unit_price_cents"] = unit  # normalize old entry
+
+            priced.append({
+                "idx": line.get("id", idx),  # stored cart line id when available
+                "product_id": product.id,
+                "product": product,
+                "title": product.title,
+                "image": product.media_key,  # stored under static/uploads/
+                "size": size,
+                "frame": frame,
+                "qty": qty,
+                "unit_price_cents": int(unit),
+                "subtotal_cents": int(unit) * qty,
+            })
+
+        return PricedCart(priced, missing)
+
+
+# Create a singleton instance
+cart_pricing = CartPricingEngine()
@@ -0,0 +1,293 @@
+"""Anonymous Page Response Cache
+
+Stores rendered HTML for public catalog pages keyed by path, normalized
+query string and the shared catalog/package version counters, so a write to
+Product or ServicePackage invalidates every dependent page across workers.
+Requests from logged-in users, admins, visitors with a non-empty cart or a
+pending flash message always bypass the cache.
+
+Storage is pluggable via RESPONSE_CACHE_BACKEND:
+    memory      per-process LRU bounded by entry count and total bytes
+    filesystem  shared directory (RESPONSE_CACHE_DIR) visible to all workers
+    redis       any Redis-compatible server (RESPONSE_CACHE_REDIS_URL),
+                requires the optional ``redis`` package
+    none        disabled
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import current_app, request, session, make_response
+from models import ServicePackage
+from utils.cache_versions import cache_versions, CATALOG
+
+try:
+    import redis
+except ImportError:  # optional dependency
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+PACKAGES = "packages"
+cache_versions.watch(ServicePackage, PACKAGES)
+
+# Query parameters that never change the rendered page
+IGNORED_ARGS_PREFIXES = ("utm_", "fbclid", "gclid")
+
+
+# -----------------------------
+# Storage backends
+# -----------------------------
+class MemoryStore:
+    """Thread-safe in-process LRU bounded by entry count and total size"""
+
+    def __init__(self, max_entries=512, max_bytes=32 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry["expires"] < time.time():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        size = len(entry["body"])
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= len(entry["body"])
+
+
+class FileStore:
+    """Shared on-disk store: one file per key, written atomically"""
+
+    PRUNE_EVERY = 200
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._writes = 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha256(key.encode()).hexdigest())
+
+    def get(self, key):
+        try:
+            with open(self._path(key), "rb") as fh:
+                header = json.loads(fh.readline())
+                body = fh.read()
+        except (OSError, ValueError):
+            return None
+        if header["expires"] < time.time():
+            return None
+        return dict(header, body=body)
+
+    def set(self, key, entry):
+        header = {k: v for k, v in entry.items() if k != "body"}
+        fd, tmp = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(json.dumps(header).encode() + b"\n")
+            fh.write(entry["body"])
+        os.replace(tmp, self._path(key))
+        self._writes += 1
+        if self._writes % self.PRUNE_EVERY == 0:
+            self.prune()
+
+    def prune(self):
+        """Delete expired entries (older catalog versions expire naturally)"""
+        now = time.time()
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                with open(path, "rb") as fh:
+                    if json.loads(fh.readline())["expires"] < now:
+                        os.remove(path)
+            except (OSError, ValueError, KeyError):
+                continue
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+
+class RedisStore:
+    """Redis-compatible shared store using SETEX for expiry"""
+
+    def __init__(self, url, prefix="flash:page:"):
+        if redis is None:
+            raise RuntimeError("RESPONSE_CACHE_BACKEND=redis requires the 'redis' package")
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        if raw is None:
+            return None
+        header, _, body = raw.partition(b"\n")
+        return dict(json.loads(header), body=body)
+
+    def set(self, key, entry):
+        header = {k: v for k, v in entry.items() if k != "body"}
+        ttl = max(1, int(entry["expires"] - time.time()))
+        self.client.setex(self.prefix + key, ttl, json.dumps(header).encode() + b"\n" + entry["body"])
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + "*"):
+            self.client.delete(key)
+
+
+# -----------------------------
+# Cache front-end
+# -----------------------------
+class ResponseCache:
+    """Full-page cache for anonymous GET requests"""
+
+    def __init__(self):
+        self._store = None
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "bypasses": 0, "stores": 0}
+
+    @property
+    def store(self):
+        if self._store is None:
+            with self._lock:
+                if self._store is None:
+                    self._store = self._create_store(current_app.config)
+        return self._store
+
+    @staticmethod
+    def _create_store(config):
+        backend = config.get("RESPONSE_CACHE_BACKEND", "memory")
+        if backend == "memory":
+            return MemoryStore(config.get("RESPONSE_CACHE_MAX_ENTRIES", 512),
+                               config.get("RESPONSE_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+        if backend == "filesystem":
+            return FileStore(config.get("RESPONSE_CACHE_DIR", "instance/page_cache"))
+        if backend == "redis":
+            return RedisStore(config.get("RESPONSE_CACHE_REDIS_URL", "redis://localhost:6379/0"))
+        return None
+
+    def _count(self, counter):
+        with self._lock:
+            self.counters[counter] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+        stats["backend"] = current_app.config.get("RESPONSE_CACHE_BACKEND", "memory")
+        if isinstance(self._store, MemoryStore):
+            stats["entries"] = len(self._store)
+        return stats
+
+    @staticmethod
+    def is_anonymous():
+        """True when the page cannot differ from what any other visitor sees"""
+        if request.method not in ("GET", "HEAD"):
+            return False
+        if session.get("user_id") or session.get("admin") or session.get("admin_logged_in") \
+                or session.get("user_type") == "admin":
+            return False
+        if session.get("cart_id") or session.get("_flashes"):
+            return False
+        return True
+
+    @staticmethod
+    def key(version_names):
+        args = sorted(
+            (name, value)
+            for name, values in request.args.lists()
+            if not name.startswith(IGNORED_ARGS_PREFIXES)
+            for value in values if value != ""
+        )
+        versions = ",".join(f"{name}={cache_versions.get(name)}" for name in version_names)
+        return f"{request.path}?{json.dumps(args)}|{versions}"
+
+    def cached(self, *version_names):
+        """Decorator caching a view's HTML for anonymous visitors.
+
+        The page is keyed on the catalog version (the navigation lists
+        categories on every page) plus any extra ``version_names``.
+        """
+        version_names = (CATALOG,) + tuple(n for n in version_names if n != CATALOG)
+
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                store = self.store
+                if store is None or not self.is_anonymous():
+                    self._count("bypasses")
+                    response = make_response(view(*args, **kwargs))
+                    response.headers["X-Cache"] = "BYPASS"
+                    return response
+
+                key = self.key(version_names)
+                entry = store.get(key)
+                if entry is not None:
+                    self._count("hits")
+                    response = make_response(entry["body"], entry["status"])
+                    response.headers["Content-Type"] = entry["content_type"]
+                    response.headers["X-Cache"] = "HIT"
+                    return response
+
+                self._count("misses")
+                response = make_response(view(*args, **kwargs))
+                # The session cookie is only written after this wrapper returns,
+                # so a view that changed the session must be caught here
+                if response.status_code == 200 and not response.direct_passthrough \
+                        and not session.modified and "Set-Cookie" not in response.headers:
+                    ttl = current_app.config.get("RESPONSE_CACHE_TTL", 300)
+                    try:
+                        store.set(key, {
+                            "status": response.status_code,
+                            "content_type": response.headers.get("Content-Type", "text/html; charset=utf-8"),
+                            "expires": time.time() + ttl,
+                            "body": response.get_data(),
+                        })
+                        self._count("stores")
+                    except Exception as e:
+                        logger.warning(f"Response cache store failed: {e}")
+                response.headers["X-Cache"] = "MISS"
+                return response
+            return wrapper
+        return decorator
+
+
+# Create a singleton instance
+response_cache = ResponseCache()
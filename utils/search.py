@@ -0,0 +1,264 @@
+"""Product Search Index
+
+Full-text search over Product title, description, category and client name.
+SQLite databases use an FTS5 virtual table ranked with BM25; PostgreSQL
+databases use a weighted tsvector table with a GIN index ranked with
+ts_rank_cd. Both support prefix matching and are kept in sync from Product
+write events. Other databases fall back to ILIKE matching.
+
+The index is built by its migration or ``flask search rebuild`` (``init_db``
+builds it for a local database); requests only check that it exists and
+fall back to ILIKE matching until it does.
+"""
+
+import logging
+import re
+from sqlalchemy import event, text, Integer, Float, inspect as sa_inspect
+from models import db, Product
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+MAX_QUERY_TERMS = 8
+
+SQLITE_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS product_fts USING fts5("
+    "title, description, category, client_name, "
+    "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+)
+POSTGRES_DDL = (
+    "CREATE TABLE IF NOT EXISTS product_search ("
+    "product_id INTEGER PRIMARY KEY REFERENCES product(id) ON DELETE CASCADE, "
+    "document TSVECTOR NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS ix_product_search_document "
+    "ON product_search USING GIN (document)",
+)
+
+
+def _postgres_document(title, category, client_name, description):
+    """Weighted tsvector expression over the given column/parameter names"""
+    return (
+        f"setweight(to_tsvector('simple', coalesce({title}, '')), 'A') || "
+        f"setweight(to_tsvector('simple', coalesce({category}, '')), 'B') || "
+        f"setweight(to_tsvector('simple', coalesce({client_name}, '')), 'C') || "
+        f"setweight(to_tsvector('simple', coalesce({description}, '')), 'D')"
+    )
+
+
+POSTGRES_DOCUMENT = _postgres_document(":title", ":category", ":client_name", ":description")
+
+
+def query_terms(q):
+    """Split a free-text query into at most MAX_QUERY_TERMS lowercase terms"""
+    return [t.lower() for t in _TOKEN_RE.findall(q or "")][:MAX_QUERY_TERMS]
+
+
+class ProductSearchIndex:
+    """Dialect-aware full-text index over the product catalog"""
+
+    # BM25 column weights: title, description, category, client_name
+    SQLITE_WEIGHTS = (10.0, 1.0, 4.0, 2.0)
+
+    def __init__(self):
+        self._ready = set()
+        self._backends = {}
+        self._warned = set()
+
+    # -----------------------------
+    # Backend detection
+    # -----------------------------
+    def backend(self, connection):
+        """Return 'sqlite', 'postgresql' or None when no index is supported"""
+        key = self._key(connection)
+        if key not in self._backends:
+            name = connection.dialect.name
+            backend = None
+            if name == "sqlite":
+                supported = connection.execute(
+                    text("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+                ).scalar()
+                backend = "sqlite" if supported else None
+            elif name == "postgresql":
+                backend = "postgresql"
+            self._backends[key] = backend
+        return self._backends[key]
+
+    def _key(self, connection):
+        return str(connection.engine.url)
+
+    def exists(self, connection):
+        """Check whether the index structures exist on this database"""
+        key = self._key(connection)
+        if key in self._ready:
+            return True
+        table = {"sqlite": "product_fts", "postgresql": "product_search"}.get(self.backend(connection))
+        if table and sa_inspect(connection).has_table(table):
+            self._ready.add(key)
+            return True
+        return False
+
+    def available(self, connection):
+        """The backend name when its index has been built, otherwise None"""
+        if self.exists(connection):
+            return self.backend(connection)
+        key = self._key(connection)
+        if self.backend(connection) and key not in self._warned:
+            self._warned.add(key)
+            logger.warning("Product search index missing; run `flask db upgrade` or `flask search rebuild`")
+        return None
+
+    def ensure(self):
+        """Create and populate the index if missing; returns the backend name.
+
+        A setup step for a single process (``init_db``), never called while
+        serving requests.
+        """
+        key = str(db.engine.url)
+        if key in self._ready:
+            return self._backends[key]
+        with db.engine.begin() as connection:
+            backend = self.backend(connection)
+            if backend and not self.exists(connection):
+                self._create(connection, backend)
+                count = self._populate(connection, backend)
+                self._ready.add(key)
+                logger.info(f"Created {backend} product search index with {count} products")
+        return backend
+
+    def rebuild(self):
+        """Drop and rebuild the index from the product table; returns row count"""
+        with db.engine.begin() as connection:
+            backend = self.backend(connection)
+            if not backend:
+                return 0
+            if backend == "sqlite":
+                connection.execute(text("DROP TABLE IF EXISTS product_fts"))
+            else:
+                connection.execute(text("DROP TABLE IF EXISTS product_search"))
+            self._create(connection, backend)
+            count = self._populate(connection, backend)
+            self._ready.add(self._key(connection))
+        return count
+
+    @staticmethod
+    def _create(connection, backend):
+        if backend == "sqlite":
+            connection.execute(text(SQLITE_DDL))
+        else:
+            for statement in POSTGRES_DDL:
+                connection.execute(text(statement))
+
+    @staticmethod
+    def _populate(connection, backend):
+        if backend == "sqlite":
+            result = connection.execute(text(
+                "INSERT INTO product_fts(rowid, title, description, category, client_name) "
+                "SELECT id, title, description, category, client_name FROM product"
+            ))
+        else:
+            document = _postgres_document("title", "category", "client_name", "description")
+            result = connection.execute(text(
+                "INSERT INTO product_search (product_id, document) "
+                f"SELECT id, {document} FROM product"
+            ))
+        return result.rowcount
+
+    # -----------------------------
+    # Incremental maintenance
+    # -----------------------------
+    def index(self, connection, product):
+        """(Re)index a single product inside the caller's transaction"""
+        if not self.exists(connection):
+            return
+        params = {
+            "id": product.id,
+            "title": product.title,
+            "description": product.description,
+            "category": product.category,
+            "client_name": product.client_name,
+        }
+        if connection.dialect.name == "sqlite":
+            connection.execute(text("DELETE FROM product_fts WHERE rowid = :id"), params)
+            connection.execute(text(
+                "INSERT INTO product_fts(rowid, title, description, category, client_name) "
+                "VALUES (:id, :title, :description, :category, :client_name)"
+            ), params)
+        else:
+            connection.execute(text(
+                "INSERT INTO product_search (product_id, document) "
+                f"VALUES (:id, {POSTGRES_DOCUMENT}) "
+                "ON CONFLICT (product_id) DO UPDATE SET document = EXCLUDED.document"
+            ), params)
+
+    def remove(self, connection, product_id):
+        """Remove a product from the index inside the caller's transaction"""
+        if not self.exists(connection):
+            return
+        if connection.dialect.name == "sqlite":
+            connection.execute(text("DELETE FROM product_fts WHERE rowid = :id"), {"id": product_id})
+        else:
+            connection.execute(text("DELETE FROM product_search WHERE product_id = :id"), {"id": product_id})
+
+    # -----------------------------
+    # Querying
+    # -----------------------------
+    def match(self, q):
+        """Return a (product_id, rank) subquery for ``q``, lower rank is better.
+
+        Returns None when the database has no full-text support or its index
+        has not been built, in which case callers should fall back to
+        ``fallback_filter``.
+        """
+        terms = query_terms(q)
+        if not terms:
+            return None
+        backend = self.available(db.session.connection())
+        if backend == "sqlite":
+            weights = ", ".join(str(w) for w in self.SQLITE_WEIGHTS)
+            stmt = text(
+                f"SELECT rowid AS product_id, bm25(product_fts, {weights}) AS rank "
+                "FROM product_fts WHERE product_fts MATCH :query"
+            ).bindparams(query=" ".join(f'"{t}"*' for t in terms))
+        elif backend == "postgresql":
+            stmt = text(
+                "SELECT product_id, -ts_rank_cd(document, to_tsquery('simple', :query)) AS rank "
+                "FROM product_search WHERE document @@ to_tsquery('simple', :query)"
+            ).bindparams(query=" & ".join(f"{t}:*" for t in terms))
+        else:
+            return None
+        return stmt.columns(product_id=Integer, rank=Float).subquery("search_hits")
+
+    @staticmethod
+    def fallback_filter(q):
+        """ILIKE filter across all searchable columns for unsupported databases"""
+        pattern = f"%{q}%"
+        return db.or_(
+            Product.title.ilike(pattern),
+            Product.description.ilike(pattern),
+            Product.category.ilike(pattern),
+            Product.client_name.ilike(pattern),
+        )
+
+
+# Create a singleton instance
+product_search = ProductSearchIndex()
+
+
+SEARCHABLE_FIELDS = ("title", "description", "category", "client_name")
+
+
+@event.listens_for(Product, "after_insert")
+def _index_new_product(mapper, connection, target):
+    product_search.index(connection, target)
+
+
+@event.listens_for(Product, "after_update")
+def _reindex_product(mapper, connection, target):
+    state = sa_inspect(target)
+    if any(state.attrs[field].history.has_changes() for field in SEARCHABLE_FIELDS):
+        product_search.index(connection, target)
+
+
+@event.listens_for(Product, "after_delete")
+def _unindex_product(mapper, connection, target):
+    product_search.remove(connection, target.id)
@@ -0,0 +1,148 @@
+"""Stock Reservations
+
+Placing an order reserves its quantities with one conditional
+``UPDATE product SET stock = stock - :n WHERE id = :id AND stock >= :n`` per
+product, so concurrent checkouts never oversell and need neither
+SELECT ... FOR UPDATE nor serializable transactions. Each reservation is
+recorded with a TTL and resolved by the order's next status:
+
+    paid                          rows are dropped, the stock stays sold
+    failed / cancelled / expired  stock is returned, rows are dropped
+    TTL passed                    ``release_expired`` returns the stock
+
+Releasing claims each row with its own DELETE before crediting stock, so a
+reservation is never returned twice even if two workers race.
+"""
+
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import event, inspect as sa_inspect
+from models import db, Order, OrderItem, Product, StockReservation
+
+logger = logging.getLogger(__name__)
+
+RELEASE_STATUSES = ("failed", "cancelled", "expired")
+
+
+class OutOfStock(Exception):
+    """Raised when a product cannot cover the requested quantity"""
+
+    def __init__(self, product_id):
+        super().__init__(f"product {product_id} is out of stock")
+        self.product_id = product_id
+
+
+class StockReservations:
+    """Reserve, consume and release product stock for orders"""
+
+    @staticmethod
+    def _take(connection, product_id, quantity):
+        """Atomically decrement stock; False when not enough is left"""
+        products = Product.__table__
+        result = connection.execute(
+            products.update()
+            .where(products.c.id == product_id, products.c.stock >= quantity)
+            .values(stock=products.c.stock - quantity)
+        )
+        return result.rowcount == 1
+
+    def reserve(self, order_id, lines, ttl_minutes=None):
+        """Reserve ``(product_id, quantity)`` pairs for ``order_id`` in the session transaction.
+
+        Raises OutOfStock on the first product that cannot be covered; the
+        caller must roll back so earlier decrements are undone.
+        """
+        connection = db.session.connection()
+        needed = defaultdict(int)
+        for product_id, quantity in lines:
+            needed[product_id] += quantity
+
+        # Fixed order so concurrent reservations never wait on each other in a cycle
+        for product_id in sorted(needed):
+            if not self._take(connection, product_id, needed[product_id]):
+                raise OutOfStock(product_id)
+
+        if ttl_minutes is None:
+            ttl_minutes = current_app.config.get("ORDER_PENDING_TTL_MINUTES", 120)
+        expires_at = datetime.utcnow() + timedelta(minutes=ttl_minutes)
+        connection.execute(StockReservation.__table__.insert(), [
+            {"order_id": order_id, "product_id": product_id, "quantity": quantity, "expires_at": expires_at}
+            for product_id, quantity in needed.items()
+        ])
+
+    @staticmethod
+    def _release_rows(connection, rows):
+        """Claim each reservation with a DELETE, then credit its stock back"""
+        reservations, products = StockReservation.__table__, Product.__table__
+        released = 0
+        for reservation_id, product_id, quantity in rows:
+            claimed = connection.execute(
+                reservations.delete().where(reservations.c.id == reservation_id)
+            ).rowcount
+            if claimed:
+                connection.execute(
+                    products.update().where(products.c.id == product_id)
+                    .values(stock=products.c.stock + quantity)
+                )
+                released += 1
+        return released
+
+    def release(self, connection, order_ids):
+        """Return the stock reserved for ``order_ids``"""
+        if not order_ids:
+            return 0
+        reservations = StockReservation.__table__
+        rows = connection.execute(
+            db.select(reservations.c.id, reservations.c.product_id, reservations.c.quantity)
+            .where(reservations.c.order_id.in_(order_ids))
+        ).all()
+        return self._release_rows(connection, rows)
+
+    def consume(self, connection, order_id):
+        """Turn an order's reservations into a sale.
+
+        Orders whose reservation already lapsed (or that never had one) take
+        the stock now; a shortfall is logged because the payment has already
+        been taken.
+        """
+        reservations, items = StockReservation.__table__, OrderItem.__table__
+        consumed = connection.execute(
+            reservations.delete().where(reservations.c.order_id == order_id)
+        ).rowcount
+        if consumed:
+            return
+        for product_id, quantity in connection.execute(
+            db.select(items.c.product_id, items.c.quantity).where(items.c.order_id == order_id)
+        ):
+            if not self._take(connection, product_id, quantity):
+                logger.warning(f"Order {order_id} paid without stock for product {product_id}")
+
+    def release_expired(self, limit=500):
+        """Return stock for up to ``limit`` reservations past their TTL"""
+        reservations = StockReservation.__table__
+        rows = db.session.execute(
+            db.select(reservations.c.id, reservations.c.product_id, reservations.c.quantity)
+            .where(reservations.c.expires_at < datetime.utcnow())
+            .order_by(reservations.c.expires_at)
+            .limit(limit)
+        ).all()
+        released = self._release_rows(db.session.connection(), rows)
+        db.session.commit()
+        return released
+
+
+# Create a singleton instance
+stock_reservations = StockReservations()
+
+
+@event.listens_for(Order, "after_update")
+def _order_status_changed(mapper, connection, target):
+    history = sa_inspect(target).attrs.status.history
+    if not history.has_changes():
+        return
+    if target.status == "paid":
+        stock_reservations.consume(connection, target.id)
+    elif target.status in RELEASE_STATUSES:
+        stock_reservations.release(connection, [target.id])
@@ -1,44 +1,38 @@
 """Stripe Service Module"""
 
-import stripe
-from config import Config
+import logging
+from utils.payment_retry import payment_client, PaymentError
+
+logger = logging.getLogger(__name__)
 
 class StripeService:
-    """Handles Stripe payment processing"""
-    
-    def __init__(self):
-        if hasattr(Config, 'STRIPE_SECRET_KEY') and Config.STRIPE_SECRET_KEY:
-            stripe.api_key = Config.STRIPE_SECRET_KEY
-    
-    def create_payment_intent(self, amount, currency='usd', metadata=None):
+    """Handles Stripe payment processing through the shared payment client"""
+
+    def __init__(self, client=None):
+        self.client = client or payment_client
+
+    def create_payment_intent(self, amount, currency='usd', metadata=None, idempotency_key=None):
         """Create a Stripe payment intent"""
         try:
-            return stripe.PaymentIntent.create(
-                amount=amount,
-                currency=currency,
-                metadata=metadata or {}
-            )
-        except stripe.error.StripeError as e:
-            print(f"Stripe error: {e}")
+            return self.client.create_payment_intent(amount, currency, metadata, idempotency_key)
+        except PaymentError as e:
+            logger.error(f"Stripe error creating payment intent: {e}")
             return None
-    
+
     def get_payment_intent(self, payment_intent_id):
         """Retrieve a payment intent"""
         try:
-            return stripe.PaymentIntent.retrieve(payment_intent_id)
-        except stripe.error.StripeError as e:
-            print(f"Stripe error: {e}")
+            return self.client.retrieve_payment_intent(payment_intent_id)
+        except PaymentError as e:
+            logger.error(f"Stripe error retrieving {payment_intent_id}: {e}")
             return None
-    
-    def create_customer(self, email, name=None):
+
+    def create_customer(self, email, name=None, idempotency_key=None):
         """Create a Stripe customer"""
         try:
-            return stripe.Customer.create(
-                email=email,
-                name=name
-            )
-        except stripe.error.StripeError as e:
-            print(f"Stripe error: {e}")
+            return self.client.create_customer(email, name, idempotency_key)
+        except PaymentError as e:
+            logger.error(f"Stripe error creating customer: {e}")
             return None
 
 # Create a singleton instance
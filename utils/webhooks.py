@@ -0,0 +1,233 @@
+"""Payment Webhook Inbox
+
+``POST /payment/webhook`` only verifies the ``Stripe-Signature`` header
+against STRIPE_WEBHOOK_SECRET and appends the raw event to the
+``webhook_event`` table; a duplicate event id is acknowledged without a
+second row. Applying events to orders happens later, in a pool of
+WEBHOOK_WORKERS threads per process (or ``flask payments process-webhooks``),
+so a burst of webhooks never ties up web workers.
+
+Workers claim one event at a time with a conditional UPDATE that only
+succeeds for the oldest unfinished event of its payment intent while no
+other event of that intent is leased, so events of one intent are applied
+in arrival order even across processes. A claim is a lease of
+WEBHOOK_LEASE_SECONDS; failed events are retried with backoff and end up
+``failed`` after WEBHOOK_MAX_ATTEMPTS.
+
+``fake_event`` and ``sign_payload`` build signed events for local testing.
+"""
+
+import hashlib
+import hmac
+import json
+import logging
+import time
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import and_, exists, or_
+from sqlalchemy.exc import IntegrityError
+from models import db, Order, WebhookEvent
+from utils.checkout import OPEN_STATUSES
+from utils.workers import PeriodicWorker
+
+logger = logging.getLogger(__name__)
+
+UNFINISHED = ("pending", "processing")
+
+
+class InvalidSignature(Exception):
+    """Raised when a webhook body does not match its Stripe-Signature header"""
+
+
+def sign_payload(payload, secret, timestamp=None):
+    """A Stripe-style ``t=...,v1=...`` signature header for ``payload`` (bytes)"""
+    timestamp = int(time.time()) if timestamp is None else timestamp
+    signed = f"{timestamp}.".encode() + payload
+    digest = hmac.new(secret.encode(), signed, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={digest}"
+
+
+def verify_signature(payload, header, secret, tolerance=300):
+    """Check a Stripe-Signature header; raises InvalidSignature"""
+    parts = {}
+    for item in (header or "").split(","):
+        key, _, value = item.strip().partition("=")
+        parts.setdefault(key, []).append(value)
+    try:
+        timestamp = int(parts["t"][0])
+    except (KeyError, ValueError):
+        raise InvalidSignature("missing timestamp")
+    if tolerance and abs(time.time() - timestamp) > tolerance:
+        raise InvalidSignature("timestamp outside tolerance")
+    expected = sign_payload(payload, secret, timestamp).split("v1=", 1)[1]
+    if not any(hmac.compare_digest(expected, candidate) for candidate in parts.get("v1", [])):
+        raise InvalidSignature("signature mismatch")
+
+
+def fake_event(event_type, intent_id, order_id=None, event_id=None):
+    """A minimal Stripe event for ``intent_id``, as a dict"""
+    metadata = {"order_id": str(order_id)} if order_id else {}
+    return {
+        "id": event_id or f"evt_fake_{uuid.uuid4().hex[:24]}",
+        "object": "event",
+        "type": event_type,
+        "created": int(time.time()),
+        "data": {"object": {"id": intent_id, "object": "payment_intent", "metadata": metadata}},
+    }
+
+
+def intent_key(event):
+    """The ordering key of an event: its payment intent when it has one"""
+    obj = event.get("data", {}).get("object", {})
+    if obj.get("object") == "payment_intent" and obj.get("id"):
+        return obj["id"]
+    if obj.get("payment_intent"):
+        return obj["payment_intent"]
+    order_id = (obj.get("metadata") or {}).get("order_id") or obj.get("client_reference_id")
+    return f"order:{order_id}" if order_id else event["id"]
+
+
+class WebhookInbox:
+    """Durable event inbox and the worker pool that drains it"""
+
+    def __init__(self):
+        self._workers = PeriodicWorker("webhook-worker")
+
+    # Ingestion
+    def append(self, event, payload):
+        """Store a verified event; False when its id was already received"""
+        db.session.add(WebhookEvent(
+            event_id=event["id"],
+            event_type=event["type"],
+            intent_key=intent_key(event),
+            payload=payload.decode("utf-8") if isinstance(payload, bytes) else payload,
+        ))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            return False
+        self._workers.wake()
+        return True
+
+    # Processing
+    def claim(self, config, batch=20):
+        """Lease the next applicable event; returns its id or None"""
+        events = WebhookEvent.__table__
+        other = events.alias("other")
+        now = datetime.utcnow()
+        ready = and_(events.c.status.in_(UNFINISHED),
+                     or_(events.c.locked_until.is_(None), events.c.locked_until <= now))
+        candidates = db.session.execute(
+            db.select(events.c.id, events.c.intent_key).where(ready).order_by(events.c.id).limit(batch)
+        ).all()
+        db.session.commit()
+        lease = timedelta(seconds=config.get("WEBHOOK_LEASE_SECONDS", 60))
+        for event_id, key in candidates:
+            earlier = exists().where(other.c.intent_key == key, other.c.status.in_(UNFINISHED),
+                                     other.c.id < event_id)
+            leased = exists().where(other.c.intent_key == key, other.c.status == "processing",
+                                    other.c.locked_until > now, other.c.id != event_id)
+            claimed = db.session.execute(
+                events.update()
+                .where(events.c.id == event_id, ready, ~earlier, ~leased)
+                .values(status="processing", locked_until=now + lease, attempts=events.c.attempts + 1)
+            ).rowcount
+            db.session.commit()
+            if claimed:
+                return event_id
+        return None
+
+    @staticmethod
+    def _order_for(obj):
+        order_id = (obj.get("metadata") or {}).get("order_id") or obj.get("client_reference_id")
+        if order_id:
+            try:
+                return db.session.get(Order, int(order_id))
+            except ValueError:
+                pass
+        intent_id = obj.get("id") if obj.get("object") == "payment_intent" else obj.get("payment_intent")
+        if intent_id:
+            return Order.query.filter_by(stripe_payment_intent=intent_id).first()
+        return None
+
+    def apply(self, event):
+        """Apply one event to its order inside the session transaction"""
+        kind = event.get("type")
+        obj = event.get("data", {}).get("object", {})
+        order = self._order_for(obj)
+        if order is None:
+            logger.info(f"Webhook {event.get('id')} ({kind}) matches no order")
+            return
+
+        if kind == "checkout.session.completed":
+            if obj.get("payment_intent"):
+                order.stripe_payment_intent = obj["payment_intent"]
+            if obj.get("payment_status", "paid") == "paid" and order.status != "paid":
+                order.status = "paid"
+        elif kind == "payment_intent.succeeded":
+            if order.status != "paid":
+                order.status = "paid"
+        elif kind == "payment_intent.payment_failed":
+            if order.status in OPEN_STATUSES:
+                order.status = "failed"
+        elif kind == "payment_intent.canceled":
+            if order.status in OPEN_STATUSES:
+                order.status = "cancelled"
+
+    def process(self, event_id, config):
+        """Apply a claimed event; on error schedule a retry or give up"""
+        events = WebhookEvent.__table__
+        record = db.session.get(WebhookEvent, event_id)
+        try:
+            self.apply(json.loads(record.payload))
+            record.status = "processed"
+            record.processed_at = datetime.utcnow()
+            record.locked_until = None
+            record.last_error = None
+            db.session.commit()
+            return True
+        except Exception as e:
+            db.session.rollback()
+            attempts = db.session.execute(
+                db.select(events.c.attempts).where(events.c.id == event_id)
+            ).scalar()
+            if attempts >= config.get("WEBHOOK_MAX_ATTEMPTS", 8):
+                values = {"status": "failed", "locked_until": None}
+                logger.error(f"Webhook event {event_id} failed for good: {e}")
+            else:
+                retry_in = min(2 ** attempts, 300)
+                values = {"status": "pending", "locked_until": datetime.utcnow() + timedelta(seconds=retry_in)}
+                logger.warning(f"Webhook event {event_id} failed, retrying in {retry_in}s: {e}")
+            db.session.execute(events.update().where(events.c.id == event_id)
+                               .values(last_error=str(e)[:2000], **values))
+            db.session.commit()
+            return False
+
+    def process_next(self, config):
+        """Claim and apply one event; False when nothing is ready"""
+        event_id = self.claim(config)
+        if event_id is None:
+            return False
+        self.process(event_id, config)
+        return True
+
+    def drain(self, config, limit=None):
+        """Process ready events in this thread; returns how many were handled"""
+        handled = 0
+        while (limit is None or handled < limit) and self.process_next(config):
+            handled += 1
+        return handled
+
+    # Worker pool
+    def start(self, app):
+        """Run WEBHOOK_WORKERS daemon threads that drain the inbox"""
+        self._workers.start(app, self.process_next, app.config.get("WEBHOOK_POLL_INTERVAL", 2.0),
+                            threads=app.config.get("WEBHOOK_WORKERS", 2), immediate=True)
+
+    def stop(self):
+        self._workers.stop()
+
+
+# Create a singleton instance
+webhook_inbox = WebhookInbox()
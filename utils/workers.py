@@ -0,0 +1,73 @@
+"""Background Worker Threads
+
+The order reaper, the dummy intent sweeper, the webhook inbox and the email
+outbox each run daemon threads in every web process. ``PeriodicWorker``
+owns that loop so the subsystems only supply a tick function: each tick
+runs inside an app context, its session is rolled back if it raises and
+removed afterwards, and the thread then sleeps for the interval unless the
+tick reported more work or ``wake`` was called.
+"""
+
+import logging
+import threading
+from models import db
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicWorker:
+    """A named pool of daemon threads calling a tick function"""
+
+    def __init__(self, name):
+        self.name = name
+        self._threads = []
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+
+    def start(self, app, tick, interval, threads=1, immediate=False):
+        """Run ``tick(app.config)`` in ``threads`` threads every ``interval`` seconds.
+
+        A truthy return value means more work is waiting, so the thread
+        ticks again at once. With ``immediate`` the first tick runs on start
+        instead of after one interval. A falsy ``interval`` or ``threads``
+        leaves the worker off, as does calling start while it is running.
+        """
+        if not interval or not threads or self.is_alive():
+            return
+
+        def run():
+            busy = immediate
+            while not self._stop.is_set():
+                if not busy:
+                    self._wake.wait(interval)
+                    self._wake.clear()
+                    if self._stop.is_set():
+                        break
+                with app.app_context():
+                    try:
+                        busy = bool(tick(app.config))
+                    except Exception as e:
+                        db.session.rollback()
+                        logger.error(f"{self.name} failed: {e}")
+                        busy = False
+                    finally:
+                        db.session.remove()
+
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(target=run, name=self.name if threads == 1 else f"{self.name}-{n}", daemon=True)
+            for n in range(threads)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def is_alive(self):
+        return any(thread.is_alive() for thread in self._threads)
+
+    def wake(self):
+        """Cut the current wait short, e.g. after queueing work"""
+        self._wake.set()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
@@ -0,0 +1,5 @@
+"""WSGI entry point for gunicorn (``gunicorn wsgi:app``): the Flask app with
+its background workers running in every worker process"""
+from app import app, start_background_workers
+
+start_background_workers(app)